@@ -0,0 +1,160 @@
+"""Online database backups that run in the background.
+
+Snapshots are taken with the SQLite online backup API a few pages at a time,
+so the app stays usable and a concurrent write never produces a torn copy.
+Each snapshot must pass PRAGMA integrity_check before it is gzip-compressed
+into BACKUP_DIR and recorded in catalog.json. Old snapshots are pruned with a
+daily/weekly/monthly retention policy.
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import database_manager as db
+
+BACKUP_DIR = 'backups'
+CATALOG_NAME = 'catalog.json'
+PAGES_PER_STEP = 256
+STEP_PAUSE_SECONDS = 0.005
+RETENTION = {'daily': 7, 'weekly': 4, 'monthly': 12}
+
+_catalog_lock = threading.Lock()
+_backup_thread = None
+
+def _catalog_path(backup_dir):
+    return os.path.join(backup_dir, CATALOG_NAME)
+
+def load_catalog(backup_dir=BACKUP_DIR):
+    try:
+        with open(_catalog_path(backup_dir), 'r') as f: return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+def _save_catalog(catalog, backup_dir):
+    tmp_path = _catalog_path(backup_dir) + '.tmp'
+    with open(tmp_path, 'w') as f: json.dump(catalog, f, indent=2)
+    os.replace(tmp_path, _catalog_path(backup_dir))
+
+def _compress(src_path, dest_path):
+    """Gzips src_path into dest_path atomically and returns the SHA-256 of the compressed file."""
+    part_path = dest_path + '.part'
+    with open(src_path, 'rb') as src, gzip.open(part_path, 'wb', compresslevel=6) as dst:
+        while chunk := src.read(1024 * 1024): dst.write(chunk)
+    digest = hashlib.sha256()
+    with open(part_path, 'rb') as f:
+        while chunk := f.read(1024 * 1024): digest.update(chunk)
+    os.replace(part_path, dest_path)
+    return digest.hexdigest()
+
+def create_snapshot(db_file=None, backup_dir=BACKUP_DIR, progress=None):
+    """Takes one verified, compressed snapshot of db_file and records it in the catalog.
+
+    progress(pages_done, pages_total) is called after each backup step.
+    Returns the catalog entry, or None if the database does not exist yet.
+    """
+    db_file = db_file or db.DB_FILE
+    if not os.path.exists(db_file): return None
+    os.makedirs(backup_dir, exist_ok=True)
+    now = datetime.now(); started = time.perf_counter()
+    tmp_path = os.path.join(backup_dir, f".snapshot_{now.strftime('%Y%m%d_%H%M%S')}.db.tmp")
+    entry = {'file': f"backup_{now.strftime('%Y-%m-%d')}.db.gz", 'date': now.strftime('%Y-%m-%d'), 'created': now.isoformat(timespec='seconds')}
+    src = sqlite3.connect(db_file); dst = sqlite3.connect(tmp_path)
+    try:
+        def on_step(status, remaining, total):
+            if progress: progress(total - remaining, total)
+        src.backup(dst, pages=PAGES_PER_STEP, progress=on_step, sleep=STEP_PAUSE_SECONDS)
+        entry['integrity'] = dst.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        src.close(); dst.close()
+    try:
+        if entry['integrity'] != 'ok':
+            print(f"Backup failed integrity check: {entry['integrity']}")
+            entry['file'] = None
+        else:
+            entry['source_size'] = os.path.getsize(tmp_path)
+            entry['sha256'] = _compress(tmp_path, os.path.join(backup_dir, entry['file']))
+            entry['size'] = os.path.getsize(os.path.join(backup_dir, entry['file']))
+    finally:
+        os.remove(tmp_path)
+    entry['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    with _catalog_lock:
+        catalog = [e for e in load_catalog(backup_dir) if e.get('file') != entry['file'] or not entry['file']]
+        catalog.append(entry)
+        _save_catalog(catalog, backup_dir)
+    if entry['file']: print(f"Database backup created: {os.path.join(backup_dir, entry['file'])}")
+    return entry
+
+def _retained_files(catalog, retention):
+    """Keeps the newest snapshot of each of the last N days, ISO weeks and months."""
+    good = sorted((e for e in catalog if e.get('file') and e.get('integrity') == 'ok'), key=lambda e: e['created'], reverse=True)
+    keep = set()
+    periods = {
+        'daily': lambda d: d.strftime('%Y-%m-%d'),
+        'weekly': lambda d: '%d-W%02d' % d.isocalendar()[:2],
+        'monthly': lambda d: d.strftime('%Y-%m'),
+    }
+    for name, period_of in periods.items():
+        seen = set()
+        for entry in good:
+            period = period_of(datetime.strptime(entry['date'], '%Y-%m-%d'))
+            if period in seen: continue
+            if len(seen) >= retention.get(name, 0): break
+            seen.add(period); keep.add(entry['file'])
+    return keep
+
+def apply_retention(backup_dir=BACKUP_DIR, retention=None):
+    """Deletes snapshots that fall outside the retention policy; returns the removed file names."""
+    with _catalog_lock:
+        catalog = load_catalog(backup_dir)
+        keep = _retained_files(catalog, retention or RETENTION)
+        removed = []
+        for entry in catalog:
+            if entry.get('file') and entry['file'] not in keep:
+                try: os.remove(os.path.join(backup_dir, entry['file']))
+                except FileNotFoundError: pass
+                removed.append(entry['file'])
+        _save_catalog([e for e in catalog if e.get('file') in keep], backup_dir)
+    return removed
+
+def verify_snapshot(entry, backup_dir=BACKUP_DIR):
+    """Re-checks a catalogued snapshot's checksum."""
+    digest = hashlib.sha256()
+    with open(os.path.join(backup_dir, entry['file']), 'rb') as f:
+        while chunk := f.read(1024 * 1024): digest.update(chunk)
+    return digest.hexdigest() == entry.get('sha256')
+
+def restore_snapshot(entry, target_file, backup_dir=BACKUP_DIR):
+    """Decompresses a snapshot to target_file (which must not be in use)."""
+    with gzip.open(os.path.join(backup_dir, entry['file']), 'rb') as src, open(target_file, 'wb') as dst:
+        while chunk := src.read(1024 * 1024): dst.write(chunk)
+
+def has_snapshot_for_today(backup_dir=BACKUP_DIR):
+    today = datetime.now().strftime('%Y-%m-%d')
+    return any(e.get('date') == today and e.get('file') for e in load_catalog(backup_dir))
+
+def daily_backup(db_file=None, backup_dir=BACKUP_DIR, progress=None):
+    """Takes today's snapshot if there is none yet, then applies retention. Runs in the calling thread."""
+    try:
+        if has_snapshot_for_today(backup_dir): return None
+        # Leftovers from a snapshot interrupted by the app closing.
+        for name in os.listdir(backup_dir) if os.path.isdir(backup_dir) else []:
+            if name.startswith('.snapshot_') or name.endswith('.part'): os.remove(os.path.join(backup_dir, name))
+        entry = create_snapshot(db_file, backup_dir, progress)
+        apply_retention(backup_dir)
+        return entry
+    except Exception as e:
+        print(f"Failed to create backup: {e}")
+        return None
+
+def start_daily_backup(db_file=None, backup_dir=BACKUP_DIR, progress=None):
+    """Runs daily_backup() on a background daemon thread and returns the thread."""
+    global _backup_thread
+    if _backup_thread is not None and _backup_thread.is_alive(): return _backup_thread
+    _backup_thread = threading.Thread(target=daily_backup, args=(db_file, backup_dir, progress), name="daily-backup", daemon=True)
+    _backup_thread.start()
+    return _backup_thread
@@ -0,0 +1,11 @@
+"""Headless benchmarks for database_manager and pdf_generator.
+
+Run from the project root:
+
+    python -m benchmarks --scale small --output bench.json
+    python -m benchmarks --scale small --baseline bench.json
+
+Data is generated into a scratch directory (see datagen.py), every benchmark
+writes its timings to a JSON file, and --baseline compares the run against an
+earlier one and exits non-zero when a median got slower than --threshold.
+"""
@@ -0,0 +1,84 @@
+"""Synthetic, reproducible billing data at a configurable scale.
+
+Products, buyers, vendors and purchases are inserted with executemany in one
+transaction each; invoices go through database_manager.save_invoices_bulk so
+stock, the stock ledger and the sales rollups are maintained exactly as in
+production.
+"""
+import random
+from datetime import date, timedelta
+
+import database_manager as db
+import gst_engine
+
+SCALES = {
+    'small': {'products': 1_000, 'buyers': 200, 'vendors': 50, 'invoice_lines': 10_000},
+    'medium': {'products': 10_000, 'buyers': 2_000, 'vendors': 200, 'invoice_lines': 100_000},
+    'large': {'products': 100_000, 'buyers': 10_000, 'vendors': 1_000, 'invoice_lines': 1_000_000},
+}
+SELLER_STATE_CODE = '29'
+STATE_CODES = ('29', '29', '29', '27', '33', '07', '24', '09')
+GST_RATES = (0.0, 5.0, 12.0, 18.0, 28.0)
+UNITS = ('Nos', 'Kg', 'Box', 'Mtr', 'Ltr')
+PAYMENT_MODES = ('Cash', 'UPI', 'Bank Transfer', 'Credit')
+WORDS = ('Steel', 'Copper', 'Cotton', 'Plastic', 'Premium', 'Basic', 'Industrial', 'Compact', 'Heavy', 'Flexible', 'Bolt', 'Cable', 'Pipe', 'Sheet', 'Valve', 'Bearing', 'Filter', 'Switch', 'Panel', 'Motor')
+MAX_LINES_PER_INVOICE = 19  # 10 lines per invoice on average
+PURCHASES_PER_VENDOR = 10
+
+def _gstin(rng, state_code):
+    letters = ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(5))
+    return f"{state_code}{letters}{rng.randrange(10000):04d}{rng.choice('ABCDEFGHIJ')}1Z{rng.randrange(10)}"
+
+def _product_rows(rng, count):
+    for n in range(1, count + 1):
+        gst_rate = rng.choice(GST_RATES); rate = round(rng.uniform(5, 5000), 2)
+        yield (f"{rng.choice(WORDS)} {rng.choice(WORDS)} {n:06d}", f"{rng.randrange(1000, 9999)}{rng.randrange(10, 99)}", gst_rate, rate, float(rng.randrange(1_000, 50_000)), rng.choice(UNITS), round(rate * rng.uniform(1.1, 1.6), 2))
+
+def _party_rows(rng, count, label, with_state):
+    for n in range(1, count + 1):
+        state_code = rng.choice(STATE_CODES)
+        row = (f"{label} {rng.choice(WORDS)} {n:06d}", _gstin(rng, state_code), f"{rng.randrange(1, 999)} {rng.choice(WORDS)} Road", f"+91 9{rng.randrange(10**9):09d}", f"{label.lower()}{n}@example.com")
+        yield row + (state_code,) if with_state else row
+
+def invoice_records(rng, product_ids, buyers, line_count, start_date, days):
+    """Yields save_invoices_bulk records until line_count invoice lines have been produced."""
+    products = {row['id']: row for row in db.get_db_connection().execute("SELECT id, hsn, gst_rate, selling_price FROM products")}
+    remaining = line_count
+    while remaining > 0:
+        lines = min(remaining, rng.randint(1, MAX_LINES_PER_INVOICE)); remaining -= lines
+        buyer_id, state_code = rng.choice(buyers)
+        items = []; line_totals = []
+        for product_id in rng.sample(product_ids, lines):
+            product = products[product_id]; quantity = float(rng.randint(1, 20)); discount_percent = rng.choice((0.0, 0.0, 0.0, 5.0, 10.0))
+            line = gst_engine.line_totals(quantity, product['selling_price'], discount_percent, product['gst_rate']); line_totals.append(line)
+            items.append({'product_id': product_id, 'hsn': product['hsn'], 'gst_rate': product['gst_rate'], 'quantity': quantity, 'rate': product['selling_price'], 'discount_percent': discount_percent, 'amount': float(line['taxable_value'])})
+        totals = gst_engine.as_floats(gst_engine.invoice_totals(line_totals, inter_state=state_code != SELLER_STATE_CODE))
+        yield {'invoice_date': (start_date + timedelta(days=rng.randrange(days))).isoformat(), 'buyer_id': buyer_id, 'payment_mode': rng.choice(PAYMENT_MODES),
+               **{field: totals[field] for field in ('subtotal', 'total_discount', 'total_cgst', 'total_sgst', 'total_igst', 'round_off', 'grand_total')}, 'items': items}
+
+def generate(products, buyers, vendors, invoice_lines, seed=42, start_date=None, days=365, prefix="BENCH-", progress=None):
+    """Fills the current database (db.DB_FILE) and returns a summary of what was created.
+
+    progress, if given, is called with (stage, done, total).
+    """
+    rng = random.Random(seed); start_date = start_date or date.today() - timedelta(days=days)
+    db.create_tables()
+    conn = db.get_db_connection()
+    with conn:
+        conn.executemany("INSERT INTO products (name, hsn, gst_rate, rate, stock_qty, unit, selling_price) VALUES (?, ?, ?, ?, ?, ?, ?)", _product_rows(rng, products))
+        conn.execute("INSERT INTO stock_movements (product_id, movement_date, kind, quantity) SELECT id, ?, 'opening', stock_qty FROM products", (start_date.isoformat(),))
+        conn.executemany("INSERT INTO buyers (name, gstin, address, phone, email, state) VALUES (?, ?, ?, ?, ?, ?)", _party_rows(rng, buyers, 'Buyer', True))
+        conn.executemany("INSERT INTO vendors (name, gstin, address, phone, email) VALUES (?, ?, ?, ?, ?)", _party_rows(rng, vendors, 'Vendor', False))
+        vendor_ids = [row[0] for row in conn.execute("SELECT id FROM vendors")]
+        conn.executemany("INSERT INTO purchases (vendor_id, bill_no, purchase_date, total_amount, amount_paid, payment_status, notes) VALUES (?, ?, ?, ?, 0, 'Unpaid', '')",
+                         [(vendor_id, f"BILL-{vendor_id}-{n}", (start_date + timedelta(days=rng.randrange(days))).isoformat(), round(rng.uniform(1_000, 500_000), 2)) for vendor_id in vendor_ids for n in range(PURCHASES_PER_VENDOR)])
+    if progress: progress('master data', 1, 1)
+    product_ids = [row[0] for row in conn.execute("SELECT id FROM products")]
+    buyer_rows = [(row[0], row[1]) for row in conn.execute("SELECT id, state FROM buyers")]
+    result = db.save_invoices_bulk(invoice_records(rng, product_ids, buyer_rows, invoice_lines, start_date, days), prefix=prefix,
+                                   progress=(lambda saved, failed: progress('invoices', saved, None)) if progress else None)
+    db.ensure_stock_snapshots()
+    conn.execute("PRAGMA optimize")
+    return {'products': products, 'buyers': buyers, 'vendors': vendors, 'invoice_lines': invoice_lines, 'invoices': len(result['saved']),
+            'purchases': len(vendor_ids) * PURCHASES_PER_VENDOR, 'errors': len(result['errors']), 'seed': seed,
+            'start_date': start_date.isoformat(), 'end_date': (start_date + timedelta(days=days - 1)).isoformat()}
@@ -0,0 +1,214 @@
+"""Times database_manager and pdf_generator functions against generated data.
+
+Each benchmark prepares its inputs untimed and returns a list of calls; each
+call is timed on its own and the run is summarised as min/median/mean/max
+seconds. Benchmarks that change data run after the read-only ones.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import database_manager as db
+import gst_engine
+from invoice_model import InvoiceModel
+from prefix_index import PrefixIndex
+from benchmarks import datagen
+
+DEFAULT_REPEAT = 20
+DEFAULT_THRESHOLD = 0.25     # a median more than 25% slower than the baseline is a regression
+BENCHMARKS = []
+
+def benchmark(name, repeat=DEFAULT_REPEAT):
+    def register(fn):
+        BENCHMARKS.append((name, repeat, fn)); return fn
+    return register
+
+def _invoice_ids(ctx, count):
+    ids = [row[0] for row in db.get_db_connection().execute(f"SELECT id FROM invoices WHERE invoice_no NOT LIKE '{db.CANCELLED_PREFIX}%'")]
+    return ctx['rng'].sample(ids, min(count, len(ids)))
+
+def _month(ctx):
+    end = date.fromisoformat(ctx['data']['end_date']); return end - timedelta(days=29), end
+
+@benchmark('get_invoices_by_filter.month')
+def _filter_month(ctx, repeat):
+    start, end = _month(ctx)
+    return [lambda: db.get_invoices_by_filter(start.isoformat(), end.isoformat())] * repeat
+
+@benchmark('get_invoices_by_filter.year', repeat=5)
+def _filter_year(ctx, repeat):
+    return [lambda: db.get_invoices_by_filter(ctx['data']['start_date'], ctx['data']['end_date'])] * repeat
+
+@benchmark('get_invoices_by_filter.buyer_year')
+def _filter_buyer(ctx, repeat):
+    buyer_ids = [row[0] for row in db.get_db_connection().execute("SELECT id FROM buyers")]
+    return [lambda buyer_id=ctx['rng'].choice(buyer_ids): db.get_invoices_by_filter(ctx['data']['start_date'], ctx['data']['end_date'], buyer_id) for _ in range(repeat)]
+
+@benchmark('get_full_invoice_details', repeat=200)
+def _details(ctx, repeat):
+    return [lambda invoice_id=invoice_id: db.get_full_invoice_details(invoice_id) for invoice_id in _invoice_ids(ctx, repeat)]
+
+@benchmark('get_full_invoice_details_bulk.1000', repeat=5)
+def _details_bulk(ctx, repeat):
+    invoice_ids = sorted(_invoice_ids(ctx, 1000))
+    return [lambda: list(db.get_full_invoice_details_bulk(invoice_ids))] * repeat
+
+@benchmark('invoice_model.edit_row.150', repeat=200)
+def _edit_row(ctx, repeat):
+    # one keystroke on a 150-line invoice: the edited row's line, then the totals
+    rng = ctx['rng']; model = InvoiceModel()
+    def line(): return gst_engine.line_totals(rng.randint(1, 20), round(rng.uniform(1, 5_000), 2), rng.choice((0, 5, 10)), rng.choice((0, 5, 12, 18, 28)))
+    for row in range(150): model.set_line(row, line())
+    def edit(row): model.set_line(row, line()); model.totals()
+    return [lambda row=row: edit(row) for row in (rng.randrange(150) for _ in range(repeat))]
+
+@benchmark('prefix_index.search.products', repeat=500)
+def _picker_search(ctx, repeat):
+    # one product picker opening on the first few characters of a name or HSN code
+    rng = ctx['rng']; rows = db.get_db_connection().execute("SELECT name, hsn FROM products").fetchall()
+    index = PrefixIndex((row['name'], row['hsn']) for row in rows)
+    texts = [rng.choice(rows)[rng.choice(('name', 'hsn'))][:rng.randint(1, 4)] for _ in range(repeat)]
+    return [lambda text=text: index.search(text) for text in texts]
+
+@benchmark('create_invoice_pdf', repeat=10)
+def _invoice_pdf(ctx, repeat):
+    pdf_generator = ctx['pdf_generator']
+    details = [db.get_full_invoice_details(invoice_id) for invoice_id in _invoice_ids(ctx, repeat)]
+    return [lambda invoice=invoice, items=items: pdf_generator.create_invoice_pdf(invoice, items, ctx['settings'], use_cache=False) for invoice, items in details]
+
+@benchmark('create_invoice_pdf.cached', repeat=50)
+def _cached_invoice_pdf(ctx, repeat):
+    pdf_generator = ctx['pdf_generator']
+    invoice, items = db.get_full_invoice_details(_invoice_ids(ctx, 1)[0])
+    with contextlib.redirect_stdout(io.StringIO()): pdf_generator.create_invoice_pdf(invoice, items, ctx['settings'])  # untimed: fills the cache
+    return [lambda: pdf_generator.create_invoice_pdf(invoice, items, ctx['settings'])] * repeat
+
+@benchmark('create_detailed_invoice_report.100', repeat=3)
+def _detailed_report(ctx, repeat):
+    pdf_generator = ctx['pdf_generator']; invoice_ids = sorted(_invoice_ids(ctx, 100))
+    return [lambda: pdf_generator.create_detailed_invoice_report(invoice_ids, ctx['settings'])] * repeat
+
+@benchmark('create_transaction_report_pdf.month', repeat=3)
+def _transaction_report(ctx, repeat):
+    pdf_generator = ctx['pdf_generator']; start, end = _month(ctx)
+    invoices = db.get_invoices_by_filter(start.isoformat(), end.isoformat())
+    start_dt, end_dt = datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.min.time())
+    return [lambda: pdf_generator.create_transaction_report_pdf(invoices, start_dt, end_dt, ctx['settings'])] * repeat
+
+# Benchmarks that change data come last, so the ones above time the generated data as it is.
+@benchmark('save_invoice', repeat=100)
+def _save(ctx, repeat):
+    conn = db.get_db_connection()
+    product_ids = [row[0] for row in conn.execute("SELECT id FROM products")]
+    buyers = [(row[0], row[1]) for row in conn.execute("SELECT id, state FROM buyers")]
+    today = date.today()
+    records = list(datagen.invoice_records(ctx['rng'], product_ids, buyers, repeat * 10, today, 1))
+    prefix = ctx['settings']['invoice_settings']['invoice_prefix']
+    return [lambda record=record: db.save_invoice({**db._BULK_INVOICE_DEFAULTS, **{k: v for k, v in record.items() if k != 'items'}}, [dict(item, description='') for item in record['items']], prefix=prefix) for record in records]
+
+@benchmark('cancel_invoice', repeat=50)
+def _cancel(ctx, repeat):
+    return [lambda invoice_id=invoice_id: db.cancel_invoice(invoice_id) for invoice_id in _invoice_ids(ctx, repeat)]
+
+@benchmark('add_purchase_payment', repeat=100)
+def _payment(ctx, repeat):
+    purchase_ids = [row[0] for row in db.get_db_connection().execute("SELECT id FROM purchases")]
+    payment = {'payment_date': date.today().isoformat(), 'amount': 100.0, 'payment_mode': 'UPI', 'reference_no': 'BENCH'}
+    return [lambda purchase_id=ctx['rng'].choice(purchase_ids): db.add_purchase_payment(purchase_id, payment) for _ in range(repeat)]
+
+def _summarise(timings):
+    return {'runs': len(timings), 'min': min(timings), 'median': statistics.median(timings), 'mean': statistics.fmean(timings), 'max': max(timings)}
+
+def run_benchmarks(ctx, repeat_scale=1.0, only=None, report=print):
+    results = {}
+    for name, repeat, prepare in BENCHMARKS:
+        if only and not any(name.startswith(prefix) for prefix in only): continue
+        calls = prepare(ctx, max(1, int(repeat * repeat_scale)))
+        if not calls: continue
+        timings = []
+        with contextlib.redirect_stdout(io.StringIO()):  # the functions under test print progress messages
+            for call in calls:
+                started = time.perf_counter(); call(); timings.append(time.perf_counter() - started)
+        results[name] = _summarise(timings)
+        report(f"{name:<40} median {results[name]['median'] * 1000:10.2f} ms  ({len(timings)} runs)")
+    return results
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """[(name, baseline_median, current_median, ratio, regressed)] for benchmarks present in both runs."""
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base: continue
+        ratio = result['median'] / base['median'] if base['median'] else float('inf')
+        rows.append((name, base['median'], result['median'], ratio, ratio > 1 + threshold))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Benchmark database_manager and pdf_generator on synthetic data.")
+    parser.add_argument('--scale', choices=sorted(datagen.SCALES), default='small')
+    for key in ('products', 'buyers', 'vendors', 'invoice_lines'):
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, help=f"Override the number of {key.replace('_', ' ')} for the scale")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat-scale', type=float, default=1.0, help="Multiply every benchmark's repeat count")
+    parser.add_argument('--only', help="Comma-separated benchmark name prefixes to run")
+    parser.add_argument('--workdir', help="Directory for the database and PDFs (default: a new temporary directory)")
+    parser.add_argument('--reuse', action='store_true', help="Reuse the database already in --workdir instead of generating")
+    parser.add_argument('--output', help="Write results to this JSON file")
+    parser.add_argument('--baseline', help="Compare against a previous results file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    with open('settings.json', 'r') as f: settings = json.load(f)
+    import pdf_generator
+    pdf_generator.warm_up()  # keep the one-off reportlab and font loading out of the first timed render
+    project_root = os.getcwd()
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='billing-bench-'))
+    os.makedirs(os.path.join(workdir, 'data'), exist_ok=True)
+    db.DB_FILE = os.path.join(workdir, 'data', 'bench.db')
+    data_file = os.path.join(workdir, 'data', 'bench.json')
+    counts = dict(datagen.SCALES[args.scale], **{key: getattr(args, key) for key in datagen.SCALES['small'] if getattr(args, key) is not None})
+
+    if args.reuse and os.path.exists(data_file):
+        with open(data_file) as f: data = json.load(f)
+        db.create_tables(); print(f"Reusing {db.DB_FILE}")
+    else:
+        if os.path.exists(db.DB_FILE): sys.exit(f"{db.DB_FILE} already exists; pass --reuse or use an empty --workdir")
+        print(f"Generating {counts} into {workdir}")
+        started = time.perf_counter()
+        data = datagen.generate(seed=args.seed, progress=lambda stage, done, total: print(f"\r{stage:<12} {done}", end='', flush=True), **counts)
+        data['generate_seconds'] = time.perf_counter() - started
+        print(f"\nGenerated {data['invoices']} invoices in {data['generate_seconds']:.1f}s")
+        with open(data_file, 'w') as f: json.dump(data, f, indent=2)
+
+    os.chdir(workdir)
+    try:
+        ctx = {'rng': random.Random(args.seed), 'data': data, 'settings': settings, 'pdf_generator': pdf_generator}
+        results = run_benchmarks(ctx, args.repeat_scale, args.only.split(',') if args.only else None)
+    finally:
+        os.chdir(project_root); db.close_db_connection()
+    current = {'meta': {'created': datetime.now().isoformat(timespec='seconds'), 'scale': args.scale, 'data': data, 'python': platform.python_version(),
+                        'sqlite': sqlite3.sqlite_version, 'platform': platform.platform()}, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(current, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if not args.baseline: return 0
+    with open(args.baseline) as f: baseline = json.load(f)
+    if baseline['meta'].get('data', {}).get('invoice_lines') != data.get('invoice_lines'):
+        print("Warning: baseline was recorded at a different data scale.")
+    rows = compare(baseline, current, args.threshold)
+    for name, base, now, ratio, regressed in rows:
+        print(f"{name:<40} {base * 1000:10.2f} -> {now * 1000:10.2f} ms  x{ratio:5.2f}{'  REGRESSION' if regressed else ''}")
+    regressions = [row for row in rows if row[4]]
+    print(f"{len(regressions)} regressions beyond {args.threshold:.0%}.")
+    return 1 if regressions else 0
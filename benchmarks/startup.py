@@ -0,0 +1,113 @@
+"""Cold-start timing for the GUI: time to first window and the slowest imports.
+
+Every run starts a fresh interpreter with -X importtime in a scratch directory
+holding a copy of settings.json, builds BillingApp and measures the wall time
+from launching the process until the main window is mapped, as well as how
+long `import main` took. The import times of the last run are summarised per
+module, so a regression can be traced to whatever started importing eagerly.
+
+    python -m benchmarks.startup --runs 5 --output startup.json
+    python -m benchmarks.startup --baseline startup.json
+
+--imports-only skips the window (for machines without a display).
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.runner import DEFAULT_THRESHOLD, _summarise, compare
+
+DEFAULT_RUNS = 5
+CHILD = r'''
+import json, os, sys, time
+started = time.perf_counter()
+import tkinter as tk
+import main
+result = {'import_main': time.perf_counter() - started}
+if sys.argv[1] == 'window':
+    root = tk.Tk(); app = main.BillingApp(root)
+    root.wait_visibility(root)
+    result['window_shown_at'] = time.time()
+print(json.dumps(result), flush=True)
+os._exit(0)  # skip tearing down Tk and the app's background threads
+'''
+
+def parse_importtime(stderr):
+    """[(module, depth, self_seconds, cumulative_seconds)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line: continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        module = name.strip(); depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((module, depth, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return rows
+
+def run_once(project_root, workdir, window=True):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [project_root, os.environ.get('PYTHONPATH')])))
+    launched = time.time()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD, 'window' if window else 'imports'], cwd=workdir, env=env, capture_output=True, text=True)
+    finished = time.time()
+    if proc.returncode != 0: raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit code {proc.returncode}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    timings = {'startup.import_main': result['import_main'], 'startup.process': finished - launched}
+    if window: timings['startup.first_window'] = result['window_shown_at'] - launched
+    return timings, parse_importtime(proc.stderr)
+
+def _main_imports(imports):
+    """Modules imported directly by main, slowest first, by cumulative time."""
+    # -X importtime lists a module after everything it imported, so main's
+    # direct imports are the rows one level deeper since the previous sibling.
+    end = next(n for n, row in enumerate(imports) if row[0] == 'main'); depth = imports[end][1]
+    start = max((n for n, row in enumerate(imports[:end]) if row[1] <= depth), default=-1) + 1
+    direct = [(module, cumulative) for module, module_depth, _, cumulative in imports[start:end] if module_depth == depth + 1]
+    return sorted(direct, key=lambda row: row[1], reverse=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup', description="Measure GUI cold start: time to first window and import times.")
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS)
+    parser.add_argument('--top', type=int, default=10, help="How many of main's imports to list")
+    parser.add_argument('--imports-only', action='store_true', help="Only import main; do not open a window")
+    parser.add_argument('--output', help="Write results to this JSON file")
+    parser.add_argument('--baseline', help="Compare against a previous results file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    project_root = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='billing-startup-')
+    try:
+        shutil.copy(os.path.join(project_root, 'settings.json'), workdir)
+        os.makedirs(os.path.join(workdir, 'data'))
+        runs = []
+        for n in range(args.runs):
+            try: runs.append(run_once(project_root, workdir, window=not args.imports_only))
+            except RuntimeError as e: sys.exit(f"Startup run failed: {e}" + ("" if args.imports_only else " (no display? try --imports-only)"))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {name: _summarise([timings[name] for timings, _ in runs]) for name in runs[0][0]}
+    for name, result in results.items():
+        print(f"{name:<40} median {result['median'] * 1000:10.2f} ms  ({result['runs']} runs)")
+    print("\nSlowest imports of main (last run):")
+    for module, cumulative in _main_imports(runs[-1][1])[:args.top]:
+        print(f"  {module:<38} {cumulative * 1000:10.2f} ms")
+    current = {'meta': {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': sys.version.split()[0]}, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(current, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if not args.baseline: return 0
+    with open(args.baseline) as f: baseline = json.load(f)
+    rows = compare(baseline, current, args.threshold)
+    for name, base, now, ratio, regressed in rows:
+        print(f"{name:<40} {base * 1000:10.2f} -> {now * 1000:10.2f} ms  x{ratio:5.2f}{'  REGRESSION' if regressed else ''}")
+    regressions = [row for row in rows if row[4]]
+    print(f"{len(regressions)} regressions beyond {args.threshold:.0%}.")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
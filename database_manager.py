@@ -1,29 +1,69 @@
 import sqlite3
 import os
-import shutil
+import atexit
+import threading
+import time
 from datetime import datetime
 
+import gst_engine
+
 DB_FILE = os.path.join('data', 'billing_app.db')
-BACKUP_DIR = 'backups'
 
-def get_db_connection():
-    os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
-    conn = sqlite3.connect(DB_FILE)
+# --- Connection tuning ---
+CACHE_SIZE_KB = 16 * 1024      # page cache per connection
+STATEMENT_CACHE_SIZE = 256     # prepared statements kept per connection
+BUSY_TIMEOUT_SECONDS = 5.0
+
+_local = threading.local()
+
+def _open_connection(path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, cached_statements=STATEMENT_CACHE_SIZE)
     conn.row_factory = sqlite3.Row
+    # Lets SQL aggregate line GST exactly as the Python side does.
+    conn.create_function('gst_line_tax', 2, lambda amount, gst_rate: float(gst_engine.line_gst(amount, gst_rate)), deterministic=True)
+    conn.create_function('gst_cgst_share', 1, lambda gst: float(gst_engine.cgst_share(gst)), deterministic=True)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
     return conn
 
-def create_tables():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+def get_db_connection():
+    """Returns the calling thread's long-lived connection, opening it on first use.
+
+    Connections are thread-affine (sqlite3 refuses cross-thread use), so each
+    thread gets its own. Callers must not close it; use close_db_connection().
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != DB_FILE:
+        if conn is not None: conn.close()
+        conn = _open_connection(DB_FILE)
+        _local.conn, _local.path = conn, DB_FILE
+    return conn
+
+def close_db_connection():
+    """Closes the calling thread's connection (if any)."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close(); _local.conn = None
+
+atexit.register(close_db_connection)
+
+# --- Schema Migrations ---
+# Each migration runs once, in its own transaction, in version order. The applied
+# version is kept in PRAGMA user_version and logged in the schema_migrations table.
+def _add_column_if_missing(cursor, table_name, column, declaration):
+    columns = [row['name'] for row in cursor.execute(f"PRAGMA table_info({table_name})")]
+    if column not in columns: cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column} {declaration}")
+
+def _migration_base_schema(cursor):
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS products (
         id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, hsn TEXT,
         gst_rate REAL NOT NULL, rate REAL NOT NULL, stock_qty REAL NOT NULL, unit TEXT
     )''')
-    try:
-        cursor.execute("ALTER TABLE products ADD COLUMN selling_price REAL NOT NULL DEFAULT 0")
-    except sqlite3.OperationalError: pass
+    _add_column_if_missing(cursor, 'products', 'selling_price', "REAL NOT NULL DEFAULT 0")
 
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS vendors (
@@ -75,8 +115,134 @@ def create_tables():
         FOREIGN KEY (purchase_id) REFERENCES purchases(id)
     )''')
 
-    conn.commit()
-    conn.close()
+def _migration_lookup_indexes(cursor):
+    # Covers get_invoices_by_filter (date range, ordered by date then id) without touching the table.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices (invoice_date, id, buyer_id, invoice_no, taxable_value, total_gst, grand_total)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_buyer_date ON invoices (buyer_id, invoice_date, id, invoice_no, taxable_value, total_gst, grand_total)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice ON invoice_items (invoice_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_purchase_payments_purchase ON purchase_payments (purchase_id, amount)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_purchases_date ON purchases (purchase_date)")
+
+def _migration_invoice_sequences(cursor):
+    # One counter row per (prefix, period); rows are seeded lazily from existing invoices on first use.
+    cursor.execute("CREATE TABLE IF NOT EXISTS invoice_sequences (prefix TEXT NOT NULL, period TEXT NOT NULL DEFAULT '', last_value INTEGER NOT NULL, PRIMARY KEY (prefix, period)) WITHOUT ROWID")
+
+# Full-text indexes over the searchable columns, kept in sync by triggers.
+FTS_COLUMNS = {'products': ('name', 'hsn'), 'buyers': ('name', 'gstin', 'phone'), 'vendors': ('name', 'gstin', 'phone')}
+
+def fts5_available():
+    try:
+        sqlite3.connect(':memory:').execute("CREATE VIRTUAL TABLE fts5_probe USING fts5(x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+def _migration_search_indexes(cursor):
+    # Without FTS5 nothing is created and searches use LIKE; ensure_search_indexes() builds the indexes once it is available.
+    if fts5_available(): _create_search_indexes(cursor)
+
+def _missing_search_indexes(cursor):
+    return [table_name for table_name in FTS_COLUMNS if not cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f"{table_name}_fts",)).fetchone()]
+
+def _create_search_indexes(cursor):
+    for table_name in _missing_search_indexes(cursor):
+        columns = FTS_COLUMNS[table_name]
+        fts, cols = f"{table_name}_fts", ', '.join(columns)
+        new_values, old_values = ', '.join(f"new.{c}" for c in columns), ', '.join(f"old.{c}" for c in columns)
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table_name}', content_rowid='id', prefix='2 3')")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table_name} BEGIN INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_values}); END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table_name} BEGIN INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table_name} BEGIN INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_values}); END")
+        cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+def _migration_sales_rollups(cursor):
+    cursor.execute("CREATE TABLE IF NOT EXISTS sales_daily_buyer (sale_date TEXT NOT NULL, buyer_id INTEGER NOT NULL, invoice_count INTEGER NOT NULL, subtotal REAL NOT NULL, total_discount REAL NOT NULL, taxable_value REAL NOT NULL, total_cgst REAL NOT NULL, total_sgst REAL NOT NULL, total_igst REAL NOT NULL, total_gst REAL NOT NULL, grand_total REAL NOT NULL, PRIMARY KEY (sale_date, buyer_id)) WITHOUT ROWID")
+    cursor.execute("CREATE TABLE IF NOT EXISTS sales_daily_hsn (sale_date TEXT NOT NULL, hsn TEXT NOT NULL, gst_rate REAL NOT NULL, line_count INTEGER NOT NULL, quantity REAL NOT NULL, taxable_value REAL NOT NULL, gst_amount REAL NOT NULL, PRIMARY KEY (sale_date, hsn, gst_rate)) WITHOUT ROWID")
+    _rebuild_rollups(cursor)
+
+def _migration_stock_ledger(cursor):
+    cursor.execute("CREATE TABLE IF NOT EXISTS stock_movements (id INTEGER PRIMARY KEY, product_id INTEGER NOT NULL, movement_date TEXT NOT NULL, kind TEXT NOT NULL, quantity REAL NOT NULL, ref_type TEXT, ref_id INTEGER, created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_movements_product_date ON stock_movements (product_id, movement_date, quantity)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_movements_date ON stock_movements (movement_date, product_id, quantity)")
+    cursor.execute("CREATE TABLE IF NOT EXISTS stock_snapshots (snapshot_date TEXT NOT NULL, product_id INTEGER NOT NULL, quantity REAL NOT NULL, last_movement_id INTEGER NOT NULL, PRIMARY KEY (snapshot_date, product_id)) WITHOUT ROWID")
+    # Seed the ledger from invoice history, with an opening balance that makes it agree with stock_qty today.
+    cursor.execute("INSERT INTO stock_movements (product_id, movement_date, kind, quantity, ref_type, ref_id) SELECT ii.product_id, i.invoice_date, 'sale', -SUM(ii.quantity), 'invoice', i.id FROM invoice_items ii JOIN invoices i ON i.id = ii.invoice_id WHERE ii.product_id IS NOT NULL GROUP BY i.id, ii.product_id")
+    cursor.execute(f"INSERT INTO stock_movements (product_id, movement_date, kind, quantity, ref_type, ref_id) SELECT ii.product_id, i.invoice_date, 'cancellation', SUM(ii.quantity), 'invoice', i.id FROM invoice_items ii JOIN invoices i ON i.id = ii.invoice_id WHERE ii.product_id IS NOT NULL AND i.invoice_no LIKE '{CANCELLED_PREFIX}%' GROUP BY i.id, ii.product_id")
+    opening_date = cursor.execute("SELECT COALESCE(MIN(invoice_date), date('now', 'localtime')) FROM invoices").fetchone()[0]
+    cursor.execute("INSERT INTO stock_movements (product_id, movement_date, kind, quantity) SELECT p.id, ?, 'opening', p.stock_qty - COALESCE((SELECT SUM(m.quantity) FROM stock_movements m WHERE m.product_id = p.id), 0) FROM products p", (opening_date,))
+
+def _migration_exact_gst(cursor):
+    # The HSN rollup's GST used to be an unrounded sum; gst_engine rounds it per line.
+    _rebuild_rollups(cursor)
+
+def _migration_catalog_changes(cursor):
+    cursor.execute("CREATE TABLE IF NOT EXISTS catalog_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, table_name TEXT NOT NULL, record_id INTEGER NOT NULL)")
+    for table_name in CATALOG_TABLES:
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {table_name}_changes_ai AFTER INSERT ON {table_name} BEGIN INSERT INTO catalog_changes (table_name, record_id) VALUES ('{table_name}', new.id); END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {table_name}_changes_ad AFTER DELETE ON {table_name} BEGIN INSERT INTO catalog_changes (table_name, record_id) VALUES ('{table_name}', old.id); END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {table_name}_changes_au AFTER UPDATE ON {table_name} BEGIN INSERT INTO catalog_changes (table_name, record_id) SELECT '{table_name}', new.id UNION SELECT '{table_name}', old.id; END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS catalog_changes_prune AFTER INSERT ON catalog_changes WHEN new.seq % {CATALOG_LOG_PRUNE_EVERY} = 0 BEGIN DELETE FROM catalog_changes WHERE seq <= new.seq - {CATALOG_LOG_KEEP}; END")
+
+def _migration_purchases_page_index(cursor):
+    # get_purchases_page sorts undated purchases as '' so they still have a place in the keyset order.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_purchases_page ON purchases (COALESCE(purchase_date, ''), id)")
+
+MIGRATIONS = [
+    (1, "Base schema", _migration_base_schema),
+    (2, "Indexes for report, invoice item and purchase payment lookups", _migration_lookup_indexes),
+    (3, "Per-prefix invoice number sequences", _migration_invoice_sequences),
+    (4, "Full-text search indexes for products, buyers and vendors", _migration_search_indexes),
+    (5, "Daily sales rollups by buyer and by HSN/GST rate", _migration_sales_rollups),
+    (6, "Stock movement ledger and snapshots", _migration_stock_ledger),
+    (7, "HSN rollup GST rounded per line", _migration_exact_gst),
+    (8, "Change log for products, buyers and vendors", _migration_catalog_changes),
+    (9, "Purchase list index that includes undated purchases", _migration_purchases_page_index),
+]
+
+def get_schema_version():
+    return get_db_connection().execute("PRAGMA user_version").fetchone()[0]
+
+def apply_migrations(target_version=None):
+    """Brings the database up to target_version (default: latest).
+
+    Returns a list of (version, description, seconds) for the migrations applied,
+    so the cost of a migration can be measured against a large database.
+    """
+    conn = get_db_connection(); cursor = conn.cursor()
+    cursor.execute("CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at TEXT NOT NULL, duration_ms REAL)")
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if target_version is not None and version > target_version: break
+        if version <= get_schema_version(): continue
+        started = time.perf_counter()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            migrate(cursor)
+            elapsed = time.perf_counter() - started
+            cursor.execute("INSERT OR REPLACE INTO schema_migrations (version, description, applied_at, duration_ms) VALUES (?, ?, ?, ?)", (version, description, datetime.now().isoformat(timespec='seconds'), elapsed * 1000))
+            cursor.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback(); raise
+        print(f"Applied schema migration {version}: {description} ({elapsed:.3f}s)")
+        applied.append((version, description, elapsed))
+    if applied: cursor.execute("PRAGMA optimize")
+    return applied
+
+def ensure_search_indexes():
+    """Builds the full-text indexes that are missing, e.g. because SQLite lacked FTS5 when migration 4 ran. Returns the tables indexed."""
+    conn = get_db_connection(); cursor = conn.cursor()
+    missing = _missing_search_indexes(cursor)
+    if not missing or not fts5_available(): return []
+    try:
+        cursor.execute("BEGIN IMMEDIATE"); _create_search_indexes(cursor); conn.commit()
+    except Exception:
+        conn.rollback(); raise
+    return missing
+
+def create_tables():
+    apply_migrations()
+    ensure_search_indexes()
 
 # --- FEATURE: Cancel Invoice Function ---
 def cancel_invoice(invoice_id):
@@ -84,16 +250,23 @@ def cancel_invoice(invoice_id):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
+        cursor.execute("BEGIN IMMEDIATE")
+        invoice = cursor.execute("SELECT * FROM invoices WHERE id = ?", (invoice_id,)).fetchone()
+        if invoice is None or invoice['invoice_no'].startswith(CANCELLED_PREFIX):
+            conn.rollback(); return invoice is not None
+
         # Get items from the invoice to restore stock
-        items = cursor.execute("SELECT product_id, quantity FROM invoice_items WHERE invoice_id = ?", (invoice_id,)).fetchall()
-        for item in items:
-            cursor.execute("UPDATE products SET stock_qty = stock_qty + ? WHERE id = ?", (item['quantity'], item['product_id']))
-        
+        items = cursor.execute("SELECT product_id, hsn, gst_rate, quantity, amount FROM invoice_items WHERE invoice_id = ?", (invoice_id,)).fetchall()
+        deltas = _stock_deltas(items)
+        cursor.executemany("UPDATE products SET stock_qty = stock_qty + ? WHERE id = ?", [(qty, product_id) for product_id, qty in deltas.items()])
+        cursor.executemany(_MOVEMENT_INSERT, [(product_id, datetime.now().strftime('%Y-%m-%d'), 'cancellation', qty, 'invoice', invoice_id) for product_id, qty in deltas.items()])
+
+        # Take the invoice back out of the sales rollups
+        _write_rollups(cursor, *_add_to_rollups({}, {}, invoice, items, sign=-1))
+
         # Mark invoice as cancelled
-        cancelled_prefix = "[CANCELLED] "
-        cursor.execute("UPDATE invoices SET grand_total = 0, taxable_value = 0, total_gst = 0, invoice_no = ? || invoice_no WHERE id = ? AND invoice_no NOT LIKE ?", 
-                       (cancelled_prefix, invoice_id, f"{cancelled_prefix}%"))
-        
+        cursor.execute("UPDATE invoices SET grand_total = 0, taxable_value = 0, total_gst = 0, invoice_no = ? || invoice_no WHERE id = ?", (CANCELLED_PREFIX, invoice_id))
+
         conn.commit()
         return True
     except sqlite3.Error as e:
@@ -101,7 +274,7 @@ def cancel_invoice(invoice_id):
         print(f"Database error during cancellation: {e}")
         return False
     finally:
-        conn.close()
+        if conn.in_transaction: conn.rollback()
 
 # --- FEATURE: Purchase Payment Functions ---
 def add_purchase_payment(purchase_id, payment_data):
@@ -140,50 +313,252 @@ def add_purchase_payment(purchase_id, payment_data):
         print(f"Database error adding payment: {e}")
         return False
     finally:
-        conn.close()
+        if conn.in_transaction: conn.rollback()
 
 def get_purchase_details(purchase_id):
     """Fetches full details of a single purchase."""
     return execute_query("SELECT p.*, v.name as vendor_name FROM purchases p JOIN vendors v ON p.vendor_id = v.id WHERE p.id = ?", (purchase_id,), fetchone=True)
 
-# [Rest of the file is unchanged]
-def get_next_invoice_number(prefix="INV-"):
-    conn = get_db_connection(); cursor = conn.cursor()
-    cursor.execute("SELECT invoice_no FROM invoices WHERE invoice_no LIKE ? ORDER BY id DESC LIMIT 1", (f"{prefix}%",))
-    last_invoice = cursor.fetchone(); conn.close()
-    if last_invoice:
-        try:
-            last_num_str = last_invoice['invoice_no'].split(prefix)[-1]
-            if last_num_str.isdigit():
-                return f"{prefix}{int(last_num_str) + 1:04d}"
-        except (ValueError, TypeError, IndexError): pass
-    return f"{prefix}0001"
-def save_invoice(invoice_data, items_data):
+_INVOICE_COLUMNS = ('invoice_no', 'invoice_date', 'buyer_id', 'payment_mode', 'order_ref', 'dispatch_info', 'subtotal', 'total_discount', 'taxable_value', 'total_gst', 'total_cgst', 'total_sgst', 'total_igst', 'freight', 'round_off', 'grand_total')
+_INVOICE_INSERT = f"INSERT INTO invoices ({', '.join(_INVOICE_COLUMNS)}) VALUES ({', '.join('?' * len(_INVOICE_COLUMNS))})"
+_ITEM_INSERT = 'INSERT INTO invoice_items (invoice_id, product_id, description, hsn, gst_rate, quantity, rate, discount_percent, amount) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'
+def _invoice_row(invoice_data):
+    # Summed as Decimals so that e.g. 0.1 + 0.2 is stored as 0.3, not 0.30000000000000004.
+    taxable_value = float(gst_engine.to_decimal(invoice_data['subtotal']) - gst_engine.to_decimal(invoice_data['total_discount']))
+    total_gst = float(sum(gst_engine.to_decimal(invoice_data[field]) for field in ('total_cgst', 'total_sgst', 'total_igst')))
+    return (invoice_data['invoice_no'], invoice_data['invoice_date'], invoice_data['buyer_id'], invoice_data['payment_mode'], invoice_data['order_ref'], invoice_data['dispatch_info'], invoice_data['subtotal'], invoice_data['total_discount'], taxable_value, total_gst, invoice_data['total_cgst'], invoice_data['total_sgst'], invoice_data['total_igst'], invoice_data['freight'], invoice_data['round_off'], invoice_data['grand_total'])
+def _item_row(invoice_id, item):
+    return (invoice_id, item['product_id'], item['description'], item['hsn'], item['gst_rate'], item['quantity'], item['rate'], item['discount_percent'], item['amount'])
+def _stock_deltas(items_data, deltas=None):
+    """Sums item quantities per product so stock is updated once per product."""
+    deltas = {} if deltas is None else deltas
+    for item in items_data: deltas[item['product_id']] = deltas.get(item['product_id'], 0) + item['quantity']
+    return deltas
+# --- Invoice Numbering ---
+# Numbers come from the invoice_sequences counter table, bumped inside the saving
+# transaction, so allocation is O(1) and two terminals never get the same number.
+# With number_reset='fiscal_year' the counter restarts every April and the number
+# carries the fiscal year, e.g. INV-2025-26/0001.
+CANCELLED_PREFIX = "[CANCELLED] "
+
+def fiscal_year(invoice_date):
+    """Indian fiscal year (April-March) of a 'YYYY-MM-DD' date, as '2025-26'."""
+    year, month = int(invoice_date[:4]), int(invoice_date[5:7])
+    start = year if month >= 4 else year - 1
+    return f"{start}-{(start + 1) % 100:02d}"
+
+def _sequence_period(number_reset, invoice_date):
+    if number_reset == 'fiscal_year': return fiscal_year(invoice_date or datetime.now().strftime('%Y-%m-%d'))
+    return ''
+
+def _format_invoice_number(prefix, period, value):
+    return f"{prefix}{period}/{value:04d}" if period else f"{prefix}{value:04d}"
+
+def _legacy_last_sequence(cursor, prefix, period):
+    """Highest number already issued for prefix/period, found by scanning invoices (cancelled ones included)."""
+    base = _format_invoice_number(prefix, period, 0)[:-4]; last = 0
+    for row in cursor.execute("SELECT invoice_no FROM invoices WHERE invoice_no LIKE ? OR invoice_no LIKE ?", (f"{base}%", f"{CANCELLED_PREFIX}{base}%")):
+        suffix = row['invoice_no'][len(CANCELLED_PREFIX):] if row['invoice_no'].startswith(CANCELLED_PREFIX) else row['invoice_no']
+        suffix = suffix[len(base):]
+        if suffix.isdigit(): last = max(last, int(suffix))
+    return last
+
+def _last_sequence_value(cursor, prefix, period):
+    row = cursor.execute("SELECT last_value FROM invoice_sequences WHERE prefix = ? AND period = ?", (prefix, period)).fetchone()
+    return row['last_value'] if row else None
+
+def _reserve_invoice_numbers(cursor, prefix, period, count=1):
+    """Bumps the counter by count and returns the first reserved value. Call inside a write transaction."""
+    if _last_sequence_value(cursor, prefix, period) is None:
+        cursor.execute("INSERT INTO invoice_sequences (prefix, period, last_value) VALUES (?, ?, ?)", (prefix, period, _legacy_last_sequence(cursor, prefix, period)))
+    cursor.execute("UPDATE invoice_sequences SET last_value = last_value + ? WHERE prefix = ? AND period = ?", (count, prefix, period))
+    return _last_sequence_value(cursor, prefix, period) - count + 1
+
+def _allocate_invoice_number(cursor, prefix, number_reset, invoice_date):
+    period = _sequence_period(number_reset, invoice_date)
+    while True:
+        invoice_no = _format_invoice_number(prefix, period, _reserve_invoice_numbers(cursor, prefix, period))
+        # Skip numbers that were entered by hand before the counter existed.
+        if not cursor.execute("SELECT 1 FROM invoices WHERE invoice_no = ?", (invoice_no,)).fetchone(): return invoice_no
+
+def get_next_invoice_number(prefix="INV-", number_reset='never', invoice_date=None):
+    """Previews the number the next saved invoice will most likely get; it is only reserved by save_invoice."""
+    cursor = get_db_connection().cursor(); period = _sequence_period(number_reset, invoice_date)
+    last_value = _last_sequence_value(cursor, prefix, period)
+    if last_value is None: last_value = _legacy_last_sequence(cursor, prefix, period)
+    return _format_invoice_number(prefix, period, last_value + 1)
+def save_invoice(invoice_data, items_data, prefix=None, number_reset='never'):
+    """Saves an invoice and deducts stock. With prefix, the invoice number is allocated here, ignoring invoice_data['invoice_no']."""
     conn = get_db_connection(); cursor = conn.cursor()
-    taxable_value = invoice_data['subtotal'] - invoice_data['total_discount']
-    total_gst = invoice_data['total_cgst'] + invoice_data['total_sgst'] + invoice_data['total_igst']
     try:
-        cursor.execute('INSERT INTO invoices (invoice_no, invoice_date, buyer_id, payment_mode, order_ref, dispatch_info, subtotal, total_discount, taxable_value, total_gst, total_cgst, total_sgst, total_igst, freight, round_off, grand_total) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',(invoice_data['invoice_no'], invoice_data['invoice_date'], invoice_data['buyer_id'], invoice_data['payment_mode'], invoice_data['order_ref'], invoice_data['dispatch_info'], invoice_data['subtotal'], invoice_data['total_discount'], taxable_value, total_gst, invoice_data['total_cgst'], invoice_data['total_sgst'], invoice_data['total_igst'], invoice_data['freight'], invoice_data['round_off'], invoice_data['grand_total']))
+        cursor.execute("BEGIN IMMEDIATE")
+        if prefix is not None:
+            invoice_data = dict(invoice_data, invoice_no=_allocate_invoice_number(cursor, prefix, number_reset, invoice_data['invoice_date']))
+        invoice_row = _invoice_row(invoice_data)
+        cursor.execute(_INVOICE_INSERT, invoice_row)
         invoice_id = cursor.lastrowid
-        for item in items_data:
-            cursor.execute('INSERT INTO invoice_items (invoice_id, product_id, description, hsn, gst_rate, quantity, rate, discount_percent, amount) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',(invoice_id, item['product_id'], item['description'], item['hsn'], item['gst_rate'], item['quantity'], item['rate'], item['discount_percent'], item['amount']))
-            cursor.execute("UPDATE products SET stock_qty = stock_qty - ? WHERE id = ?", (item['quantity'], item['product_id']))
+        cursor.executemany(_ITEM_INSERT, [_item_row(invoice_id, item) for item in items_data])
+        deltas = _stock_deltas(items_data)
+        cursor.executemany("UPDATE products SET stock_qty = stock_qty - ? WHERE id = ?", [(qty, product_id) for product_id, qty in deltas.items()])
+        cursor.executemany(_MOVEMENT_INSERT, [(product_id, invoice_data['invoice_date'], 'sale', -qty, 'invoice', invoice_id) for product_id, qty in deltas.items()])
+        _write_rollups(cursor, *_add_to_rollups({}, {}, dict(zip(_INVOICE_COLUMNS, invoice_row)), items_data))
         conn.commit(); return invoice_id
     except sqlite3.Error as e:
         conn.rollback(); print(f"Database error: {e}"); return None
-    finally: conn.close()
+    finally:
+        if conn.in_transaction: conn.rollback()
+
+# --- FEATURE: Bulk Invoice Import ---
+BULK_BATCH_SIZE = 1000
+_BULK_INVOICE_DEFAULTS = {'payment_mode': '', 'order_ref': '', 'dispatch_info': '', 'total_discount': 0.0, 'freight': 0.0, 'round_off': 0.0}
+_BULK_AMOUNT_FIELDS = ('subtotal', 'total_discount', 'total_cgst', 'total_sgst', 'total_igst', 'freight', 'round_off', 'grand_total')
+# A reader that cannot parse a record still yields one, with the reason under this key, so it is reported as failed in its place.
+BULK_ERROR_KEY = 'import_error'
+
+def _prepare_bulk_record(record, buyers_by_name, products_by_name, products_by_id):
+    """Turns one import record into (invoice_data, items_data), raising ValueError/KeyError/TypeError on bad input.
+
+    Buyers may be given by buyer_id or buyer_name and items by product_id or
+    product name (description); missing HSN/GST rate/amount come from the product.
+    """
+    if not isinstance(record, dict): raise TypeError(f"Record must be an object, not {type(record).__name__}")
+    if record.get(BULK_ERROR_KEY): raise ValueError(record[BULK_ERROR_KEY])
+    invoice_data = dict(_BULK_INVOICE_DEFAULTS); invoice_data.update({k: v for k, v in record.items() if k != 'items' and v is not None})
+    if not invoice_data.get('buyer_id'):
+        buyer_id = buyers_by_name.get(record.get('buyer_name'))
+        if buyer_id is None: raise ValueError(f"Unknown buyer '{record.get('buyer_name')}'")
+        invoice_data['buyer_id'] = buyer_id
+    for key in ('invoice_date', 'subtotal', 'total_cgst', 'total_sgst', 'total_igst', 'grand_total'):
+        if key not in invoice_data: raise KeyError(key)
+    datetime.strptime(invoice_data['invoice_date'], '%Y-%m-%d')
+    for key in _BULK_AMOUNT_FIELDS: invoice_data[key] = float(gst_engine.to_decimal(invoice_data[key]))
+    items_data = []
+    for item in record.get('items') or []:
+        if not isinstance(item, dict): raise TypeError(f"Item must be an object, not {type(item).__name__}")
+        product = products_by_id.get(item.get('product_id')) or products_by_name.get(item.get('description') or item.get('product'))
+        if product is None: raise ValueError(f"Unknown product '{item.get('description') or item.get('product') or item.get('product_id')}'")
+        quantity = float(item['quantity']); rate = float(item['rate']); discount_percent = float(item.get('discount_percent') or 0)
+        amount = item.get('amount')
+        if amount is None: amount = gst_engine.line_totals(quantity, rate, discount_percent)['taxable_value']
+        gst_rate = item.get('gst_rate')
+        items_data.append({'product_id': product['id'], 'description': item.get('description') or product['name'], 'hsn': item.get('hsn') or product['hsn'], 'gst_rate': float(product['gst_rate'] if gst_rate is None else gst_rate), 'quantity': quantity, 'rate': rate, 'discount_percent': discount_percent, 'amount': float(amount)})
+    if not items_data: raise ValueError("Invoice has no items")
+    return invoice_data, items_data
+
+def _save_invoice_batch(conn, batch, prefix, number_reset, lookups, result):
+    cursor = conn.cursor(); saved = []; deltas = {}; next_values = {}; buyer_totals = {}; hsn_totals = {}; first_error = len(result['errors'])
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        for index, record in batch:
+            try:
+                invoice_data, items_data = _prepare_bulk_record(record, *lookups)
+                auto_number = not invoice_data.get('invoice_no')
+                period = _sequence_period(number_reset, invoice_data['invoice_date']) if auto_number else None
+            except (KeyError, ValueError, TypeError, ArithmeticError) as e:
+                result['errors'].append((index, record.get('invoice_no') if isinstance(record, dict) else None, f"Invalid record: {e!r}")); continue
+            # The batch numbers locally and writes each counter back once, under the write lock.
+            if auto_number and period not in next_values: next_values[period] = _reserve_invoice_numbers(cursor, prefix, period, 0)
+            # Each record is written under its own savepoint, so one the database rejects is undone alone.
+            cursor.execute("SAVEPOINT bulk_record")
+            try:
+                while True:
+                    if auto_number:
+                        invoice_data['invoice_no'] = _format_invoice_number(prefix, period, next_values[period]); next_values[period] += 1
+                    try:
+                        invoice_row = _invoice_row(invoice_data)
+                        cursor.execute(_INVOICE_INSERT, invoice_row); break
+                    except sqlite3.IntegrityError as e:
+                        if not auto_number or 'invoice_no' not in str(e): raise
+                invoice_id = cursor.lastrowid
+                cursor.executemany(_ITEM_INSERT, [_item_row(invoice_id, item) for item in items_data])
+                cursor.executemany(_MOVEMENT_INSERT, [(product_id, invoice_data['invoice_date'], 'sale', -qty, 'invoice', invoice_id) for product_id, qty in _stock_deltas(items_data).items()])
+            except sqlite3.Error as e:
+                cursor.execute("ROLLBACK TO bulk_record"); cursor.execute("RELEASE bulk_record")
+                if auto_number: next_values[period] -= 1  # the number it was given is free again
+                result['errors'].append((index, invoice_data.get('invoice_no'), str(e))); continue
+            cursor.execute("RELEASE bulk_record")
+            _stock_deltas(items_data, deltas)
+            _add_to_rollups(buyer_totals, hsn_totals, dict(zip(_INVOICE_COLUMNS, invoice_row)), items_data)
+            saved.append((index, invoice_id, invoice_data['invoice_no']))
+        cursor.executemany("UPDATE products SET stock_qty = stock_qty - ? WHERE id = ?", [(qty, product_id) for product_id, qty in deltas.items()])
+        cursor.executemany("UPDATE invoice_sequences SET last_value = ? WHERE prefix = ? AND period = ?", [(next_value - 1, prefix, period) for period, next_value in next_values.items()])
+        _write_rollups(cursor, buyer_totals, hsn_totals)
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        reported = {index for index, _, _ in result['errors'][first_error:]}
+        result['errors'].extend((index, record.get('invoice_no') if isinstance(record, dict) else None, f"Batch rolled back: {e}") for index, record in batch if index not in reported)
+        return
+    result['saved'].extend(saved)
+
+def save_invoices_bulk(invoices, prefix="INV-", batch_size=BULK_BATCH_SIZE, progress=None, number_reset='never'):
+    """Saves an iterable of invoice records in batched transactions.
+
+    Each record is an invoice_data dict with an 'items' list (see
+    _prepare_bulk_record). Records without an invoice_no get the next numbers
+    for prefix. Records are consumed lazily, so a generator over a large export
+    is never held in memory. A bad record is reported and skipped without
+    affecting the rest of its batch.
+
+    Returns {'saved': [(index, invoice_id, invoice_no)], 'errors': [(index, invoice_no, message)]},
+    where index is the record's position in the input.
+    """
+    conn = get_db_connection()
+    buyers_by_name = {row['name']: row['id'] for row in conn.execute("SELECT id, name FROM buyers")}
+    products_by_id = {row['id']: dict(row) for row in conn.execute("SELECT id, name, hsn, gst_rate FROM products")}
+    products_by_name = {product['name']: product for product in products_by_id.values()}
+    lookups = (buyers_by_name, products_by_name, products_by_id)
+    result = {'saved': [], 'errors': []}; batch = []
+    try:
+        for index, record in enumerate(invoices):
+            batch.append((index, record))
+            if len(batch) >= batch_size:
+                _save_invoice_batch(conn, batch, prefix, number_reset, lookups, result); batch = []
+                if progress: progress(len(result['saved']), len(result['errors']))
+        if batch:
+            _save_invoice_batch(conn, batch, prefix, number_reset, lookups, result)
+            if progress: progress(len(result['saved']), len(result['errors']))
+    finally:
+        if conn.in_transaction: conn.rollback()
+    return result
+
 def get_full_invoice_details(invoice_id):
     conn = get_db_connection(); cursor = conn.cursor()
     invoice_details = cursor.execute('SELECT i.*, b.name as buyer_name, b.gstin as buyer_gstin, b.address as buyer_address, b.state as buyer_state FROM invoices i JOIN buyers b ON i.buyer_id = b.id WHERE i.id = ?', (invoice_id,)).fetchone()
-    if not invoice_details: conn.close(); return None, []
+    if not invoice_details: return None, []
     items = cursor.execute('SELECT ii.* FROM invoice_items ii WHERE ii.invoice_id = ?', (invoice_id,)).fetchall()
-    conn.close(); return dict(invoice_details), [dict(item) for item in items]
-def get_invoices_by_filter(start_date, end_date, buyer_id=None):
+    return dict(invoice_details), [dict(item) for item in items]
+INVOICE_DETAILS_CHUNK_SIZE = 500  # ids per IN (...) list, well under SQLite's bound-parameter limit
+def get_full_invoice_details_bulk(invoice_ids, chunk_size=INVOICE_DETAILS_CHUNK_SIZE):
+    """Yields get_full_invoice_details(id) for each id in order, ((None, []) for missing ones), with two queries per chunk of ids."""
+    cursor = get_db_connection().cursor(); invoice_ids = list(invoice_ids)
+    cursor.row_factory = None  # plain tuples zipped into dicts: about twice as fast as dict(sqlite3.Row)
+    for start in range(0, len(invoice_ids), chunk_size):
+        chunk = invoice_ids[start:start + chunk_size]; placeholders = ', '.join('?' * len(chunk))
+        cursor.execute(f'SELECT i.*, b.name as buyer_name, b.gstin as buyer_gstin, b.address as buyer_address, b.state as buyer_state FROM invoices i JOIN buyers b ON i.buyer_id = b.id WHERE i.id IN ({placeholders})', chunk)
+        columns = [d[0] for d in cursor.description]
+        headers = {header['id']: header for header in (dict(zip(columns, row)) for row in cursor)}
+        cursor.execute(f'SELECT ii.* FROM invoice_items ii WHERE ii.invoice_id IN ({placeholders}) ORDER BY ii.invoice_id, ii.id', chunk)
+        columns = [d[0] for d in cursor.description]; items = {}
+        for item in cursor:
+            item = dict(zip(columns, item)); items.setdefault(item['invoice_id'], []).append(item)
+        for invoice_id in chunk:
+            yield headers.get(invoice_id), (items.get(invoice_id, []) if invoice_id in headers else [])
+def _invoice_filter_query(start_date, end_date, buyer_id=None):
     query = 'SELECT i.id, i.invoice_no, i.invoice_date, b.name as buyer_name, i.taxable_value, i.total_gst, i.grand_total FROM invoices i JOIN buyers b ON i.buyer_id = b.id WHERE i.invoice_date BETWEEN ? AND ?'
     params = [start_date, end_date]
     if buyer_id: query += " AND i.buyer_id = ?"; params.append(buyer_id)
-    query += " ORDER BY i.invoice_date, i.id"
-    return execute_query(query, params, fetchall=True)
+    return query + " ORDER BY i.invoice_date, i.id", params
+def get_invoices_by_filter(start_date, end_date, buyer_id=None):
+    return execute_query(*_invoice_filter_query(start_date, end_date, buyer_id), fetchall=True)
+def iter_invoices_by_filter(start_date, end_date, buyer_id=None, chunk_size=500):
+    """Same rows as get_invoices_by_filter, read chunk_size at a time; the query runs on the first next() in the consuming thread."""
+    cursor = get_db_connection().cursor()
+    try:
+        cursor.execute(*_invoice_filter_query(start_date, end_date, buyer_id))
+        while rows := cursor.fetchmany(chunk_size): yield from rows
+    finally:
+        cursor.close()
 def get_all_purchases_with_vendor():
     return execute_query("SELECT p.id, v.name, p.bill_no, p.purchase_date, p.total_amount, p.amount_paid, p.payment_status FROM purchases p JOIN vendors v ON p.vendor_id = v.id ORDER BY p.purchase_date DESC", fetchall=True)
 def execute_query(query, params=(), fetchone=False, fetchall=False, commit=False):
@@ -195,7 +570,6 @@ def execute_query(query, params=(), fetchone=False, fetchall=False, commit=False
         if fetchall: return cursor.fetchall()
     except sqlite3.Error as e:
         print(f"Database error: {e}"); conn.rollback(); return None
-    finally: conn.close()
 def get_all(table_name): return execute_query(f"SELECT * FROM {table_name} ORDER BY name", fetchall=True)
 def get_by_id(table_name, record_id): return execute_query(f"SELECT * FROM {table_name} WHERE id = ?", (record_id,), fetchone=True)
 def add_record(table_name, data_dict):
@@ -207,14 +581,337 @@ def update_record(table_name, record_id, data_dict):
     query = f"UPDATE {table_name} SET {set_clause} WHERE id = ?"
     return execute_query(query, tuple(data_dict.values()) + (record_id,), commit=True)
 def delete_record(table_name, record_id): execute_query(f"DELETE FROM {table_name} WHERE id = ?", (record_id,), commit=True)
-def daily_backup():
-    if not os.path.exists(DB_FILE): return
-    os.makedirs(BACKUP_DIR, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y-%m-%d")
-    backup_file = os.path.join(BACKUP_DIR, f"backup_{timestamp}.db")
-    if not os.path.exists(backup_file):
-        try:
-            shutil.copy2(DB_FILE, backup_file)
-            print(f"Database backup created: {backup_file}")
-        except Exception as e:
-            print(f"Failed to create backup: {e}")
\ No newline at end of file
+
+# --- Keyset Pagination ---
+# Pages are addressed by the (sort value, id) of the last row already shown, so
+# fetching page N costs the same as page 1 regardless of table size.
+PAGE_SIZE = 200
+_table_columns = {}
+
+def _columns_of(table_name):
+    if table_name not in _table_columns:
+        _table_columns[table_name] = [row['name'] for row in get_db_connection().execute(f"PRAGMA table_info({table_name})")]
+    if not _table_columns[table_name]: raise ValueError(f"Unknown table '{table_name}'")
+    return _table_columns[table_name]
+
+def _keyset_page(select, where, params, key_columns, after_key=None, before_key=None, limit=PAGE_SIZE, descending=False):
+    """Runs select/where ordered by key_columns, returning the page after after_key or before before_key."""
+    where = list(where); params = list(params); backwards = before_key is not None
+    key = before_key if backwards else after_key
+    if key is not None:
+        op = '<' if backwards != descending else '>'
+        # The bound on the first column alone is implied, but lets SQLite seek an index on an expression key, which it won't do from the row value.
+        where.append(f"{key_columns[0]} {op}= ? AND ({', '.join(key_columns)}) {op} ({', '.join('?' * len(key_columns))})"); params.extend([key[0], *key])
+    direction = 'DESC' if backwards != descending else 'ASC'
+    query = select + (f" WHERE {' AND '.join(where)}" if where else '') + f" ORDER BY {', '.join(f'{col} {direction}' for col in key_columns)} LIMIT ?"
+    rows = execute_query(query, params + [limit], fetchall=True) or []
+    return rows[::-1] if backwards else rows
+
+def get_page(table_name, after_key=None, before_key=None, limit=PAGE_SIZE, order='name', search=None):
+    """One page of table_name ordered by (order, id); keys are (order value, id) tuples.
+
+    search, if given, filters the FTS_COLUMNS of the table with LIKE.
+    """
+    columns = _columns_of(table_name)
+    if order not in columns: raise ValueError(f"Unknown column '{order}' for {table_name}")
+    where, params = [], []
+    if search:
+        search_columns = FTS_COLUMNS.get(table_name, ('name',))
+        where.append('(' + ' OR '.join(f"{col} LIKE ?" for col in search_columns) + ')'); params.extend([f'%{search}%'] * len(search_columns))
+    return _keyset_page(f"SELECT * FROM {table_name}", where, params, [order, 'id'], after_key, before_key, limit)
+
+def get_invoices_page(start_date, end_date, buyer_id=None, after_key=None, before_key=None, limit=PAGE_SIZE):
+    """Page of get_invoices_by_filter; keys are (invoice_date, id)."""
+    where, params = ["i.invoice_date BETWEEN ? AND ?"], [start_date, end_date]
+    if buyer_id: where.append("i.buyer_id = ?"); params.append(buyer_id)
+    return _keyset_page('SELECT i.id, i.invoice_no, i.invoice_date, b.name as buyer_name, i.taxable_value, i.total_gst, i.grand_total FROM invoices i JOIN buyers b ON i.buyer_id = b.id', where, params, ['i.invoice_date', 'i.id'], after_key, before_key, limit)
+
+def get_purchases_page(after_key=None, before_key=None, limit=PAGE_SIZE):
+    """Page of get_all_purchases_with_vendor, newest first; keys are (purchase_date or '', id), so undated purchases come last."""
+    return _keyset_page("SELECT p.id, v.name, p.bill_no, p.purchase_date, p.total_amount, p.amount_paid, p.payment_status FROM purchases p JOIN vendors v ON p.vendor_id = v.id", [], [], ["COALESCE(p.purchase_date, '')", 'p.id'], after_key, before_key, limit, descending=True)
+
+# --- Full-Text Search ---
+SEARCH_LIMIT = 200
+
+def _fts_query(search_term):
+    """Turns free text into an FTS5 query where every word must match as a prefix."""
+    return ' '.join('"' + token.replace('"', '""') + '"*' for token in search_term.split())
+
+def search_records(table_name, search_term, limit=SEARCH_LIMIT):
+    """Best-ranked rows of products/buyers/vendors matching search_term, at most limit of them.
+
+    Uses the FTS5 index when present and falls back to a LIKE scan otherwise.
+    """
+    if table_name not in FTS_COLUMNS: raise ValueError(f"'{table_name}' is not searchable")
+    if not search_term.split(): return get_page(table_name, limit=limit)
+    if not execute_query("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f"{table_name}_fts",), fetchone=True):
+        return get_page(table_name, limit=limit, search=search_term)
+    query = f"SELECT t.* FROM {table_name}_fts f JOIN {table_name} t ON t.id = f.rowid WHERE {table_name}_fts MATCH ? ORDER BY f.rank LIMIT ?"
+    return execute_query(query, (_fts_query(search_term), limit), fetchall=True) or []
+
+# --- Sales Rollups ---
+# sales_daily_buyer and sales_daily_hsn hold per-day totals, updated in the same
+# transaction as save_invoice/save_invoices_bulk and reversed by cancel_invoice,
+# so period totals never have to scan invoices. Cancelled invoices count for nothing.
+_BUYER_ROLLUP_FIELDS = ('subtotal', 'total_discount', 'taxable_value', 'total_cgst', 'total_sgst', 'total_igst', 'total_gst', 'grand_total')
+_HSN_ROLLUP_FIELDS = ('line_count', 'quantity', 'taxable_value', 'gst_amount')
+
+def _add_to_rollups(buyer_totals, hsn_totals, invoice, items, sign=1):
+    """Accumulates one invoice's contribution (or, with sign=-1, its reversal) into the two dicts."""
+    totals = buyer_totals.setdefault((invoice['invoice_date'], invoice['buyer_id']), [0] * (1 + len(_BUYER_ROLLUP_FIELDS)))
+    for i, value in enumerate([1] + [invoice[field] or 0 for field in _BUYER_ROLLUP_FIELDS]): totals[i] += sign * value
+    for item in items:
+        totals = hsn_totals.setdefault((invoice['invoice_date'], item['hsn'] or '', item['gst_rate'] or 0), [0] * len(_HSN_ROLLUP_FIELDS))
+        for i, value in enumerate((1, item['quantity'], item['amount'], float(gst_engine.line_gst(item['amount'], item['gst_rate'])))): totals[i] += sign * value
+    return buyer_totals, hsn_totals
+
+def _write_rollups(cursor, buyer_totals, hsn_totals):
+    fields = ('invoice_count',) + _BUYER_ROLLUP_FIELDS
+    cursor.executemany(f"INSERT INTO sales_daily_buyer (sale_date, buyer_id, {', '.join(fields)}) VALUES (?, ?, {', '.join('?' * len(fields))}) ON CONFLICT (sale_date, buyer_id) DO UPDATE SET {', '.join(f'{f} = {f} + excluded.{f}' for f in fields)}",
+                       [key + tuple(values) for key, values in buyer_totals.items()])
+    cursor.executemany(f"INSERT INTO sales_daily_hsn (sale_date, hsn, gst_rate, {', '.join(_HSN_ROLLUP_FIELDS)}) VALUES (?, ?, ?, {', '.join('?' * len(_HSN_ROLLUP_FIELDS))}) ON CONFLICT (sale_date, hsn, gst_rate) DO UPDATE SET {', '.join(f'{f} = {f} + excluded.{f}' for f in _HSN_ROLLUP_FIELDS)}",
+                       [key + tuple(values) for key, values in hsn_totals.items()])
+
+_ROLLUP_SOURCES = {
+    'sales_daily_buyer': f"SELECT invoice_date, buyer_id, COUNT(*), {', '.join(f'SUM({f})' for f in _BUYER_ROLLUP_FIELDS)} FROM invoices WHERE invoice_no NOT LIKE '{CANCELLED_PREFIX}%' GROUP BY invoice_date, buyer_id",
+    'sales_daily_hsn': f"SELECT i.invoice_date, COALESCE(ii.hsn, ''), COALESCE(ii.gst_rate, 0), COUNT(*), SUM(ii.quantity), SUM(ii.amount), SUM(gst_line_tax(ii.amount, ii.gst_rate)) FROM invoice_items ii JOIN invoices i ON i.id = ii.invoice_id WHERE i.invoice_no NOT LIKE '{CANCELLED_PREFIX}%' GROUP BY 1, 2, 3",
+}
+
+def _rebuild_rollups(cursor):
+    for table_name, source in _ROLLUP_SOURCES.items():
+        cursor.execute(f"DELETE FROM {table_name}")
+        cursor.execute(f"INSERT INTO {table_name} {source}")
+
+def rebuild_rollups():
+    """Recomputes both rollup tables from invoices and invoice_items."""
+    conn = get_db_connection(); cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE"); _rebuild_rollups(cursor); conn.commit()
+    except Exception:
+        conn.rollback(); raise
+
+def check_rollups(tolerance=0.005):
+    """Compares the rollups with a fresh aggregation; returns a list of (table, key, stored, expected) mismatches."""
+    conn = get_db_connection(); mismatches = []
+    for table_name, source in _ROLLUP_SOURCES.items():
+        key_size, zero = (2, (0,) * (1 + len(_BUYER_ROLLUP_FIELDS))) if table_name == 'sales_daily_buyer' else (3, (0,) * len(_HSN_ROLLUP_FIELDS))
+        expected = {tuple(row[:key_size]): tuple(row[key_size:]) for row in conn.execute(source)}
+        stored = {tuple(row[:key_size]): tuple(row[key_size:]) for row in conn.execute(f"SELECT * FROM {table_name}")}
+        for key in expected.keys() | stored.keys():
+            have, want = stored.get(key, zero), expected.get(key, zero)
+            if any(abs((a or 0) - (b or 0)) > tolerance for a, b in zip(have, want)):
+                mismatches.append((table_name, key, have, want))
+    return mismatches
+
+def get_sales_totals(start_date, end_date, buyer_id=None):
+    """Period totals from the daily rollup: invoice_count plus every _BUYER_ROLLUP_FIELDS sum."""
+    fields = ('invoice_count',) + _BUYER_ROLLUP_FIELDS
+    query = f"SELECT {', '.join(f'COALESCE(SUM({f}), 0) AS {f}' for f in fields)} FROM sales_daily_buyer WHERE sale_date BETWEEN ? AND ?"
+    params = [start_date, end_date]
+    if buyer_id: query += " AND buyer_id = ?"; params.append(buyer_id)
+    return dict(execute_query(query, params, fetchone=True))
+
+def get_daily_sales(start_date, end_date, buyer_id=None):
+    """Per-day totals for charts: (sale_date, invoice_count, taxable_value, total_gst, grand_total)."""
+    query = "SELECT sale_date, SUM(invoice_count) AS invoice_count, SUM(taxable_value) AS taxable_value, SUM(total_gst) AS total_gst, SUM(grand_total) AS grand_total FROM sales_daily_buyer WHERE sale_date BETWEEN ? AND ?"
+    params = [start_date, end_date]
+    if buyer_id: query += " AND buyer_id = ?"; params.append(buyer_id)
+    return execute_query(query + " GROUP BY sale_date ORDER BY sale_date", params, fetchall=True)
+
+def get_hsn_sales(start_date, end_date):
+    """HSN/GST-rate totals for the period from the daily HSN rollup."""
+    return execute_query("SELECT hsn, gst_rate, SUM(line_count) AS line_count, SUM(quantity) AS quantity, SUM(taxable_value) AS taxable_value, SUM(gst_amount) AS gst_amount FROM sales_daily_hsn WHERE sale_date BETWEEN ? AND ? GROUP BY hsn, gst_rate ORDER BY hsn, gst_rate", (start_date, end_date), fetchall=True)
+
+# --- Stock Ledger ---
+# Every stock change is appended to stock_movements next to the in-place
+# products.stock_qty update. stock_snapshots holds the stock of every product at
+# the end of a date, plus the last movement id it covered, so stock at any date
+# is one snapshot plus a bounded number of later movements.
+_MOVEMENT_INSERT = "INSERT INTO stock_movements (product_id, movement_date, kind, quantity, ref_type, ref_id) VALUES (?, ?, ?, ?, ?, ?)"
+
+def add_product(data_dict, opening_qty=0.0, rate=0.0, movement_date=None):
+    """Inserts a product with its opening stock and records the opening movement."""
+    conn = get_db_connection(); cursor = conn.cursor()
+    data = dict(data_dict, stock_qty=opening_qty, rate=rate)
+    try:
+        cursor.execute(f"INSERT INTO products ({', '.join(data)}) VALUES ({', '.join('?' * len(data))})", tuple(data.values()))
+        product_id = cursor.lastrowid
+        if opening_qty: cursor.execute(_MOVEMENT_INSERT, (product_id, movement_date or datetime.now().strftime('%Y-%m-%d'), 'opening', opening_qty, None, None))
+        conn.commit(); return product_id
+    except sqlite3.Error as e:
+        conn.rollback(); print(f"Database error: {e}"); return None
+    finally:
+        if conn.in_transaction: conn.rollback()
+
+def adjust_stock(product_id, quantity, kind='adjustment', purchase_rate=None, movement_date=None, ref_type=None, ref_id=None):
+    """Changes stock by quantity (negative to reduce) and records the movement.
+
+    With purchase_rate, incoming stock also updates the weighted average cost (rate).
+    """
+    conn = get_db_connection(); cursor = conn.cursor()
+    try:
+        if purchase_rate is not None:
+            cursor.execute("UPDATE products SET rate = CASE WHEN stock_qty + ? > 0 THEN (stock_qty * rate + ? * ?) / (stock_qty + ?) ELSE 0 END, stock_qty = stock_qty + ? WHERE id = ?", (quantity, quantity, purchase_rate, quantity, quantity, product_id))
+        else:
+            cursor.execute("UPDATE products SET stock_qty = stock_qty + ? WHERE id = ?", (quantity, product_id))
+        cursor.execute(_MOVEMENT_INSERT, (product_id, movement_date or datetime.now().strftime('%Y-%m-%d'), kind, quantity, ref_type, ref_id))
+        conn.commit(); return True
+    except sqlite3.Error as e:
+        conn.rollback(); print(f"Database error: {e}"); return False
+    finally:
+        if conn.in_transaction: conn.rollback()
+
+def receive_stock(product_id, quantity, purchase_rate, movement_date=None, ref_type=None, ref_id=None):
+    return adjust_stock(product_id, quantity, 'purchase', purchase_rate, movement_date, ref_type, ref_id)
+
+def _latest_snapshot(cursor, as_of_date):
+    row = cursor.execute("SELECT snapshot_date, MAX(last_movement_id) FROM stock_snapshots WHERE snapshot_date = (SELECT MAX(snapshot_date) FROM stock_snapshots WHERE snapshot_date <= ?)", (as_of_date,)).fetchone()
+    return (row[0], row[1]) if row and row[0] else ('', 0)
+
+def get_stock_as_of(as_of_date, product_id=None):
+    """{product_id: quantity} at the end of as_of_date ('YYYY-MM-DD'), for one product or all.
+
+    Reads the latest snapshot on or before the date, then adds movements dated
+    after it plus any back-dated movements recorded after it was taken.
+    """
+    cursor = get_db_connection().cursor()
+    snapshot_date, last_movement_id = _latest_snapshot(cursor, as_of_date)
+    product_filter = " AND product_id = ?" if product_id is not None else ""
+    extra = (product_id,) if product_id is not None else ()
+    query = f"""SELECT product_id, SUM(quantity) FROM (
+        SELECT product_id, quantity FROM stock_snapshots WHERE snapshot_date = ?{product_filter}
+        UNION ALL SELECT product_id, quantity FROM stock_movements WHERE movement_date > ? AND movement_date <= ?{product_filter}
+        UNION ALL SELECT product_id, quantity FROM stock_movements WHERE id > ? AND movement_date <= ?{product_filter}
+    ) GROUP BY product_id"""
+    params = (snapshot_date,) + extra + (snapshot_date, as_of_date) + extra + (last_movement_id, snapshot_date) + extra
+    return {row[0]: row[1] for row in cursor.execute(query, params)}
+
+def create_stock_snapshot(snapshot_date):
+    """Stores every product's stock at the end of snapshot_date; returns the number of rows written."""
+    conn = get_db_connection(); cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        last_movement_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM stock_movements").fetchone()[0]
+        quantities = get_stock_as_of(snapshot_date)
+        cursor.execute("DELETE FROM stock_snapshots WHERE snapshot_date = ?", (snapshot_date,))
+        cursor.executemany("INSERT INTO stock_snapshots (snapshot_date, product_id, quantity, last_movement_id) VALUES (?, ?, ?, ?)", [(snapshot_date, pid, qty, last_movement_id) for pid, qty in quantities.items()])
+        conn.commit(); return len(quantities)
+    except Exception:
+        conn.rollback(); raise
+
+def ensure_stock_snapshots(today=None):
+    """Takes the month-end snapshots that are missing for completed months; cheap when up to date."""
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    cursor = get_db_connection().cursor()
+    last = cursor.execute("SELECT MAX(snapshot_date) FROM stock_snapshots").fetchone()[0]
+    start = last or cursor.execute("SELECT MIN(movement_date) FROM stock_movements").fetchone()[0]
+    if not start: return []
+    year, month = int(start[:4]), int(start[5:7]); taken = []
+    while True:
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        month_end = datetime.fromordinal(datetime(year, month, 1).toordinal() - 1).strftime('%Y-%m-%d')
+        if month_end >= today: break
+        if last is None or month_end > last:
+            create_stock_snapshot(month_end); taken.append(month_end)
+    return taken
+
+def check_stock_ledger(tolerance=1e-6):
+    """Products whose stock_qty disagrees with the sum of their movements: [(product_id, stock_qty, ledger_qty)]."""
+    query = "SELECT p.id, p.stock_qty, COALESCE(m.total, 0) FROM products p LEFT JOIN (SELECT product_id, SUM(quantity) AS total FROM stock_movements GROUP BY product_id) m ON m.product_id = p.id"
+    return [tuple(row) for row in get_db_connection().execute(query) if abs(row[1] - row[2]) > tolerance]
+
+# --- Catalog Cache ---
+# Triggers append (table, id) to catalog_changes for every insert, update (stock
+# included) and delete on the catalog tables. A cache remembers the last seq it
+# has seen and asks for the records changed since then, so keeping products,
+# buyers and vendors current costs one small query instead of a full reload.
+# The log keeps the last CATALOG_LOG_KEEP changes; a cache further behind than
+# that is sent everything again.
+CATALOG_TABLES = ('products', 'buyers', 'vendors')
+CATALOG_LOG_KEEP = 10_000
+CATALOG_LOG_PRUNE_EVERY = 1_000
+CATALOG_CHUNK_SIZE = 500
+
+def get_catalog_changes(since=None, tables=CATALOG_TABLES):
+    """Rows of tables changed after log position since, all read from one snapshot.
+
+    Returns {'since': since, 'seq': the latest position, 'full': bool,
+    'tables': {table: (rows, deleted_ids)}}. When since is None or no longer
+    covered by the log, 'full' is True and rows are every record of the table.
+    """
+    conn = get_db_connection(); own_transaction = not conn.in_transaction
+    if own_transaction: conn.execute("BEGIN")
+    try:
+        seq, oldest = conn.execute("SELECT COALESCE(MAX(seq), 0), MIN(seq) FROM catalog_changes").fetchone()
+        full = since is None or since > seq or (oldest is not None and since < oldest - 1)
+        result = {'since': since, 'seq': seq, 'full': full, 'tables': {}}
+        if full:
+            for table_name in tables: result['tables'][table_name] = (conn.execute(f"SELECT * FROM {table_name}").fetchall(), set())
+            return result
+        changed = {}
+        for table_name, record_id in conn.execute("SELECT DISTINCT table_name, record_id FROM catalog_changes WHERE seq > ?", (since,)):
+            if table_name in tables: changed.setdefault(table_name, set()).add(record_id)
+        for table_name, record_ids in changed.items():
+            record_ids = sorted(record_ids); rows = []
+            for start in range(0, len(record_ids), CATALOG_CHUNK_SIZE):
+                chunk = record_ids[start:start + CATALOG_CHUNK_SIZE]
+                rows += conn.execute(f"SELECT * FROM {table_name} WHERE id IN ({', '.join('?' * len(chunk))})", chunk).fetchall()
+            result['tables'][table_name] = (rows, set(record_ids) - {row['id'] for row in rows})
+        return result
+    finally:
+        if own_transaction: conn.commit()
+
+class CatalogCache:
+    """In-memory copy of the catalog tables, kept current from the change log.
+
+    records[table] maps id -> row. apply() takes a get_catalog_changes(cache.seq)
+    result, usually fetched on another thread, updates records and calls each
+    table's subscribers with [(old_row, new_row)] for the records that really
+    changed (old_row is None for a new record, new_row None for a deleted one).
+    A result not fetched from the cache's current position is ignored: apply()
+    returns False and the caller should fetch again.
+    """
+    def __init__(self, tables=CATALOG_TABLES):
+        self.tables = tables; self.seq = None
+        self.records = {table_name: {} for table_name in tables}
+        self._subscribers = {table_name: [] for table_name in tables}
+
+    def subscribe(self, table_name, callback):
+        self._subscribers[table_name].append(callback)
+
+    def sync(self):
+        """Fetches and applies the changes on the calling thread."""
+        return self.apply(get_catalog_changes(self.seq, self.tables))
+
+    def apply(self, result):
+        if result['since'] != self.seq: return False
+        self.seq = result['seq']
+        for table_name, (rows, deleted_ids) in result['tables'].items():
+            records = self.records[table_name]; changes = []
+            if result['full']: deleted_ids = set(records) - {row['id'] for row in rows}
+            for record_id in deleted_ids:
+                if (old := records.pop(record_id, None)) is not None: changes.append((old, None))
+            for row in rows:
+                old = records.get(row['id'])
+                if old is None or tuple(old) != tuple(row): records[row['id']] = row; changes.append((old, row))
+            if changes:
+                for callback in self._subscribers[table_name]: callback(changes)
+        return True
+
+if __name__ == "__main__":
+    import sys
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command == 'rebuild-rollups':
+        create_tables(); rebuild_rollups(); print("Sales rollups rebuilt.")
+    elif command == 'check-rollups':
+        create_tables(); problems = check_rollups()
+        for problem in problems: print(*problem)
+        print(f"{len(problems)} rollup mismatches found.")
+        sys.exit(1 if problems else 0)
+    elif command == 'check-stock':
+        create_tables(); problems = check_stock_ledger()
+        for problem in problems: print(*problem)
+        print(f"{len(problems)} stock ledger mismatches found.")
+        sys.exit(1 if problems else 0)
+    else:
+        print("Usage: python database_manager.py [rebuild-rollups | check-rollups | check-stock]")
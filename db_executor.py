@@ -0,0 +1,72 @@
+"""Runs database_manager calls off the Tk thread and hands the results back to it.
+
+Writes go to a single writer thread and run one at a time, in the order they
+were submitted, so the GUI's own writes never wait on each other for SQLite's
+write lock. Reads go to a few reader threads; with WAL they run concurrently
+with each other and with the writer. Each worker uses its own connection
+(database_manager keeps one per thread), so a read submitted after a write may
+run before it: work that has to see a write's result belongs in the same write
+job, or in its callback.
+
+read() and write() return concurrent.futures.Future objects. Callbacks never
+run on a worker: finished calls are queued, and the GUI drains the queue with
+poll() from a root.after loop, so callbacks may update widgets.
+"""
+import queue
+import threading
+import traceback
+from concurrent.futures import Future
+
+import database_manager as db
+
+DEFAULT_READERS = 3
+
+class DbExecutor:
+    def __init__(self, readers=DEFAULT_READERS, on_error=None):
+        """on_error(exception) is called from poll() for failed calls submitted without their own on_error."""
+        self.on_error = on_error
+        self._writes = queue.Queue(); self._reads = queue.Queue(); self._done = queue.Queue()
+        self._threads = [threading.Thread(target=self._work, args=(self._writes,), name="db-writer", daemon=True)]
+        self._threads += [threading.Thread(target=self._work, args=(self._reads,), name=f"db-reader-{n}", daemon=True) for n in range(readers)]
+        for thread in self._threads: thread.start()
+
+    def read(self, func, *args, callback=None, on_error=None, **kwargs):
+        """Runs func(*args, **kwargs) on a reader thread; callback(result) is called from poll(). Returns the Future."""
+        return self._submit(self._reads, func, args, kwargs, callback, on_error)
+
+    def write(self, func, *args, callback=None, on_error=None, **kwargs):
+        """Like read(), but on the writer thread, after every write submitted before it."""
+        return self._submit(self._writes, func, args, kwargs, callback, on_error)
+
+    def poll(self):
+        """Runs the callbacks of calls finished since the last poll, oldest first. Call from the Tk thread only."""
+        while True:
+            try: future, callback, on_error = self._done.get_nowait()
+            except queue.Empty: return
+            if future.cancelled(): continue
+            error = future.exception()
+            if error is None:
+                if callback is not None: callback(future.result())
+            elif on_error or self.on_error: (on_error or self.on_error)(error)
+            else: traceback.print_exception(error)
+
+    def shutdown(self):
+        """Stops the workers once the calls already queued have run."""
+        self._writes.put(None)
+        for _ in self._threads[1:]: self._reads.put(None)
+
+    def _submit(self, jobs, func, args, kwargs, callback, on_error):
+        future = Future()
+        future.add_done_callback(lambda future: self._done.put((future, callback, on_error)))
+        jobs.put((future, func, args, kwargs))
+        return future
+
+    def _work(self, jobs):
+        try:
+            while (job := jobs.get()) is not None:
+                future, func, args, kwargs = job
+                if not future.set_running_or_notify_cancel(): continue
+                try: future.set_result(func(*args, **kwargs))
+                except Exception as e: future.set_exception(e)
+        finally:
+            db.close_db_connection()
@@ -0,0 +1,115 @@
+"""Exact GST arithmetic shared by the billing screen, the PDFs and the reports.
+
+Amounts are Decimals, and they are rounded half-up to the paisa at exactly
+these points and nowhere else:
+
+* a line's gross value (quantity x rate) and its taxable value after discount;
+* a line's GST, taxable value x rate;
+* a rate slab's CGST, half of the slab's GST (SGST takes the remaining paisa).
+
+Everything above a line is a plain sum, so the rate slabs add up to the
+invoice totals and the per-line GST in the HSN rollups adds up to the
+invoice's total GST. The grand total is rounded half-up to the rupee and the
+difference reported as round_off. Numbers may come in as floats, ints,
+strings or Decimals; floats are read through str(), so 0.1 means 0.1.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+PAISA = Decimal('0.01')
+RUPEE = Decimal('1')
+HUNDRED = Decimal('100')
+TWO = Decimal('2')
+ZERO = Decimal('0.00')
+TOTAL_FIELDS = ('subtotal', 'total_discount', 'taxable_value', 'total_cgst', 'total_sgst', 'total_igst', 'total_gst', 'freight', 'round_off', 'grand_total')
+
+def to_decimal(value):
+    """Decimal for value; None and '' count as zero. Raises ValueError for anything that is not a finite number."""
+    if value is None or value == '': return ZERO
+    try:
+        number = value if isinstance(value, Decimal) else Decimal(str(value).strip())
+    except InvalidOperation:
+        number = None
+    if number is None or not number.is_finite(): raise ValueError(f"Not a number: {value!r}")
+    return number
+
+def to_paise(value):
+    return to_decimal(value).quantize(PAISA, rounding=ROUND_HALF_UP)
+
+def is_inter_state(seller_gstin, buyer_gstin):
+    """IGST applies when the buyer has a GSTIN registered in another state (its first two digits)."""
+    return bool(buyer_gstin) and (seller_gstin or '')[:2].lower() != buyer_gstin[:2].lower()
+
+def line_gst(taxable_value, gst_rate):
+    return (to_decimal(taxable_value) * to_decimal(gst_rate) / HUNDRED).quantize(PAISA, rounding=ROUND_HALF_UP)
+
+def cgst_share(gst):
+    """CGST's half of an intra-state slab's GST; SGST is gst - cgst_share(gst).
+
+    gst is taken to the paisa first, so a float summed in SQL that lands a hair
+    below a half paisa still splits like the exact Decimal would.
+    """
+    return (to_paise(gst) / TWO).quantize(PAISA, rounding=ROUND_HALF_UP)
+
+def line_totals(quantity, rate, discount_percent=0, gst_rate=0):
+    """{'gst_rate', 'gross', 'discount', 'taxable_value', 'gst'} for one invoice line."""
+    gross = to_decimal(quantity) * to_decimal(rate); gst_rate = to_decimal(gst_rate)
+    taxable_value = (gross * (HUNDRED - to_decimal(discount_percent)) / HUNDRED).quantize(PAISA, rounding=ROUND_HALF_UP)
+    gross = gross.quantize(PAISA, rounding=ROUND_HALF_UP)
+    return {'gst_rate': gst_rate, 'gross': gross, 'discount': gross - taxable_value, 'taxable_value': taxable_value, 'gst': line_gst(taxable_value, gst_rate)}
+
+def invoice_totals(lines, inter_state, freight=0):
+    """Totals of lines from line_totals().
+
+    Returns TOTAL_FIELDS plus 'slabs', one dict per GST rate in ascending
+    order with gst_rate, taxable_value, gst, cgst, sgst and igst.
+    """
+    slabs = {}; subtotal = total_discount = ZERO
+    for line in lines:
+        subtotal += line['gross']; total_discount += line['discount']
+        slab = slabs.get(line['gst_rate'])
+        if slab is None: slab = slabs[line['gst_rate']] = {'gst_rate': line['gst_rate'], 'taxable_value': ZERO, 'gst': ZERO}
+        slab['taxable_value'] += line['taxable_value']; slab['gst'] += line['gst']
+    return slab_totals(slabs.values(), subtotal, total_discount, inter_state, freight)
+
+def slab_totals(slabs, subtotal, total_discount, inter_state, freight=0):
+    """invoice_totals() from sums already made per GST rate.
+
+    slabs are dicts with gst_rate, taxable_value and gst (other keys are
+    ignored, and the dicts are not modified); subtotal and total_discount are
+    the sums of the lines' gross and discount.
+    """
+    slabs = [{'gst_rate': slab['gst_rate'], 'taxable_value': slab['taxable_value'], 'gst': slab['gst']} for slab in sorted(slabs, key=lambda slab: slab['gst_rate'])]
+    for slab in slabs:
+        if inter_state: slab['cgst'] = slab['sgst'] = ZERO; slab['igst'] = slab['gst']
+        else:
+            slab['cgst'] = cgst_share(slab['gst'])
+            slab['sgst'] = slab['gst'] - slab['cgst']; slab['igst'] = ZERO
+    totals = {'subtotal': subtotal, 'total_discount': total_discount, 'freight': to_paise(freight), 'slabs': slabs}
+    for field, key in (('taxable_value', 'taxable_value'), ('total_cgst', 'cgst'), ('total_sgst', 'sgst'), ('total_igst', 'igst'), ('total_gst', 'gst')):
+        totals[field] = sum((slab[key] for slab in slabs), ZERO)
+    exact_total = totals['taxable_value'] + totals['total_gst'] + totals['freight']
+    totals['grand_total'] = exact_total.quantize(RUPEE, rounding=ROUND_HALF_UP)
+    totals['round_off'] = totals['grand_total'] - exact_total
+    return totals
+
+def item_line(item):
+    """line_totals() for an item dict as stored in invoice_items; a stored amount is taken as the line's taxable value."""
+    line = line_totals(item['quantity'], item['rate'], item.get('discount_percent') or 0, item['gst_rate'] or 0)
+    if item.get('amount') is not None:
+        taxable_value = to_paise(item['amount'])
+        if taxable_value != line['taxable_value']:
+            line.update(taxable_value=taxable_value, discount=line['gross'] - taxable_value, gst=line_gst(taxable_value, line['gst_rate']))
+    return line
+
+def compute_invoice(items, inter_state, freight=0):
+    """invoice_totals() for item dicts with quantity, rate, gst_rate and optionally discount_percent and amount."""
+    return invoice_totals(map(item_line, items), inter_state, freight)
+
+def compute_invoices(invoices):
+    """Batch form of compute_invoice for (items, inter_state, freight) tuples; yields the totals in order."""
+    for items, inter_state, freight in invoices:
+        yield compute_invoice(items, inter_state, freight)
+
+def as_floats(totals):
+    """TOTAL_FIELDS of invoice_totals() as floats, ready for the database or Tk variables."""
+    return {field: float(totals[field]) for field in TOTAL_FIELDS}
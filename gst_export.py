@@ -0,0 +1,157 @@
+"""GSTR-1 style summaries for the accountant, aggregated in SQL and streamed to CSV or XLSX.
+
+Two summaries are produced for a date range, both excluding cancelled invoices:
+
+* HSN-wise: per B2B/B2C, HSN, unit and GST rate, the quantity, taxable value
+  and IGST/CGST/SGST;
+* rate-wise: per B2B/B2C, inter/intra-state and GST rate, the number of
+  invoices, taxable value and taxes.
+
+A sale is B2B when the buyer has a GSTIN and inter-state when that GSTIN's
+state code differs from the seller's, exactly as on the billing screen. Tax
+is computed per line with gst_engine (through the gst_line_tax and
+gst_cgst_share SQL functions), split into CGST/SGST per invoice and rate
+slab, and only the final groups ever reach Python: rows go from the cursor
+to the file a chunk at a time. The rate summary's CGST/SGST therefore add up
+to the invoices' exactly; HSN rows split per invoice and HSN code, so their
+halves may differ from those by a paisa where an HSN shares a rate slab.
+XLSX files are written with the standard library, one sheet per summary.
+
+Usage: python gst_export.py 2025-04-01 2026-03-31 [--format xlsx] [--output-dir reports]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import zipfile
+
+import database_manager as db
+
+FETCH_SIZE = 1000
+_LINES = "FROM invoice_items ii JOIN invoices i ON i.id = ii.invoice_id JOIN buyers b ON b.id = i.buyer_id"
+_IN_PERIOD = f"WHERE i.invoice_date BETWEEN :start_date AND :end_date AND i.invoice_no NOT LIKE '{db.CANCELLED_PREFIX}%'"
+_SUPPLY_TYPE = "CASE WHEN COALESCE(b.gstin, '') <> '' THEN 'B2B' ELSE 'B2C' END"
+_INTER_STATE = "(COALESCE(b.gstin, '') <> '' AND lower(substr(b.gstin, 1, 2)) <> :seller_state)"
+# The inner queries group per invoice (and rate slab) so that CGST/SGST are split the way gst_engine splits an invoice.
+_TAX_COLUMNS = """ROUND(SUM(taxable_value), 2), ROUND(SUM(CASE WHEN inter_state THEN gst ELSE 0 END), 2),
+    ROUND(SUM(CASE WHEN inter_state THEN 0 ELSE gst_cgst_share(gst) END), 2), ROUND(SUM(CASE WHEN inter_state THEN 0 ELSE gst - gst_cgst_share(gst) END), 2), ROUND(SUM(taxable_value + gst), 2)"""
+
+SUMMARIES = {
+    'hsn': ("HSN Summary",
+            ["Supply Type", "HSN", "Unit", "GST Rate (%)", "Lines", "Quantity", "Taxable Value", "IGST", "CGST", "SGST", "Total Value"],
+            f"""SELECT supply_type, hsn, unit, gst_rate, SUM(line_count), ROUND(SUM(quantity), 3), {_TAX_COLUMNS}
+    FROM (SELECT {_SUPPLY_TYPE} AS supply_type, {_INTER_STATE} AS inter_state, COALESCE(ii.hsn, '') AS hsn, COALESCE(p.unit, '') AS unit, COALESCE(ii.gst_rate, 0) AS gst_rate,
+                 COUNT(*) AS line_count, SUM(ii.quantity) AS quantity, SUM(ii.amount) AS taxable_value, SUM(gst_line_tax(ii.amount, ii.gst_rate)) AS gst
+          {_LINES} LEFT JOIN products p ON p.id = ii.product_id {_IN_PERIOD}
+          GROUP BY i.id, 3, 4, 5)
+    GROUP BY supply_type, hsn, unit, gst_rate ORDER BY supply_type, hsn, unit, gst_rate"""),
+    'rates': ("Rate Summary",
+              ["Supply Type", "Place of Supply", "GST Rate (%)", "Invoices", "Taxable Value", "IGST", "CGST", "SGST", "Total Value"],
+              f"""SELECT supply_type, CASE WHEN inter_state THEN 'Inter-state' ELSE 'Intra-state' END, gst_rate, COUNT(DISTINCT invoice_id), {_TAX_COLUMNS}
+    FROM (SELECT i.id AS invoice_id, {_SUPPLY_TYPE} AS supply_type, {_INTER_STATE} AS inter_state, COALESCE(ii.gst_rate, 0) AS gst_rate,
+                 SUM(ii.amount) AS taxable_value, SUM(gst_line_tax(ii.amount, ii.gst_rate)) AS gst
+          {_LINES} {_IN_PERIOD}
+          GROUP BY i.id, 4)
+    GROUP BY 1, 2, 3 ORDER BY 1, 2, 3"""),
+}
+
+def iter_summary(kind, start_date, end_date, seller_gstin):
+    """Rows of one of the SUMMARIES for invoice dates start_date..end_date (ISO strings), read FETCH_SIZE at a time."""
+    cursor = db.get_db_connection().cursor(); cursor.row_factory = None
+    try:
+        cursor.execute(SUMMARIES[kind][2], {'start_date': start_date, 'end_date': end_date, 'seller_state': (seller_gstin or '')[:2].lower()})
+        while rows := cursor.fetchmany(FETCH_SIZE): yield from rows
+    finally:
+        cursor.close()
+
+def write_csv(path, header, rows):
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f); writer.writerow(header)
+        count = 0
+        for row in rows: writer.writerow(row); count += 1
+    return count
+
+# --- Minimal streaming XLSX writer ---
+# Just enough of the SpreadsheetML package for Excel and LibreOffice: inline
+# strings and plain numbers, one worksheet streamed per summary.
+_CONTENT_TYPES = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                  '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/><Default Extension="xml" ContentType="application/xml"/>'
+                  '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>{sheets}</Types>')
+_SHEET_CONTENT_TYPE = '<Override PartName="/xl/worksheets/sheet{n}.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+_ROOT_RELS = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+              '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/></Relationships>')
+_WORKBOOK = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+             'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>{sheets}</sheets></workbook>')
+_WORKBOOK_RELS = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{sheets}</Relationships>')
+_SHEET_REL = '<Relationship Id="rId{n}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet{n}.xml"/>'
+# Escapes markup and drops the control characters XML does not allow, in one pass.
+_XML_TEXT = {**dict.fromkeys(c for c in range(32) if c not in (9, 10, 13)), **str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'})}
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool): return f'<c><v>{value!r}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{str(value if value is not None else "").translate(_XML_TEXT)}</t></is></c>'
+
+def write_xlsx(path, sheets):
+    """sheets: [(title, header, rows)]; rows may be any iterable and are written as they are read. Returns the row count per sheet."""
+    counts = []
+    with zipfile.ZipFile(path + '.part', 'w', zipfile.ZIP_DEFLATED) as zf:
+        for n, (title, header, rows) in enumerate(sheets, 1):
+            with zf.open(f'xl/worksheets/sheet{n}.xml', 'w', force_zip64=True) as f:
+                f.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+                f.write(('<row>' + ''.join(map(_xlsx_cell, header)) + '</row>').encode('utf-8'))
+                count = 0
+                for row in rows:
+                    f.write(('<row>' + ''.join(map(_xlsx_cell, row)) + '</row>').encode('utf-8')); count += 1
+                f.write(b'</sheetData></worksheet>')
+            counts.append(count)
+        numbers = range(1, len(sheets) + 1)
+        zf.writestr('[Content_Types].xml', _CONTENT_TYPES.format(sheets=''.join(_SHEET_CONTENT_TYPE.format(n=n) for n in numbers)))
+        zf.writestr('_rels/.rels', _ROOT_RELS)
+        zf.writestr('xl/workbook.xml', _WORKBOOK.format(sheets=''.join(f'<sheet name="{title[:31].translate(_XML_TEXT)}" sheetId="{n}" r:id="rId{n}"/>' for n, (title, _, _) in zip(numbers, sheets))))
+        zf.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS.format(sheets=''.join(_SHEET_REL.format(n=n) for n in numbers)))
+    os.replace(path + '.part', path)
+    return counts
+
+def export_gstr1(start_date, end_date, settings, fmt='xlsx', output_dir='reports'):
+    """Writes the HSN and rate summaries for start_date..end_date (date objects).
+
+    fmt 'xlsx' writes one workbook with a sheet per summary and returns its
+    path; 'csv' writes one file per summary and returns the HSN summary's
+    path (the rate summary sits next to it).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    start, end = start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+    base = os.path.join(output_dir, f"GSTR1_{start_date.strftime('%Y_%m_%d')}_to_{end_date.strftime('%Y_%m_%d')}")
+    seller_gstin = settings['company_info']['gstin']
+    # Each iter_summary only runs its query when the writer starts reading it.
+    sheets = [(title, header, iter_summary(kind, start, end, seller_gstin)) for kind, (title, header, _) in SUMMARIES.items()]
+    if fmt == 'xlsx':
+        filename = base + '.xlsx'; write_xlsx(filename, sheets)
+    elif fmt == 'csv':
+        paths = [f"{base}_{title.replace(' ', '_')}.csv" for title, _, _ in sheets]
+        for path, (_, header, rows) in zip(paths, sheets): write_csv(path, header, rows)
+        filename = paths[0]
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    print(f"GSTR-1 summary saved: {filename}")
+    return filename
+
+def main(argv=None):
+    from datetime import date
+    parser = argparse.ArgumentParser(description="Export GSTR-1 HSN-wise and rate-wise summaries.")
+    parser.add_argument('start_date', type=date.fromisoformat)
+    parser.add_argument('end_date', type=date.fromisoformat)
+    parser.add_argument('--format', choices=('xlsx', 'csv'), default='xlsx')
+    parser.add_argument('--output-dir', default='reports')
+    args = parser.parse_args(argv)
+    with open('settings.json', 'r') as f: settings = json.load(f)
+    db.create_tables()
+    started = time.perf_counter()
+    export_gstr1(args.start_date, args.end_date, settings, args.format, args.output_dir)
+    print(f"Exported in {time.perf_counter() - started:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Streams invoices from e-commerce exports (CSV or JSON) into database_manager.save_invoices_bulk.
+
+CSV files hold one row per invoice line. Consecutive rows sharing an
+invoice_no (or order_ref when invoice_no is blank) form one invoice. Invoice
+columns use the invoices table names plus buyer_name. Item columns are
+prefixed with item_: item_product, item_hsn, item_gst_rate, item_quantity,
+item_rate, item_discount_percent, item_amount.
+
+JSON files are either JSON Lines (one invoice object per line) or a single
+array of invoice objects, each with an "items" list; both are read one
+invoice at a time. A CSV invoice with a value that is not a number where one
+is expected, or a JSON line that does not parse, is reported as a failed
+record and the rest of the file is still imported.
+
+Usage: python invoice_import.py orders.csv [--prefix SS-INV-] [--batch-size 1000]
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from itertools import groupby
+
+import database_manager as db
+
+JSON_CHUNK_SIZE = 1 << 16
+_NUMERIC_FIELDS = {'subtotal', 'total_discount', 'total_cgst', 'total_sgst', 'total_igst', 'freight', 'round_off', 'grand_total', 'buyer_id', 'product_id', 'gst_rate', 'quantity', 'rate', 'discount_percent', 'amount'}
+
+def _coerce(field, value):
+    if value is None: return None
+    value = value.strip()
+    if value == '': return None
+    if field in _NUMERIC_FIELDS:
+        try:
+            return int(value) if field.endswith('_id') else float(value)
+        except ValueError:
+            raise ValueError(f"{field}: {value!r} is not a number") from None
+    return value
+
+def _csv_record(rows):
+    record = None
+    for row in rows:
+        if record is None:
+            record = {k: _coerce(k, v) for k, v in row.items() if k and not k.startswith('item_')}
+            record['items'] = []
+        item = {k[len('item_'):]: _coerce(k[len('item_'):], v) for k, v in row.items() if k and k.startswith('item_')}
+        if 'product' in item: item['description'] = item.pop('product')
+        record['items'].append(item)
+    return record
+
+def read_invoices_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        for key, rows in groupby(reader, key=lambda row: (row.get('invoice_no') or '').strip() or (row.get('order_ref') or '').strip()):
+            try:
+                yield _csv_record(rows)
+            except ValueError as e:
+                yield {'invoice_no': key or None, db.BULK_ERROR_KEY: str(e)}
+
+def _iter_json_array(f):
+    """The elements of the JSON array in text file f, decoded one at a time from JSON_CHUNK_SIZE reads."""
+    decoder = json.JSONDecoder(); buffer = ''; eof = False
+    while not eof and not buffer.strip():
+        chunk = f.read(JSON_CHUNK_SIZE); eof = not chunk; buffer += chunk
+    buffer = buffer.lstrip()
+    if not buffer.startswith('['): raise ValueError("Expected a JSON array")
+    position = 1; expect_value = True
+    while True:
+        while position < len(buffer) and buffer[position].isspace(): position += 1
+        if position == len(buffer):
+            if eof: raise ValueError("Unterminated JSON array")
+            chunk = f.read(JSON_CHUNK_SIZE); eof = not chunk
+            buffer = buffer[position:] + chunk; position = 0
+            continue
+        if buffer[position] == ']': return
+        if not expect_value:
+            if buffer[position] != ',': raise ValueError(f"Expected ',' or ']' in JSON array, found {buffer[position]!r}")
+            position += 1; expect_value = True
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof: raise
+            end = len(buffer)
+        if end == len(buffer) and not eof:
+            # The value may go on in the next chunk (an object cut short, or a number's last digits).
+            chunk = f.read(JSON_CHUNK_SIZE); eof = not chunk
+            buffer = buffer[position:] + chunk; position = 0
+            continue
+        yield value
+        position = end; expect_value = False
+
+def read_invoices_json(path):
+    with open(path, encoding='utf-8') as f:
+        first = f.read(1)
+        while first and first.isspace(): first = f.read(1)
+        f.seek(0)
+        if first == '[':
+            yield from _iter_json_array(f)
+        else:
+            for line in f:
+                if not line.strip(): continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield {db.BULK_ERROR_KEY: f"Invalid JSON: {e}"}
+
+def read_invoices(path):
+    return read_invoices_csv(path) if path.lower().endswith('.csv') else read_invoices_json(path)
+
+def import_file(path, prefix, batch_size=db.BULK_BATCH_SIZE, progress=None, number_reset='never'):
+    return db.save_invoices_bulk(read_invoices(path), prefix=prefix, batch_size=batch_size, progress=progress, number_reset=number_reset)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import invoices from a CSV or JSON export.")
+    parser.add_argument('path')
+    parser.add_argument('--prefix', help="Invoice number prefix for records without invoice_no (default: settings.json)")
+    parser.add_argument('--batch-size', type=int, default=db.BULK_BATCH_SIZE)
+    args = parser.parse_args(argv)
+    with open('settings.json', 'r') as f: invoice_settings = json.load(f)['invoice_settings']
+    prefix = invoice_settings['invoice_prefix'] if args.prefix is None else args.prefix
+    db.create_tables()
+    started = time.perf_counter()
+    result = import_file(args.path, prefix, args.batch_size, number_reset=invoice_settings.get('number_reset', 'never'), progress=lambda saved, failed: print(f"\r{saved} saved, {failed} failed", end='', flush=True))
+    elapsed = time.perf_counter() - started
+    print(f"\nImported {len(result['saved'])} invoices in {elapsed:.1f}s ({len(result['saved']) / elapsed * 60 if elapsed else 0:.0f}/min)")
+    for index, invoice_no, message in result['errors']:
+        print(f"  record {index} ({invoice_no or 'no number'}): {message}", file=sys.stderr)
+    return 1 if result['errors'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Running totals of the invoice being edited on the billing screen.
+
+InvoiceModel keeps every row's computed line (gst_engine.line_totals) and
+Decimal sums per GST rate. Editing a row takes its old line out of those sums
+and puts the new one in, and the invoice totals are derived from the few rate
+slabs rather than from every row. The sums are exact, so applying deltas
+gives the same totals as gst_engine.invoice_totals over all the lines.
+"""
+import gst_engine
+from gst_engine import ZERO
+
+class InvoiceModel:
+    def __init__(self, inter_state=False, freight=0):
+        self.lines = {}; self._slabs = {}
+        self.subtotal = self.total_discount = ZERO
+        self.inter_state = bool(inter_state); self.freight = gst_engine.to_paise(freight)
+        self._totals = None
+
+    def set_line(self, key, line):
+        """Sets row key's line; None for a row that does not count (empty or invalid). Returns True if the totals changed."""
+        old = self.lines.pop(key, None)
+        if line is not None: self.lines[key] = line
+        if old == line: return False
+        if old is not None: self._apply(old, -1)
+        if line is not None: self._apply(line, 1)
+        self._totals = None
+        return True
+
+    def remove(self, key):
+        return self.set_line(key, None)
+
+    def set_inter_state(self, inter_state):
+        inter_state = bool(inter_state)
+        if inter_state == self.inter_state: return False
+        self.inter_state = inter_state; self._totals = None
+        return True
+
+    def set_freight(self, freight):
+        freight = gst_engine.to_paise(freight)
+        if freight == self.freight: return False
+        self.freight = freight; self._totals = None
+        return True
+
+    def clear(self):
+        self.lines.clear(); self._slabs.clear()
+        self.subtotal = self.total_discount = ZERO; self._totals = None
+
+    def totals(self):
+        """gst_engine.invoice_totals() of the current lines, recomputed only after a change."""
+        if self._totals is None:
+            self._totals = gst_engine.slab_totals(self._slabs.values(), self.subtotal, self.total_discount, self.inter_state, self.freight)
+        return self._totals
+
+    def _apply(self, line, sign):
+        rate = line['gst_rate']; slab = self._slabs.get(rate)
+        if slab is None: slab = self._slabs[rate] = {'gst_rate': rate, 'taxable_value': ZERO, 'gst': ZERO, 'lines': 0}
+        slab['taxable_value'] += sign * line['taxable_value']; slab['gst'] += sign * line['gst']; slab['lines'] += sign
+        if not slab['lines']: del self._slabs[rate]  # no empty slabs in the GST summary
+        self.subtotal += sign * line['gross']; self.total_discount += sign * line['discount']
@@ -0,0 +1,87 @@
+"""Content-addressed cache of rendered invoice PDFs.
+
+Each rendered invoice is kept in CACHE_DIR under the key its caller derived
+from everything the PDF is drawn from (see pdf_generator.invoice_cache_key),
+and manifest.json records the size and last use of every entry. A hit copies
+the cached file back to the invoice's usual path instead of re-rendering it.
+Because the key changes whenever the invoice, its items or the settings it
+uses change, stale entries are never served; they simply stop being used and
+age out. Entries unused for MAX_AGE_DAYS, and the least recently used ones
+beyond MAX_CACHE_BYTES, are evicted whenever a new entry is stored.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+CACHE_DIR = os.path.join('invoices', '.cache')
+MANIFEST_NAME = 'manifest.json'
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+MAX_AGE_DAYS = 90
+
+_manifest_lock = threading.Lock()
+
+def _manifest_path(cache_dir):
+    return os.path.join(cache_dir, MANIFEST_NAME)
+
+def _entry_path(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.pdf")
+
+def load_manifest(cache_dir=CACHE_DIR):
+    try:
+        with open(_manifest_path(cache_dir), 'r') as f: return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _save_manifest(manifest, cache_dir):
+    tmp_path = _manifest_path(cache_dir) + '.tmp'
+    with open(tmp_path, 'w') as f: json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, _manifest_path(cache_dir))
+
+def _copy(src_path, dest_path):
+    part_path = dest_path + '.part'
+    shutil.copyfile(src_path, part_path)
+    os.replace(part_path, dest_path)
+
+def fetch(key, dest_path, cache_dir=CACHE_DIR):
+    """Copies the cached PDF for key to dest_path. Returns False on a miss."""
+    with _manifest_lock:
+        manifest = load_manifest(cache_dir)
+        entry = manifest.get(key)
+        if entry is None: return False
+        try:
+            _copy(_entry_path(cache_dir, key), dest_path)
+        except FileNotFoundError:  # the file was removed behind the manifest's back
+            del manifest[key]; _save_manifest(manifest, cache_dir)
+            return False
+        entry['last_used'] = time.time(); _save_manifest(manifest, cache_dir)
+        return True
+
+def store(key, src_path, label='', cache_dir=CACHE_DIR):
+    """Adds the freshly rendered src_path to the cache under key, then evicts old entries."""
+    os.makedirs(cache_dir, exist_ok=True)
+    with _manifest_lock:
+        _copy(src_path, _entry_path(cache_dir, key))
+        manifest = load_manifest(cache_dir); now = time.time()
+        manifest[key] = {'label': label, 'size': os.path.getsize(src_path), 'created': now, 'last_used': now}
+        _evict(manifest, cache_dir, now)
+        _save_manifest(manifest, cache_dir)
+
+def _evict(manifest, cache_dir, now):
+    oldest_allowed = now - MAX_AGE_DAYS * 86400
+    by_last_use = sorted(manifest.items(), key=lambda item: item[1]['last_used'])
+    total = sum(entry['size'] for _, entry in by_last_use)
+    for key, entry in by_last_use:
+        if entry['last_used'] >= oldest_allowed and total <= MAX_CACHE_BYTES: break
+        try: os.remove(_entry_path(cache_dir, key))
+        except FileNotFoundError: pass
+        del manifest[key]; total -= entry['size']
+
+def clear(cache_dir=CACHE_DIR):
+    """Removes every cached PDF; the invoices themselves are left alone."""
+    with _manifest_lock:
+        for key in load_manifest(cache_dir):
+            try: os.remove(_entry_path(cache_dir, key))
+            except FileNotFoundError: pass
+        if os.path.isdir(cache_dir): _save_manifest({}, cache_dir)
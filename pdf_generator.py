@@ -1,71 +1,240 @@
+import hashlib
+import json
 import os
-from reportlab.pdfgen import canvas
+import tempfile
+import threading
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib.units import mm
-from reportlab.platypus import Table, TableStyle, SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from num2words import num2words
 from datetime import datetime
 import database_manager as db
+import gst_engine
+import pdf_cache
 
-# --- FONT REGISTRATION (No Changes) ---
+# --- Lazy loading ---
+# Importing the rest of reportlab, num2words and xml.sax and parsing DejaVuSans.ttf
+# takes a few hundred milliseconds, and most sessions render few PDFs, so all
+# of it happens on the first render (or in warm_up(), which the app runs on a
+# background thread once its window is up) rather than on import. Every
+# public render function calls _ensure_loaded() first; until then the names
+# below are placeholders.
 FONT_NAME = "DejaVuSans"
 FONT_NAME_BOLD = "DejaVuSans-Bold"
-try:
-    pdfmetrics.registerFont(TTFont(FONT_NAME, "DejaVuSans.ttf"))
-    pdfmetrics.registerFont(TTFont(FONT_NAME_BOLD, "DejaVuSans.ttf"))
-    pdfmetrics.registerFontFamily(FONT_NAME, normal=FONT_NAME, bold=FONT_NAME_BOLD, italic=FONT_NAME, boldItalic=FONT_NAME_BOLD)
-except Exception as e:
-    print(f"--- FONT WARNING ---\nCould not register DejaVuSans.ttf: {e}\nFalling back to Helvetica.")
-    FONT_NAME, FONT_NAME_BOLD = "Helvetica", "Helvetica-Bold"
+FONT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "DejaVuSans.ttf")  # not the cwd: the first render may happen anywhere
+canvas = Table = TableStyle = Paragraph = colors = pdfmetrics = num2words = escape = None
+_loaded = False
+_load_lock = threading.Lock()
+
+def _ensure_loaded():
+    global _loaded, canvas, Table, TableStyle, Paragraph, colors, pdfmetrics, num2words, escape
+    if _loaded: return
+    with _load_lock:
+        if _loaded: return
+        from reportlab.pdfgen import canvas
+        from reportlab.platypus import Table, TableStyle, Paragraph
+        from reportlab.lib import colors
+        from reportlab import rl_config
+        from reportlab.pdfbase import pdfmetrics
+        from num2words import num2words
+        from xml.sax.saxutils import escape  # pulls in urllib
+        rl_config.useA85 = 0  # write compressed streams as binary; ASCII85 only adds size and encoding time
+        _register_fonts()
+        _build_styles()
+        _loaded = True
+
+def warm_up():
+    """Loads everything the first render would, so that render starts straight away. Safe to call from any thread."""
+    _ensure_loaded()
+    _measure_item_rows(); _measure_report_rows()
+
+def _register_fonts():
+    global FONT_NAME, FONT_NAME_BOLD
+    from reportlab.pdfbase.ttfonts import TTFont
+    try:
+        pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_FILE))
+        pdfmetrics.registerFont(TTFont(FONT_NAME_BOLD, FONT_FILE))
+        pdfmetrics.registerFontFamily(FONT_NAME, normal=FONT_NAME, bold=FONT_NAME_BOLD, italic=FONT_NAME, boldItalic=FONT_NAME_BOLD)
+    except Exception as e:
+        print(f"--- FONT WARNING ---\nCould not register DejaVuSans.ttf: {e}\nFalling back to Helvetica.")
+        FONT_NAME, FONT_NAME_BOLD = "Helvetica", "Helvetica-Bold"
 
 WIDTH, HEIGHT = A4
 
-def create_invoice_pdf(invoice_details, items, settings):
-    # This function remains the same
+# --- Cached styles ---
+# Built once, after the fonts are registered; Tables only read their styles,
+# so they are safe to share.
+NORMAL_STYLE = BUYER_TABLE_STYLE = INVOICE_INFO_TABLE_STYLE = ITEMS_TABLE_STYLE = TOTALS_TABLE_STYLE = None
+GST_SPLIT_HEADER_STYLE = GST_SUMMARY_TABLE_STYLE = REPORT_STYLES = REPORT_TABLE_STYLE = None
+
+def _build_styles():
+    global NORMAL_STYLE, BUYER_TABLE_STYLE, INVOICE_INFO_TABLE_STYLE, ITEMS_TABLE_STYLE, TOTALS_TABLE_STYLE
+    global GST_SPLIT_HEADER_STYLE, GST_SUMMARY_TABLE_STYLE, REPORT_STYLES, REPORT_TABLE_STYLE
+    from reportlab.lib.styles import getSampleStyleSheet
+    NORMAL_STYLE = getSampleStyleSheet()['Normal']
+    BUYER_TABLE_STYLE = TableStyle([('FONTNAME', (0,0), (-1,-1), FONT_NAME), ('ALIGN', (0,0), (-1,-1), 'LEFT'), ('LEFTPADDING', (0,0), (-1,-1), 0), ('BOTTOMPADDING', (0,0), (-1,-1), 1)])
+    INVOICE_INFO_TABLE_STYLE = TableStyle([('GRID', (0,0), (-1,-1), 1, colors.black), ('FONTNAME', (0,0), (-1,-1), FONT_NAME), ('ALIGN', (0,0), (0,-1), 'LEFT'), ('ALIGN', (1,0), (1,-1), 'RIGHT')])
+    ITEMS_TABLE_STYLE = TableStyle([('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey), ('TEXTCOLOR', (0, 0), (-1, 0), colors.black), ('ALIGN', (0, 0), (-1, -1), 'CENTER'), ('ALIGN', (1, 1), (1, -1), 'LEFT'), ('FONTNAME', (0, 0), (-1, 0), FONT_NAME_BOLD), ('FONTNAME', (0, 1), (-1, -1), FONT_NAME), ('BOTTOMPADDING', (0, 0), (-1, 0), 6), ('TOPPADDING', (0, 1), (-1, -1), 4), ('GRID', (0, 0), (-1, -1), 1, colors.black)])
+    TOTALS_TABLE_STYLE = TableStyle([('ALIGN', (0, 0), (0, -1), 'LEFT'), ('ALIGN', (1, 0), (1, -1), 'RIGHT'), ('FONTNAME', (0, 0), (-1, -1), FONT_NAME), ('GRID', (0, 0), (-1, -1), 1, colors.black), ('VALIGN', (0,0), (-1,-1), 'MIDDLE'), ('LEFTPADDING', (0,0), (-1, -1), 5), ('RIGHTPADDING', (0,0), (-1, -1), 5), ('BOTTOMPADDING', (0,0), (-1, -1), 3), ('TOPPADDING', (0,0), (-1, -1), 3), ('FONTNAME', (0, 2), (-1, 2), FONT_NAME_BOLD), ('FONTNAME', (0, -1), (-1, -1), FONT_NAME_BOLD), ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey), ('TEXTCOLOR', (0, -1), (-1, -1), colors.black)])
+    GST_SPLIT_HEADER_STYLE = TableStyle([('SPAN', (1,0), (2,0)), ('SPAN', (3,0), (4,0)), ('ALIGN', (0,0), (-1,0), 'CENTER')])
+    GST_SUMMARY_TABLE_STYLE = TableStyle([('GRID', (0,0), (-1,-1), 1, colors.black), ('VALIGN', (0,0), (-1,-1), 'MIDDLE'), ('FONTNAME', (0,0), (-1,-1), FONT_NAME), ('ALIGN', (0,0), (-1,-1), 'CENTER')])
+    REPORT_STYLES = getSampleStyleSheet(); REPORT_STYLES['Title'].fontName = FONT_NAME_BOLD; REPORT_STYLES['h2'].fontName = FONT_NAME; REPORT_STYLES['Normal'].fontName = FONT_NAME
+    REPORT_TABLE_STYLE = TableStyle([('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),('TEXTCOLOR', (0, 0), (-1, 0), colors.black),('ALIGN', (0, 0), (-1, -1), 'CENTER'),('ALIGN', (3, 1), (3, -1), 'LEFT'),('ALIGN', (4, 1), (-1, -1), 'RIGHT'),('FONTNAME', (0, 0), (-1, 0), FONT_NAME_BOLD),('FONTNAME', (0, 1), (-1, -1), FONT_NAME),('BOTTOMPADDING', (0, 0), (-1, 0), 6),('GRID', (0, 0), (-1, -2), 1, colors.black),('GRID', (3, -1), (-1, -1), 1, colors.black),('BACKGROUND', (0, -1), (2, -1), colors.white),('BACKGROUND', (3, -1), (-1, -1), colors.lightgrey),('FONTNAME', (3, -1), (-1, -1), FONT_NAME_BOLD),('VALIGN', (0,0), (-1,-1), 'MIDDLE')])
+
+# --- Static page parts ---
+# The company header, bank/terms footer and signature block only change
+# with the settings, so each PDF draws them once as form XObjects and every
+# page just places them. The form names carry a digest of the settings they
+# were drawn from, so edited settings never reuse a stale form.
+def _static_forms(c, company_info, bank_details, invoice_settings):
+    digest = hashlib.sha1(json.dumps([company_info, bank_details, invoice_settings['terms_and_conditions']], sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    header_form, footer_form, signature_form = f"InvoiceHeader_{digest}", f"InvoiceFooter_{digest}", f"InvoiceSignature_{digest}"
+    if not c.hasForm(header_form):
+        c.beginForm(header_form)
+        c.setFont(FONT_NAME_BOLD, 16)
+        c.drawString(20 * mm, HEIGHT - 25 * mm, company_info['name'])
+        c.setFont(FONT_NAME, 9)
+        c.drawString(20 * mm, HEIGHT - 31 * mm, company_info['address_line1'])
+        c.drawString(20 * mm, HEIGHT - 35 * mm, company_info['address_line2'])
+        c.drawString(20 * mm, HEIGHT - 41 * mm, f"GSTIN: {company_info['gstin']} | PAN: {company_info['pan']}")
+        c.setFont(FONT_NAME_BOLD, 14)
+        c.drawRightString(WIDTH - 20 * mm, HEIGHT - 25 * mm, "TAX INVOICE")
+        c.line(20 * mm, HEIGHT - 48 * mm, WIDTH - 20 * mm, HEIGHT - 48 * mm)
+        c.endForm()
+    if not c.hasForm(footer_form):
+        # Drawn with its top edge (the separator line) at y=0; pages translate it into place.
+        c.beginForm(footer_form, lowery=-HEIGHT, uppery=0)
+        footer_y_pos = 0
+        c.line(20 * mm, footer_y_pos, WIDTH - 20 * mm, footer_y_pos); footer_y_pos -= 5 * mm
+        c.setFont(FONT_NAME_BOLD, 8); c.drawString(20 * mm, footer_y_pos, "Bank Details:"); c.setFont(FONT_NAME, 8); footer_y_pos -= 4 * mm
+        c.drawString(20 * mm, footer_y_pos, f"Bank: {bank_details['bank_name']}"); c.drawString(80 * mm, footer_y_pos, f"A/C No: {bank_details['account_no']}"); footer_y_pos -= 4 * mm
+        c.drawString(20 * mm, footer_y_pos, f"Branch: {bank_details['branch']}"); c.drawString(80 * mm, footer_y_pos, f"IFSC: {bank_details['ifsc_code']}")
+        footer_y_pos -= 8 * mm
+        c.setFont(FONT_NAME_BOLD, 8); c.drawString(20 * mm, footer_y_pos, "Terms & Conditions:"); c.setFont(FONT_NAME, 8); footer_y_pos -= 4 * mm
+        terms = invoice_settings['terms_and_conditions'].split('\n')
+        for line in terms: c.drawString(20 * mm, footer_y_pos, line); footer_y_pos -= 4 * mm
+        c.endForm()
+    if not c.hasForm(signature_form):
+        c.beginForm(signature_form)
+        c.setFont(FONT_NAME_BOLD, 9); c.drawRightString(WIDTH - 20 * mm, 35 * mm, f"For {company_info['name']}"); c.setFont(FONT_NAME, 9); c.drawRightString(WIDTH - 20 * mm, 20 * mm, "Authorised Signatory")
+        c.endForm()
+    return header_form, footer_form, signature_form
+
+# --- Invoice PDF cache ---
+# Only these settings are drawn on an invoice, so only they go into its cache
+# key: editing anything else (the prefix, report workers, ...) keeps every
+# cached invoice valid, while editing e.g. the bank details invalidates all of
+# them. Bump INVOICE_LAYOUT_VERSION whenever draw_invoice_page changes what
+# it draws.
+INVOICE_LAYOUT_VERSION = 2
+INVOICE_SETTINGS_USED = {
+    'company_info': ('name', 'address_line1', 'address_line2', 'gstin', 'pan'),
+    'bank_details': ('bank_name', 'account_no', 'branch', 'ifsc_code'),
+    'invoice_settings': ('terms_and_conditions',),
+}
+
+def invoice_cache_key(invoice_details, items, settings):
+    _ensure_loaded()  # FONT_NAME is only final once the fonts are registered (it falls back to Helvetica)
+    used_settings = {section: {field: settings[section].get(field) for field in fields} for section, fields in INVOICE_SETTINGS_USED.items()}
+    content = json.dumps([INVOICE_LAYOUT_VERSION, FONT_NAME, invoice_details, items, used_settings], sort_keys=True, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def create_invoice_pdf(invoice_details, items, settings, use_cache=True):
+    """Writes invoices/<invoice no>.pdf, copying it from pdf_cache when this exact invoice was rendered before."""
     company_info = settings['company_info']
     bank_details = settings['bank_details']
     invoice_settings = settings['invoice_settings']
     filename = os.path.join("invoices", f"{invoice_details['invoice_no'].replace('/', '_')}.pdf")
     os.makedirs(os.path.dirname(filename), exist_ok=True)
+    cache_key = invoice_cache_key(invoice_details, items, settings) if use_cache else None
+    if cache_key and pdf_cache.fetch(cache_key, filename):
+        print(f"Invoice served from cache: {filename}")
+        return filename
+    _ensure_loaded()
     c = canvas.Canvas(filename, pagesize=A4)
     for copy_type in ["Original for Recipient", "Duplicate for Transporter", "Triplicate for Supplier"]:
         draw_invoice_page(c, invoice_details, items, company_info, bank_details, invoice_settings, copy_type)
         c.showPage()
     c.save()
+    if cache_key: pdf_cache.store(cache_key, filename, invoice_details['invoice_no'])
     print(f"Invoice saved: {filename}")
     return filename
 
+# --- Items table pagination ---
+# Item rows are measured once (every row has the same height unless its
+# description spans several lines), split into page-sized slices up front and
+# each slice is drawn as one Table, so layout cost grows linearly with the
+# number of lines. Continuation pages repeat the column headers and open with
+# the subtotal brought forward; the totals, GST summary, footer and signature
+# go on the last page only.
+ITEMS_HEADER = ["S.No.", "Description", "HSN", "GST%", "Qty", "Rate", "Disc%", "Amount"]
+ITEMS_COL_WIDTHS = [12*mm, 68*mm, 15*mm, 10*mm, 15*mm, 20*mm, 10*mm, 20*mm]
+CONTINUED_ITEMS_TOP = HEIGHT - 58 * mm
+ITEMS_BOTTOM_MARGIN = 15 * mm
+FOOTER_BOTTOM_MARGIN = 10 * mm
+SIGNATURE_TOP = 40 * mm        # the footer separator must stay above the signature block
+_item_row_heights = None
+
+def _measure_item_rows():
+    """(header, single-line row, extra per description line) heights of the items table."""
+    global _item_row_heights
+    if _item_row_heights is None:
+        table = Table([ITEMS_HEADER, ['1'] * 8, ['1', '1\n1'] + ['1'] * 6], colWidths=ITEMS_COL_WIDTHS)
+        table.setStyle(ITEMS_TABLE_STYLE); table.wrap(WIDTH, HEIGHT)
+        header, single, double = table._rowHeights
+        _item_row_heights = (header, single, double - single)
+    return _item_row_heights
+
+def _paginate_items(row_heights, first_top, tail_height, footer_depth):
+    """Splits item rows into [(start, end)] slices, one per page, leaving room for the tail on the last page."""
+    header, single, _ = _measure_item_rows()
+    def tail_fits(y, rows_height):
+        separator = y - rows_height - 2 * mm - tail_height
+        return separator >= SIGNATURE_TOP and separator - footer_depth >= FOOTER_BOTTOM_MARGIN
+    # A tail taller than an empty continuation page (e.g. very long terms) would never fit: it then
+    # follows the last rows wherever they end and may run off the page, instead of adding pages forever.
+    tail_fits_alone = tail_fits(CONTINUED_ITEMS_TOP - header - single, 0)
+    pages = []; start = 0; top = first_top
+    while True:
+        carry = single if pages else 0     # brought-forward row
+        y = top - header - carry
+        remaining = sum(row_heights[start:])
+        if tail_fits(y, remaining) or (not tail_fits_alone and remaining <= y - ITEMS_BOTTOM_MARGIN):
+            pages.append((start, len(row_heights))); return pages
+        end = start; room = y - single - ITEMS_BOTTOM_MARGIN  # keep room for the carried-forward row
+        while end < len(row_heights) and row_heights[end] <= room:
+            room -= row_heights[end]; end += 1
+        if end == len(row_heights) and end - start > 1: end -= 1  # keep at least one line with the totals
+        if end == start and end < len(row_heights): end += 1  # a row taller than a page still gets drawn
+        pages.append((start, end)); start = end; top = CONTINUED_ITEMS_TOP
+
+def _subtotal_row(label, amount):
+    return ["", label, "", "", "", "", "", f"{amount:.2f}"]
+
+def _subtotal_styles(rows):
+    commands = []
+    for row in rows:
+        commands += [('SPAN', (1, row), (6, row)), ('ALIGN', (1, row), (6, row), 'RIGHT'), ('FONTNAME', (0, row), (-1, row), FONT_NAME_BOLD)]
+    return TableStyle(commands)
+
 def draw_invoice_page(c, invoice_details, items, company_info, bank_details, invoice_settings, copy_type):
-    # --- Page Header and Buyer Info (No changes) ---
-    c.setFont(FONT_NAME, 8)
-    c.drawCentredString(WIDTH / 2, HEIGHT - 15 * mm, copy_type)
-    c.setFont(FONT_NAME_BOLD, 16)
-    c.drawString(20 * mm, HEIGHT - 25 * mm, company_info['name'])
-    c.setFont(FONT_NAME, 9)
-    c.drawString(20 * mm, HEIGHT - 31 * mm, company_info['address_line1'])
-    c.drawString(20 * mm, HEIGHT - 35 * mm, company_info['address_line2'])
-    c.drawString(20 * mm, HEIGHT - 41 * mm, f"GSTIN: {company_info['gstin']} | PAN: {company_info['pan']}")
-    c.setFont(FONT_NAME_BOLD, 14)
-    c.drawRightString(WIDTH - 20 * mm, HEIGHT - 25 * mm, "TAX INVOICE")
-    c.line(20 * mm, HEIGHT - 48 * mm, WIDTH - 20 * mm, HEIGHT - 48 * mm)
+    """Draws one copy of an invoice; long item lists continue on further pages.
+
+    The last page is left open, so callers follow up with c.showPage() as for a single page.
+    """
+    _ensure_loaded()
+    header_form, footer_form, signature_form = _static_forms(c, company_info, bank_details, invoice_settings)
 
     # --- Buyer Details & Invoice Details Tables ---
     y_pos = HEIGHT - 55 * mm
     buyer_details_data = [
-        [Paragraph('<b>Bill To:</b>', getSampleStyleSheet()['Normal'])],
+        [Paragraph('<b>Bill To:</b>', NORMAL_STYLE)],
         [invoice_details['buyer_name']],
         [invoice_details['buyer_address']],
         [f"GSTIN: {invoice_details['buyer_gstin']}"],
         [f"State: {invoice_details['buyer_state']}"]
     ]
     buyer_table = Table(buyer_details_data, colWidths=[90*mm])
-    buyer_table.setStyle(TableStyle([('FONTNAME', (0,0), (-1,-1), FONT_NAME), ('ALIGN', (0,0), (-1,-1), 'LEFT'), ('LEFTPADDING', (0,0), (-1,-1), 0), ('BOTTOMPADDING', (0,0), (-1,-1), 1)]))
+    buyer_table.setStyle(BUYER_TABLE_STYLE)
     buyer_table.wrapOn(c, WIDTH, HEIGHT)
-    buyer_table.drawOn(c, 20*mm, y_pos - buyer_table._height)
 
     invoice_info_data = [
         ['Invoice No:', invoice_details['invoice_no']],
@@ -75,20 +244,9 @@ def draw_invoice_page(c, invoice_details, items, company_info, bank_details, inv
         ['Payment Mode:', invoice_details.get('payment_mode', 'N/A')]
     ]
     invoice_info_table = Table(invoice_info_data, colWidths=[30*mm, 50*mm])
-    invoice_info_table.setStyle(TableStyle([('GRID', (0,0), (-1,-1), 1, colors.black), ('FONTNAME', (0,0), (-1,-1), FONT_NAME), ('ALIGN', (0,0), (0,-1), 'LEFT'), ('ALIGN', (1,0), (1,-1), 'RIGHT')]))
+    invoice_info_table.setStyle(INVOICE_INFO_TABLE_STYLE)
     invoice_info_table.wrapOn(c, WIDTH, HEIGHT)
-    invoice_info_table.drawOn(c, WIDTH - 20*mm - 80*mm, y_pos - invoice_info_table._height)
-    y_pos -= (invoice_info_table._height + 10 * mm)
-
-    # --- Items Table (No Changes) ---
-    items_table_data = [["S.No.", "Description", "HSN", "GST%", "Qty", "Rate", "Disc%", "Amount"]]
-    for i, item in enumerate(items, 1):
-        items_table_data.append([i, item['description'], item['hsn'], f"{item['gst_rate']:.2f}", f"{item['quantity']}", f"{item['rate']:.2f}", f"{item['discount_percent']:.2f}", f"{item['amount']:.2f}"])
-    items_table = Table(items_table_data, colWidths=[12*mm, 68*mm, 15*mm, 10*mm, 15*mm, 20*mm, 10*mm, 20*mm])
-    items_table.setStyle(TableStyle([('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey), ('TEXTCOLOR', (0, 0), (-1, 0), colors.black), ('ALIGN', (0, 0), (-1, -1), 'CENTER'), ('ALIGN', (1, 1), (1, -1), 'LEFT'), ('FONTNAME', (0, 0), (-1, 0), FONT_NAME_BOLD), ('FONTNAME', (0, 1), (-1, -1), FONT_NAME), ('BOTTOMPADDING', (0, 0), (-1, 0), 6), ('TOPPADDING', (0, 1), (-1, -1), 4), ('GRID', (0, 0), (-1, -1), 1, colors.black)]))
-    items_table.wrapOn(c, WIDTH, HEIGHT)
-    items_table.drawOn(c, 20 * mm, y_pos - items_table._height)
-    y_pos -= (items_table._height + 2 * mm)
+    items_top = y_pos - (invoice_info_table._height + 10 * mm)
 
     # --- Totals Table (Right Side) ---
     taxable_amount = invoice_details['subtotal'] - invoice_details['total_discount']
@@ -96,102 +254,248 @@ def draw_invoice_page(c, invoice_details, items, company_info, bank_details, inv
     if invoice_details['total_cgst'] > 0: totals_data.extend([['CGST', f"₹ {invoice_details['total_cgst']:.2f}"], ['SGST', f"₹ {invoice_details['total_sgst']:.2f}"]])
     if invoice_details['total_igst'] > 0: totals_data.append(['IGST', f"₹ {invoice_details['total_igst']:.2f}"])
     totals_data.extend([['Freight Charges', f"₹ {invoice_details['freight']:.2f}"], ['Round Off', f"₹ {invoice_details['round_off']:.2f}"], ['GRAND TOTAL', f"₹ {invoice_details['grand_total']:.2f}"]])
-    grand_total_row_index = len(totals_data) - 1
     totals_table = Table(totals_data, colWidths=[45*mm, 25*mm])
-    totals_table.setStyle(TableStyle([('ALIGN', (0, 0), (0, -1), 'LEFT'), ('ALIGN', (1, 0), (1, -1), 'RIGHT'), ('FONTNAME', (0, 0), (-1, -1), FONT_NAME), ('GRID', (0, 0), (-1, -1), 1, colors.black), ('VALIGN', (0,0), (-1,-1), 'MIDDLE'), ('LEFTPADDING', (0,0), (-1, -1), 5), ('RIGHTPADDING', (0,0), (-1, -1), 5), ('BOTTOMPADDING', (0,0), (-1, -1), 3), ('TOPPADDING', (0,0), (-1, -1), 3), ('FONTNAME', (0, 2), (-1, 2), FONT_NAME_BOLD), ('FONTNAME', (0, grand_total_row_index), (-1, grand_total_row_index), FONT_NAME_BOLD), ('BACKGROUND', (0, grand_total_row_index), (-1, grand_total_row_index), colors.lightgrey), ('TEXTCOLOR', (0, grand_total_row_index), (-1, grand_total_row_index), colors.black)]))
+    totals_table.setStyle(TOTALS_TABLE_STYLE)
     totals_table.wrapOn(c, WIDTH, HEIGHT)
     totals_table_height = totals_table._height
-    table_width = 45*mm + 25*mm
-    x_position = WIDTH - 20*mm - table_width
-    totals_table.drawOn(c, x_position, y_pos - totals_table_height)
 
     # --- GST Summary Table (Left Side) ---
-    tax_summary = {}
-    for item in items:
-        rate = item['gst_rate']
-        taxable_val = (item['quantity'] * item['rate']) * (1 - item['discount_percent'] / 100)
-        tax_summary.setdefault(rate, 0)
-        tax_summary[rate] += taxable_val
     is_igst = invoice_details['total_igst'] > 0
+    tax_summary = gst_engine.compute_invoice(items, inter_state=is_igst)
     if is_igst:
         gst_summary_data = [['Taxable Value', 'IGST Rate', 'IGST Amount']]
-        total_taxable_val, total_tax_amt = 0,0
-        for rate, taxable_val in sorted(tax_summary.items()):
-            tax_amt = taxable_val * (rate / 100)
-            gst_summary_data.append([f"{taxable_val:.2f}", f"{rate:.2f}%", f"{tax_amt:.2f}"]); total_taxable_val += taxable_val; total_tax_amt += tax_amt
-        gst_summary_data.append([Paragraph(f"<b>{total_taxable_val:.2f}</b>", getSampleStyleSheet()['Normal']), '', Paragraph(f"<b>{total_tax_amt:.2f}</b>", getSampleStyleSheet()['Normal'])])
+        for slab in tax_summary['slabs']:
+            gst_summary_data.append([f"{slab['taxable_value']:.2f}", f"{slab['gst_rate']:.2f}%", f"{slab['igst']:.2f}"])
+        gst_summary_data.append([Paragraph(f"<b>{tax_summary['taxable_value']:.2f}</b>", NORMAL_STYLE), '', Paragraph(f"<b>{tax_summary['total_igst']:.2f}</b>", NORMAL_STYLE)])
         gst_summary_table = Table(gst_summary_data, colWidths=[40*mm, 25*mm, 30*mm])
     else:
         gst_summary_data = [['Taxable Value', 'CGST', '', 'SGST', '']]
         gst_summary_data.append(['', 'Rate', 'Amount', 'Rate', 'Amount'])
-        total_taxable_val, total_cgst, total_sgst = 0,0,0
-        for rate, taxable_val in sorted(tax_summary.items()):
-            cgst_amt = taxable_val * (rate / 200); sgst_amt = taxable_val * (rate / 200)
-            gst_summary_data.append([f"{taxable_val:.2f}", f"{rate/2:.2f}%", f"{cgst_amt:.2f}", f"{rate/2:.2f}%", f"{sgst_amt:.2f}"]); total_taxable_val += taxable_val; total_cgst += cgst_amt; total_sgst += sgst_amt
-        gst_summary_data.append([Paragraph(f"<b>{total_taxable_val:.2f}</b>", getSampleStyleSheet()['Normal']), '', Paragraph(f"<b>{total_cgst:.2f}</b>", getSampleStyleSheet()['Normal']), '', Paragraph(f"<b>{total_sgst:.2f}</b>", getSampleStyleSheet()['Normal'])])
+        for slab in tax_summary['slabs']:
+            half_rate = slab['gst_rate'] / 2
+            gst_summary_data.append([f"{slab['taxable_value']:.2f}", f"{half_rate:.2f}%", f"{slab['cgst']:.2f}", f"{half_rate:.2f}%", f"{slab['sgst']:.2f}"])
+        gst_summary_data.append([Paragraph(f"<b>{tax_summary['taxable_value']:.2f}</b>", NORMAL_STYLE), '', Paragraph(f"<b>{tax_summary['total_cgst']:.2f}</b>", NORMAL_STYLE), '', Paragraph(f"<b>{tax_summary['total_sgst']:.2f}</b>", NORMAL_STYLE)])
         gst_summary_table = Table(gst_summary_data, colWidths=[35*mm, 15*mm, 20*mm, 15*mm, 20*mm])
-        gst_summary_table.setStyle(TableStyle([('SPAN', (1,0), (2,0)), ('SPAN', (3,0), (4,0)), ('ALIGN', (0,0), (-1,0), 'CENTER')]))
-    gst_summary_table.setStyle(TableStyle([('GRID', (0,0), (-1,-1), 1, colors.black), ('VALIGN', (0,0), (-1,-1), 'MIDDLE'), ('FONTNAME', (0,0), (-1,-1), FONT_NAME), ('ALIGN', (0,0), (-1,-1), 'CENTER')]))
+        gst_summary_table.setStyle(GST_SPLIT_HEADER_STYLE)
+    gst_summary_table.setStyle(GST_SUMMARY_TABLE_STYLE)
     gst_summary_table.wrapOn(c, WIDTH, HEIGHT)
     gst_summary_table_height = gst_summary_table._height
-    
-    # --- POSITIONING CHANGE ---
-    # The Y-position for the GST table is now calculated based on the position *after* the totals table.
+
+    # --- Items Table ---
+    items_rows = []; row_heights = []
+    _, single_row, extra_line = _measure_item_rows()
+    for i, item in enumerate(items, 1):
+        items_rows.append([i, item['description'], item['hsn'], f"{item['gst_rate']:.2f}", f"{item['quantity']}", f"{item['rate']:.2f}", f"{item['discount_percent']:.2f}", f"{item['amount']:.2f}"])
+        row_heights.append(single_row + extra_line * str(item['description'] or '').count('\n'))
+    # From the bottom of the items table down to the footer separator, then the depth of the footer itself.
+    tail_height = totals_table_height + 2*mm + gst_summary_table_height + 5*mm + 5*mm
+    footer_depth = (25 + 4 * (len(invoice_settings['terms_and_conditions'].split('\n')) - 1)) * mm
+    pages = _paginate_items(row_heights, items_top, tail_height, footer_depth)
+
+    subtotal = 0.0
+    for page_no, (start, end) in enumerate(pages):
+        if page_no: c.showPage()
+        c.doForm(header_form)
+        c.setFont(FONT_NAME, 8)
+        c.drawCentredString(WIDTH / 2, HEIGHT - 15 * mm, copy_type)
+        if len(pages) > 1: c.drawRightString(WIDTH - 20 * mm, HEIGHT - 15 * mm, f"Page {page_no + 1} of {len(pages)}")
+        if page_no == 0:
+            buyer_table.drawOn(c, 20*mm, y_pos - buyer_table._height)
+            invoice_info_table.drawOn(c, WIDTH - 20*mm - 80*mm, y_pos - invoice_info_table._height)
+            top = items_top; table_data = [ITEMS_HEADER]
+        else:
+            c.setFont(FONT_NAME_BOLD, 9); c.drawString(20 * mm, HEIGHT - 54 * mm, f"Invoice No: {invoice_details['invoice_no']} (continued)")
+            top = CONTINUED_ITEMS_TOP; table_data = [ITEMS_HEADER, _subtotal_row("Brought forward", subtotal)]
+        table_data += items_rows[start:end]
+        subtotal += sum(item['amount'] for item in items[start:end])
+        last_page = page_no == len(pages) - 1
+        if not last_page: table_data.append(_subtotal_row("Carried forward", subtotal))
+        items_table = Table(table_data, colWidths=ITEMS_COL_WIDTHS)
+        items_table.setStyle(ITEMS_TABLE_STYLE)
+        subtotal_rows = ([1] if page_no else []) + ([len(table_data) - 1] if not last_page else [])
+        if subtotal_rows: items_table.setStyle(_subtotal_styles(subtotal_rows))
+        items_table.wrapOn(c, WIDTH, HEIGHT)
+        items_table.drawOn(c, 20 * mm, top - items_table._height)
+    y_pos = top - items_table._height - 2 * mm
+
+    table_width = 45*mm + 25*mm
+    x_position = WIDTH - 20*mm - table_width
+    totals_table.drawOn(c, x_position, y_pos - totals_table_height)
+
+    # The Y-position for the GST table is calculated based on the position *after* the totals table.
     gst_table_y_pos = y_pos - totals_table_height - 2*mm
     gst_summary_table.drawOn(c, 20*mm, gst_table_y_pos - gst_summary_table_height)
 
     # --- Footer ---
-    # The footer now starts below the lowest of the two tables.
+    # The footer starts below the lowest of the two tables.
     footer_y_pos = gst_table_y_pos - gst_summary_table_height - 5*mm
     c.setFont(FONT_NAME, 8)
     total_in_words = num2words(int(invoice_details['grand_total']), lang='en_IN').title()
     c.drawString(20 * mm, footer_y_pos, f"Total in Words: Rupees {total_in_words} Only.")
     footer_y_pos -= 5 * mm
-    c.line(20 * mm, footer_y_pos, WIDTH - 20 * mm, footer_y_pos); footer_y_pos -= 5 * mm
-    c.setFont(FONT_NAME_BOLD, 8); c.drawString(20 * mm, footer_y_pos, "Bank Details:"); c.setFont(FONT_NAME, 8); footer_y_pos -= 4 * mm
-    c.drawString(20 * mm, footer_y_pos, f"Bank: {bank_details['bank_name']}"); c.drawString(80 * mm, footer_y_pos, f"A/C No: {bank_details['account_no']}"); footer_y_pos -= 4 * mm
-    c.drawString(20 * mm, footer_y_pos, f"Branch: {bank_details['branch']}"); c.drawString(80 * mm, footer_y_pos, f"IFSC: {bank_details['ifsc_code']}")
-    footer_y_pos -= 8 * mm
-    c.setFont(FONT_NAME_BOLD, 8); c.drawString(20 * mm, footer_y_pos, "Terms & Conditions:"); c.setFont(FONT_NAME, 8); footer_y_pos -= 4 * mm
-    terms = invoice_settings['terms_and_conditions'].split('\n')
-    for line in terms: c.drawString(20 * mm, footer_y_pos, line); footer_y_pos -= 4 * mm
-    c.setFont(FONT_NAME_BOLD, 9); c.drawRightString(WIDTH - 20 * mm, 35 * mm, f"For {company_info['name']}"); c.setFont(FONT_NAME, 9); c.drawRightString(WIDTH - 20 * mm, 20 * mm, "Authorised Signatory")
+    c.saveState(); c.translate(0, footer_y_pos); c.doForm(footer_form); c.restoreState()
+    c.doForm(signature_form)
 
 # The other functions (create_detailed_invoice_report, create_transaction_report_pdf) remain the same
-def create_detailed_invoice_report(invoice_ids, settings):
-    filename = os.path.join("reports", f"Detailed_Invoices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-    c = canvas.Canvas(filename, pagesize=A4)
-    for inv_id in invoice_ids:
-        invoice_details, items = db.get_full_invoice_details(inv_id)
+# Large detailed reports are split into chunks of invoice ids, each chunk is
+# drawn into its own PDF by a worker process, and the parts are appended in
+# order. Every invoice draws exactly the same page either way, so the merged
+# file matches the serial one page for page.
+MIN_PARALLEL_INVOICES = 100     # below this, starting worker processes costs more than it saves
+MAX_CHUNK_SIZE = 250
+
+def report_workers(settings):
+    """Worker processes for detailed reports: invoice_settings.report_workers, 0 or missing meaning one per CPU."""
+    try: workers = int(settings['invoice_settings'].get('report_workers') or 0)
+    except ValueError: workers = 0
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+def _draw_detailed_pages(c, invoice_ids, settings, progress=None, done=0, total=None):
+    for invoice_details, items in db.get_full_invoice_details_bulk(invoice_ids):
         if invoice_details and items:
             draw_invoice_page(c, invoice_details, items, settings['company_info'], settings['bank_details'], settings['invoice_settings'], "for analysis")
             c.showPage()
-    c.save()
+        done += 1
+        if progress: progress(done, total)
+
+def _render_detailed_chunk(db_file, invoice_ids, settings, filename):
+    """Process pool entry point: draws one chunk of the detailed report into filename."""
+    db.DB_FILE = db_file; _ensure_loaded()
+    c = canvas.Canvas(filename, pagesize=A4, invariant=True)
+    _draw_detailed_pages(c, invoice_ids, settings)
+    c.save(); db.close_db_connection()
+    return len(invoice_ids)
+
+def _pdf_writer():
+    """pypdf's PdfWriter, or None when the optional pypdf is not installed and detailed reports render serially."""
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        return None
+    return PdfWriter
+
+def _render_detailed_parallel(filename, invoice_ids, settings, workers, progress=None):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    chunk_size = max(1, min(MAX_CHUNK_SIZE, -(-len(invoice_ids) // (workers * 2))))
+    chunks = [invoice_ids[i:i + chunk_size] for i in range(0, len(invoice_ids), chunk_size)]
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(filename)) as tmp_dir:
+        parts = [os.path.join(tmp_dir, f"part_{n:05d}.pdf") for n in range(len(chunks))]
+        # spawn, not fork: this runs on a worker thread of a process with Tk, other threads and open SQLite connections.
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [pool.submit(_render_detailed_chunk, os.path.abspath(db.DB_FILE), chunk, settings, part) for chunk, part in zip(chunks, parts)]
+            done = 0
+            try:
+                for future in futures:
+                    done += future.result()
+                    if progress: progress(done, len(invoice_ids))
+            except BaseException:
+                # A failed chunk or a cancelled job: drop the chunks that have not started.
+                pool.shutdown(cancel_futures=True); raise
+        writer = _pdf_writer()()
+        for part in parts: writer.append(part)
+        with open(filename, 'wb') as f: writer.write(f)
+
+def create_detailed_invoice_report(invoice_ids, settings, workers=None, progress=None):
+    """One page per invoice in a single PDF.
+
+    workers defaults to report_workers(settings); with more than one worker,
+    pypdf installed and at least MIN_PARALLEL_INVOICES invoices, chunks are
+    rendered in a process pool. progress, if given, is called with
+    (invoices_done, total) from the calling thread.
+    """
+    filename = os.path.join("reports", f"Detailed_Invoices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    invoice_ids = list(invoice_ids); workers = report_workers(settings) if workers is None else workers
+    _ensure_loaded()
+    if workers > 1 and len(invoice_ids) >= MIN_PARALLEL_INVOICES and _pdf_writer() is not None:
+        _render_detailed_parallel(filename, invoice_ids, settings, workers, progress)
+    else:
+        c = canvas.Canvas(filename, pagesize=A4, invariant=True)
+        _draw_detailed_pages(c, invoice_ids, settings, progress, total=len(invoice_ids))
+        c.save()
     print(f"Detailed invoice report saved: {filename}")
     return filename
 
-def create_transaction_report_pdf(invoices, start_date, end_date, settings):
+# --- Transaction report ---
+# The report is streamed: rows are pulled from any iterable (normally the
+# db.iter_invoices_by_filter cursor), one page of them is laid out as its own
+# Table and drawn, and only the running totals survive to the next page, so
+# memory stays flat however long the period is. Buyer names are plain strings
+# unless they are too wide for their column and need a wrapping Paragraph.
+REPORT_HEADER = ["Inv. ID", "Invoice No.", "Date", "Buyer Name", "Taxable Value (₹)", "Total GST (₹)", "Grand Total (₹)"]
+REPORT_COL_WIDTHS = [20*mm, 35*mm, 25*mm, 75*mm, 35*mm, 30*mm, 35*mm]
+REPORT_MARGIN = 20 * mm
+REPORT_CELL_PADDING = 6         # reportlab's default left/right cell padding
+_report_row_heights = None
+
+def _measure_report_rows():
+    """(header, plain row, padding around a wrapped cell) heights of the report table."""
+    global _report_row_heights
+    if _report_row_heights is None:
+        table = Table([REPORT_HEADER, ['1'] * 7, ['1'] * 7], colWidths=REPORT_COL_WIDTHS)
+        table.setStyle(REPORT_TABLE_STYLE); table.wrap(WIDTH, HEIGHT)
+        header, row, _ = table._rowHeights
+        _report_row_heights = (header, row, row - REPORT_STYLES['Normal'].leading)
+    return _report_row_heights
+
+def _report_row(inv):
+    """Table row for one invoice and its height."""
+    _, row_height, cell_padding = _measure_report_rows()
+    buyer_name = inv['buyer_name'] or ''
+    name_width = REPORT_COL_WIDTHS[3] - 2 * REPORT_CELL_PADDING
+    if '\n' in buyer_name or pdfmetrics.stringWidth(buyer_name, FONT_NAME, REPORT_STYLES['Normal'].fontSize) > name_width:
+        buyer_name = Paragraph(escape(buyer_name), REPORT_STYLES['Normal'])
+        row_height = max(row_height, buyer_name.wrap(name_width, HEIGHT)[1] + cell_padding)
+    return [inv['id'], inv['invoice_no'], inv['invoice_date'], buyer_name, f"{inv['taxable_value']:.2f}", f"{inv['total_gst']:.2f}", f"{inv['grand_total']:.2f}"], row_height
+
+def _draw_report_title(c, settings, start_str, end_str, page_width, top):
+    for text, style in ((settings['company_info']['name'], REPORT_STYLES['Title']), ("Sales Transaction Report", REPORT_STYLES['h2']), (f"Period: {start_str} to {end_str}", REPORT_STYLES['h2'])):
+        para = Paragraph(escape(text), style); _, height = para.wrap(page_width - 2 * REPORT_MARGIN, HEIGHT)
+        top -= style.spaceBefore + height; para.drawOn(c, REPORT_MARGIN, top); top -= style.spaceAfter
+    return top - 10 * mm
+
+def create_transaction_report_pdf(invoices, start_date, end_date, settings, totals=None, progress=None):
+    """Summary table of the given invoice rows, drawn page by page as rows arrive.
+
+    invoices may be a list or any iterable of rows, e.g. db.iter_invoices_by_filter().
+    Each page ends with the running totals; the last page ends with the
+    period totals, taken from totals (db.get_sales_totals) when given instead
+    of summing the rows. progress, if given, is called with (rows_done, None)
+    after every page.
+    """
     start_str = start_date.strftime("%b %d, %Y"); end_str = end_date.strftime("%b %d, %Y")
     filename = os.path.join("reports", f"Transaction_Report_{start_date.strftime('%Y_%m_%d')}_to_{end_date.strftime('%Y_%m_%d')}.pdf")
     os.makedirs(os.path.dirname(filename), exist_ok=True)
-    doc = SimpleDocTemplate(filename, pagesize=landscape(A4), topMargin=20*mm, bottomMargin=20*mm)
-    styles = getSampleStyleSheet(); styles['Title'].fontName = FONT_NAME_BOLD; styles['h2'].fontName = FONT_NAME; styles['Normal'].fontName = FONT_NAME
-    elements = []
-    elements.append(Paragraph(settings['company_info']['name'], styles['Title']))
-    elements.append(Paragraph("Sales Transaction Report", styles['h2']))
-    elements.append(Paragraph(f"Period: {start_str} to {end_str}", styles['h2']))
-    elements.append(Spacer(1, 10*mm))
-    table_data = [["Inv. ID", "Invoice No.", "Date", "Buyer Name", "Taxable Value (₹)", "Total GST (₹)", "Grand Total (₹)"]]
-    total_taxable, total_gst, total_sales = 0.0, 0.0, 0.0
-    for inv in invoices:
-        table_data.append([inv['id'], inv['invoice_no'], inv['invoice_date'], Paragraph(inv['buyer_name'], styles['Normal']), f"{inv['taxable_value']:.2f}", f"{inv['total_gst']:.2f}", f"{inv['grand_total']:.2f}"])
-        total_taxable += inv['taxable_value']; total_gst += inv['total_gst']; total_sales += inv['grand_total']
-    table_data.append(["", "", "", Paragraph("<b>TOTALS:</b>", styles['Normal']), Paragraph(f"<b>{total_taxable:.2f}</b>", styles['Normal']), Paragraph(f"<b>{total_gst:.2f}</b>", styles['Normal']), Paragraph(f"<b>{total_sales:.2f}</b>", styles['Normal'])])
-    table = Table(table_data, colWidths=[20*mm, 35*mm, 25*mm, 75*mm, 35*mm, 30*mm, 35*mm])
-    style = TableStyle([('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),('TEXTCOLOR', (0, 0), (-1, 0), colors.black),('ALIGN', (0, 0), (-1, -1), 'CENTER'),('ALIGN', (3, 1), (3, -1), 'LEFT'),('ALIGN', (4, 1), (-1, -1), 'RIGHT'),('FONTNAME', (0, 0), (-1, 0), FONT_NAME_BOLD),('FONTNAME', (0, 1), (-1, -1), FONT_NAME),('BOTTOMPADDING', (0, 0), (-1, 0), 6),('GRID', (0, 0), (-1, -2), 1, colors.black),('GRID', (3, -1), (-1, -1), 1, colors.black),('BACKGROUND', (0, -1), (2, -1), colors.white),('BACKGROUND', (3, -1), (-1, -1), colors.lightgrey),('VALIGN', (0,0), (-1,-1), 'MIDDLE')])
-    table.setStyle(style)
-    elements.append(table)
-    doc.build(elements)
+    _ensure_loaded()
+    page_width, page_height = landscape(A4)
+    c = canvas.Canvas(filename, pagesize=landscape(A4), invariant=True)
+    header_height, totals_height, _ = _measure_report_rows()
+    rows = iter(invoices); pending = next(rows, None)
+    total_taxable, total_gst, total_sales = 0.0, 0.0, 0.0; done = 0; page_no = 0
+    while True:
+        page_no += 1
+        top = page_height - REPORT_MARGIN
+        if page_no == 1: top = _draw_report_title(c, settings, start_str, end_str, page_width, top)
+        room = top - REPORT_MARGIN - header_height - totals_height
+        table_data = [REPORT_HEADER]
+        while pending is not None:
+            row, row_height = _report_row(pending)
+            if row_height > room and len(table_data) > 1: break
+            table_data.append(row); room -= row_height; done += 1
+            total_taxable += pending['taxable_value']; total_gst += pending['total_gst']; total_sales += pending['grand_total']
+            pending = next(rows, None)
+        last_page = pending is None
+        if last_page and totals: total_taxable, total_gst, total_sales = totals['taxable_value'], totals['total_gst'], totals['grand_total']
+        table_data.append(["", "", "", "TOTALS:" if last_page else "Carried forward:", f"{total_taxable:.2f}", f"{total_gst:.2f}", f"{total_sales:.2f}"])
+        table = Table(table_data, colWidths=REPORT_COL_WIDTHS)
+        table.setStyle(REPORT_TABLE_STYLE)
+        table_width, table_height = table.wrap(page_width, page_height)
+        table.drawOn(c, (page_width - table_width) / 2, top - table_height)
+        c.setFont(FONT_NAME, 8); c.drawCentredString(page_width / 2, REPORT_MARGIN / 2, f"Page {page_no}")
+        c.showPage()
+        if progress: progress(done, None)
+        if last_page: break
+    c.save()
     print(f"Report saved: {filename}")
     return filename
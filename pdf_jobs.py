@@ -0,0 +1,96 @@
+"""Background PDF rendering so the Tk thread never waits on pdf_generator.
+
+Jobs are queued on a PdfJobQueue and run by worker threads. Workers never
+touch Tk: every status change is pushed onto an event queue that the GUI
+drains with poll() from a root.after loop. A job can be cancelled while it is
+queued, or while it runs if its function reports progress through the
+callback the queue hands it.
+"""
+import itertools
+import queue
+import threading
+import traceback
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+# reportlab's TrueType subsetting keeps shared per-font state, so renders are
+# serialised on one thread by default; the GUI stays responsive either way.
+DEFAULT_WORKERS = 1
+
+class JobCancelled(Exception):
+    """Raised inside a running job when it has been cancelled."""
+
+class PdfJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, title, func, args, kwargs):
+        self.id = next(self._ids); self.title = title
+        self.func, self.args, self.kwargs = func, args, kwargs
+        self.status = QUEUED; self.done = 0; self.total = None
+        self.result = None; self.error = None
+        self._cancel = threading.Event(); self._queue = None
+
+    @property
+    def finished(self): return self.status in FINISHED
+
+    def cancel(self): self._cancel.set()
+
+    def report_progress(self, done, total=None):
+        """Progress callback for the job's function; raises JobCancelled once the job is cancelled."""
+        if self._cancel.is_set(): raise JobCancelled()
+        self.done, self.total = done, total
+        self._queue._events.put(self)
+
+    def describe(self):
+        if self.status == RUNNING and self.total: return f"{self.title}: {self.done}/{self.total}"
+        return f"{self.title}: {self.status}"
+
+class PdfJobQueue:
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self._jobs = queue.Queue(); self._events = queue.Queue(); self.jobs = {}
+        self._threads = [threading.Thread(target=self._work, name=f"pdf-worker-{n}", daemon=True) for n in range(workers)]
+        for thread in self._threads: thread.start()
+
+    def submit(self, title, func, *args, with_progress=False, **kwargs):
+        """Queues func(*args, **kwargs); with_progress passes progress=job.report_progress. Returns the PdfJob."""
+        job = PdfJob(title, func, args, kwargs); job._queue = self
+        if with_progress: job.kwargs['progress'] = job.report_progress
+        self.jobs[job.id] = job
+        self._jobs.put(job); self._events.put(job)
+        return job
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job and not job.finished: job.cancel()
+        return job
+
+    def active(self):
+        return [job for job in self.jobs.values() if not job.finished]
+
+    def poll(self):
+        """Jobs whose state changed since the last poll, oldest first. Call from the Tk thread only."""
+        changed = {}
+        while True:
+            try: job = self._events.get_nowait()
+            except queue.Empty: break
+            changed[job.id] = job
+        for job_id, job in changed.items():
+            if job.finished: self.jobs.pop(job_id, None)
+        return list(changed.values())
+
+    def shutdown(self):
+        for job in self.active(): job.cancel()
+        for _ in self._threads: self._jobs.put(None)
+
+    def _work(self):
+        while (job := self._jobs.get()) is not None:
+            if job._cancel.is_set():
+                job.status = CANCELLED; self._events.put(job); continue
+            job.status = RUNNING; self._events.put(job)
+            try:
+                job.result = job.func(*job.args, **job.kwargs); job.status = DONE
+            except JobCancelled:
+                job.status = CANCELLED
+            except Exception as e:
+                job.error = e; job.status = FAILED; traceback.print_exc()
+            self._events.put(job)
@@ -0,0 +1,54 @@
+"""Prefix index for type-ahead pickers over large catalogs.
+
+A PrefixIndex holds every label (a product or buyer name) in two sorted
+lists of case-folded keys: one by the name itself, so "steel b" finds
+"Steel Bolt M8", and one by an optional code (a product's HSN/SAC, a buyer's
+GSTIN), so "7318" finds it too. A lookup is a bisect into each list followed
+by a scan of at most the limit of matching entries, so it costs microseconds
+however large the catalog is, and the lists are shared by every picker that
+uses the index. Name matches come first, then code matches, each
+alphabetically.
+"""
+import bisect
+
+DEFAULT_LIMIT = 50
+
+def _fold(text):
+    return ' '.join(str(text).split()).casefold()
+
+class PrefixIndex:
+    def __init__(self, entries=(), limit=DEFAULT_LIMIT):
+        """entries: (label, code) pairs; code may be None."""
+        self.limit = limit
+        self._names = []; self._codes = []
+        for label, code in entries:
+            for keys, key in self._keys(label, code): keys.append((key, label))
+        self._names.sort(); self._codes.sort()
+
+    def __len__(self):
+        return len(self._names)
+
+    def _keys(self, label, code):
+        yield self._names, _fold(label)
+        if code: yield self._codes, _fold(code)
+
+    def add(self, label, code=None):
+        for keys, key in self._keys(label, code): bisect.insort(keys, (key, label))
+
+    def remove(self, label, code=None):
+        """Removes one entry added with the same label and code; unknown entries are ignored."""
+        for keys, key in self._keys(label, code):
+            index = bisect.bisect_left(keys, (key, label))
+            if index < len(keys) and keys[index] == (key, label): del keys[index]
+
+    def search(self, text, limit=None):
+        """Up to limit labels matching text, best first; the first labels alphabetically for empty text."""
+        limit = limit or self.limit; prefix = _fold(text)
+        results = []; seen = set()
+        for keys in (self._names, self._codes):
+            index = bisect.bisect_left(keys, (prefix,))
+            while index < len(keys) and len(results) < limit and keys[index][0].startswith(prefix):
+                label = keys[index][1]; index += 1
+                if label not in seen: seen.add(label); results.append(label)
+            if len(results) >= limit or not prefix: break
+        return results
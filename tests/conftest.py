@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database_manager as db
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """A fresh, fully migrated database for the test; the module's DB_FILE points at it."""
+    monkeypatch.setattr(db, 'DB_FILE', str(tmp_path / 'billing_app.db'))
+    db.create_tables()
+    yield db.get_db_connection()
+    db.close_db_connection()
+
+@pytest.fixture
+def catalog(temp_db):
+    """One buyer and one product in temp_db: {'buyer': name, 'product': name}."""
+    db.add_record('buyers', {'name': 'Acme Traders', 'gstin': '27AAACA1234A1Z5', 'address': 'Pune', 'phone': '', 'email': '', 'state': 'Maharashtra'})
+    db.add_record('products', {'name': 'Steel Bolt M8', 'hsn': '7318', 'gst_rate': 18.0, 'rate': 5.0, 'stock_qty': 1000.0, 'unit': 'Nos', 'selling_price': 8.0})
+    return {'buyer': 'Acme Traders', 'product': 'Steel Bolt M8'}
@@ -0,0 +1,64 @@
+import database_manager as db
+
+def _table(table_name):
+    return {row['id']: dict(row) for row in db.get_db_connection().execute(f"SELECT * FROM {table_name}")}
+
+def _contents(cache, table_name):
+    return {record_id: dict(row) for record_id, row in cache.records[table_name].items()}
+
+def _changes(pairs):
+    return [(old and dict(old), new and dict(new)) for old, new in pairs]
+
+def _buyer(name, state='Maharashtra'):
+    return {'name': name, 'gstin': '', 'address': 'Pune', 'phone': '', 'email': '', 'state': state}
+
+def test_cache_follows_inserts_updates_and_deletes(catalog):
+    cache = db.CatalogCache(); seen = {table_name: [] for table_name in db.CATALOG_TABLES}
+    for table_name in db.CATALOG_TABLES: cache.subscribe(table_name, lambda changes, table_name=table_name: seen[table_name].append(_changes(changes)))
+    assert cache.sync()
+    assert [[(old, new['name']) for old, new in changes] for changes in seen['products']] == [[(None, 'Steel Bolt M8')]]
+    [bolt] = _table('products').values(); [acme] = _table('buyers').values()
+    for table_name in db.CATALOG_TABLES: seen[table_name].clear()
+
+    nut = db.add_product({'name': 'Steel Nut M8', 'hsn': '7318', 'gst_rate': 18.0, 'unit': 'Nos', 'selling_price': 3.0}, 50, 1.5)
+    db.update_record('products', bolt['id'], {'selling_price': 9.0})
+    db.receive_stock(bolt['id'], 10, 5.0)
+    db.update_record('products', nut, {'selling_price': 3.0})  # no real change
+    bharat = db.add_record('buyers', _buyer('Bharat Stores', 'Karnataka'))
+    db.update_record('buyers', acme['id'], {'phone': '98200 00000'})
+    db.delete_record('buyers', bharat)
+    chetan = db.add_record('buyers', _buyer('Chetan Agencies'))
+    assert cache.sync()
+
+    products = _table('products'); buyers = _table('buyers')
+    [product_changes] = seen['products']
+    assert sorted(product_changes, key=lambda pair: pair[1]['id']) == [(bolt, products[bolt['id']]), (None, products[nut])]
+    assert products[bolt['id']]['stock_qty'] == bolt['stock_qty'] + 10 and products[bolt['id']]['selling_price'] == 9.0
+    [buyer_changes] = seen['buyers']
+    assert sorted(buyer_changes, key=lambda pair: (pair[0] or pair[1])['id']) == [(acme, buyers[acme['id']]), (None, buyers[chetan])]
+    assert seen['vendors'] == []
+    for table_name in db.CATALOG_TABLES: assert _contents(cache, table_name) == _table(table_name)
+
+    # Added and deleted between two syncs: the cache never saw it, so nothing is reported.
+    for table_name in db.CATALOG_TABLES: seen[table_name].clear()
+    db.delete_record('buyers', db.add_record('buyers', _buyer('Short Lived')))
+    db.delete_record('products', nut)
+    assert cache.sync()
+    assert seen['buyers'] == [] and seen['products'] == [[(products[nut], None)]]
+    for table_name in db.CATALOG_TABLES: assert _contents(cache, table_name) == _table(table_name)
+
+def test_stale_results_are_refused_and_a_pruned_log_resends_everything(catalog):
+    cache = db.CatalogCache(); cache.sync()
+    stale = db.get_catalog_changes(None)
+    db.add_record('buyers', _buyer('Bharat Stores'))
+    assert cache.sync() and not cache.apply(stale)
+
+    behind = db.CatalogCache(); behind.sync()
+    for n in range(6): db.add_record('vendors', {'name': f"Vendor {n}", 'gstin': '', 'address': '', 'phone': '', 'email': ''})
+    db.delete_record('buyers', next(iter(_table('buyers'))))
+    # As the prune trigger does once CATALOG_LOG_KEEP changes are logged: the changes behind has not seen are gone.
+    db.execute_query("DELETE FROM catalog_changes WHERE seq < (SELECT MAX(seq) - 2 FROM catalog_changes)", commit=True)
+    changes = db.get_catalog_changes(behind.seq)
+    assert changes['full']
+    assert behind.apply(changes)
+    for table_name in db.CATALOG_TABLES: assert _contents(behind, table_name) == _table(table_name)
@@ -0,0 +1,103 @@
+"""Property checks of gst_engine against an independent exact (Fraction) model of the same rounding rules."""
+import random
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+import gst_engine
+from invoice_model import InvoiceModel
+
+GST_RATES = (0, 0.25, 3, 5, 12, 18, 28)
+DISCOUNTS = (0, 2.5, 5, 10, 12.5, 33.33)
+CASES = 300
+
+def _round(value, step):
+    """Half-up (away from zero) rounding of a Fraction to a multiple of step."""
+    if value < 0: return -_round(-value, step)
+    return (value / step + Fraction(1, 2)).__floor__() * step
+
+PAISA, RUPEE = Fraction(1, 100), Fraction(1)
+
+def _reference(items, inter_state, freight):
+    slabs = {}; subtotal = total_discount = Fraction(0)
+    for quantity, rate, discount_percent, gst_rate in items:
+        gross = Fraction(str(quantity)) * Fraction(str(rate))
+        taxable = _round(gross * (100 - Fraction(str(discount_percent))) / 100, PAISA)
+        subtotal += _round(gross, PAISA); total_discount += _round(gross, PAISA) - taxable
+        slab = slabs.setdefault(Fraction(str(gst_rate)), [Fraction(0), Fraction(0)])
+        slab[0] += taxable; slab[1] += _round(taxable * Fraction(str(gst_rate)) / 100, PAISA)
+    taxable_value = sum(slab[0] for slab in slabs.values()); total_gst = sum(slab[1] for slab in slabs.values())
+    total_cgst = Fraction(0) if inter_state else sum(_round(slab[1] / 2, PAISA) for slab in slabs.values())
+    exact_total = taxable_value + total_gst + _round(Fraction(str(freight)), PAISA)
+    grand_total = _round(exact_total, RUPEE)
+    return {'subtotal': subtotal, 'total_discount': total_discount, 'taxable_value': taxable_value, 'total_gst': total_gst, 'total_cgst': total_cgst,
+            'total_sgst': Fraction(0) if inter_state else total_gst - total_cgst, 'total_igst': total_gst if inter_state else Fraction(0),
+            'grand_total': grand_total, 'round_off': grand_total - exact_total}
+
+def _random_number(rng, high, places):
+    value = round(rng.uniform(0, high), places)
+    return rng.choice((value, str(value), Decimal(str(value))))  # the engine takes floats, strings and Decimals alike
+
+def _random_invoice(rng):
+    items = [(_random_number(rng, 50, rng.choice((0, 1, 3))), _random_number(rng, 5000, 2), rng.choice(DISCOUNTS), rng.choice(GST_RATES)) for _ in range(rng.randint(1, 30))]
+    return items, rng.random() < 0.5, rng.choice((0, 0, 49.99, _random_number(rng, 500, 2)))
+
+@pytest.mark.parametrize('seed', range(CASES))
+def test_matches_exact_reference(seed):
+    items, inter_state, freight = _random_invoice(random.Random(seed))
+    totals = gst_engine.invoice_totals([gst_engine.line_totals(*item) for item in items], inter_state, freight)
+    for field, expected in _reference(items, inter_state, freight).items():
+        assert Fraction(totals[field]) == expected, field
+
+@pytest.mark.parametrize('seed', range(0, CASES, 3))
+def test_totals_are_consistent(seed):
+    items, inter_state, freight = _random_invoice(random.Random(seed))
+    totals = gst_engine.invoice_totals([gst_engine.line_totals(*item) for item in items], inter_state, freight)
+    assert totals['taxable_value'] == totals['subtotal'] - totals['total_discount']
+    assert totals['total_gst'] == totals['total_cgst'] + totals['total_sgst'] + totals['total_igst']
+    assert sum(slab['cgst'] + slab['sgst'] + slab['igst'] for slab in totals['slabs']) == totals['total_gst']
+    assert [slab['gst_rate'] for slab in totals['slabs']] == sorted({Decimal(str(gst_rate)) for *_, gst_rate in items})
+    assert totals['grand_total'] == totals['grand_total'].to_integral_value() and abs(totals['round_off']) <= Decimal('0.50')
+    assert totals['grand_total'] == totals['taxable_value'] + totals['total_gst'] + totals['freight'] + totals['round_off']
+
+@pytest.mark.parametrize('seed', range(0, CASES, 3))
+def test_incremental_model_matches_full_recompute(seed):
+    rng = random.Random(seed); model = InvoiceModel(); lines = {}
+    for _ in range(60):
+        row = rng.randrange(20)
+        if rng.random() < 0.2: model.remove(row); lines.pop(row, None)
+        else:
+            line = gst_engine.line_totals(*_random_invoice(rng)[0][0]); model.set_line(row, line); lines[row] = line
+    model.set_inter_state(rng.random() < 0.5); model.set_freight(rng.choice((0, 12.5)))
+    assert model.totals() == gst_engine.invoice_totals(lines.values(), model.inter_state, model.freight)
+
+@pytest.mark.parametrize('items, inter_state, expected', [
+    ([(3, 33.33, 0, 18)], False, {'taxable_value': '99.99', 'total_cgst': '9.00', 'total_sgst': '9.00', 'round_off': '0.01', 'grand_total': '118'}),
+    ([(1, 0.05, 0, 18)], False, {'total_gst': '0.01', 'total_cgst': '0.01', 'total_sgst': '0.00', 'grand_total': '0'}),
+    ([(0.1, 0.2, 0, 5), (2, 0.125, 0, 5)], True, {'subtotal': '0.27', 'total_igst': '0.01', 'grand_total': '0'}),
+    ([(7, 99.5, 12.5, 28)], False, {'total_discount': '87.06', 'taxable_value': '609.44', 'total_cgst': '85.32', 'total_sgst': '85.32', 'grand_total': '780'}),
+])
+def test_known_invoices(items, inter_state, expected):
+    totals = gst_engine.compute_invoice([{'quantity': q, 'rate': r, 'discount_percent': d, 'gst_rate': g} for q, r, d, g in items], inter_state)
+    assert {field: str(totals[field]) for field in expected} == expected
+
+def test_stored_amount_is_the_taxable_value():
+    line = gst_engine.item_line({'quantity': 2, 'rate': 10, 'gst_rate': 18, 'amount': 19.5})
+    assert (line['taxable_value'], line['discount'], line['gst']) == (Decimal('19.50'), Decimal('0.50'), Decimal('3.51'))
+
+@pytest.mark.parametrize('value', ['nan', 'NaN', 'inf', '-Infinity', 'sNaN', float('nan'), float('inf'), Decimal('NaN'), Decimal('-Infinity'), 'abc', '1,5'])
+def test_rejects_non_finite_and_non_numbers(value):
+    with pytest.raises(ValueError):
+        gst_engine.to_decimal(value)
+    with pytest.raises(ValueError):
+        gst_engine.line_totals(1, value, 0, 18)
+
+@pytest.mark.parametrize('value, expected', [(None, '0.00'), ('', '0.00'), (' 2.50 ', '2.50'), (0.1, '0.1'), (3, '3'), (Decimal('1.005'), '1.005')])
+def test_to_decimal(value, expected):
+    assert gst_engine.to_decimal(value) == Decimal(expected)
+
+def test_inter_state():
+    assert gst_engine.is_inter_state('29ABCDE1234F1Z5', '27AAACA1234A1Z5')
+    assert not gst_engine.is_inter_state('29ABCDE1234F1Z5', '29AAACA1234A1Z5')
+    assert not gst_engine.is_inter_state('29ABCDE1234F1Z5', '')
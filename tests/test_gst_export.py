@@ -0,0 +1,58 @@
+import csv
+import zipfile
+from datetime import date
+
+import pytest
+
+import database_manager as db
+import gst_export
+
+SELLER = {'company_info': {'gstin': '29ABCDE1234F1Z5'}}
+
+@pytest.fixture
+def sales(catalog):
+    """Invoices of May 2025 from a Karnataka seller: inter-state B2B, intra-state B2B, B2C, plus a cancelled one and one out of range."""
+    conn = db.get_db_connection()
+    acme = conn.execute("SELECT id FROM buyers WHERE name = ?", (catalog['buyer'],)).fetchone()[0]
+    bolt = dict(conn.execute("SELECT * FROM products WHERE name = ?", (catalog['product'],)).fetchone())
+    local = db.add_record('buyers', {'name': 'Bharat Stores', 'gstin': '29AAACB1234B1Z5', 'address': 'Bengaluru', 'phone': '', 'email': '', 'state': 'Karnataka'})
+    walk_in = db.add_record('buyers', {'name': 'Walk-in', 'gstin': '', 'address': '', 'phone': '', 'email': '', 'state': 'Karnataka'})
+    wire = db.get_by_id('products', db.add_record('products', {'name': 'Copper Wire', 'hsn': '7408', 'gst_rate': 12.0, 'rate': 300.0, 'stock_qty': 100.0, 'unit': 'Kg', 'selling_price': 410.0}))
+    def sell(buyer_id, invoice_date, lines):
+        items = [{'product_id': product['id'], 'description': product['name'], 'hsn': product['hsn'], 'gst_rate': product['gst_rate'], 'quantity': quantity, 'rate': rate, 'discount_percent': 0.0, 'amount': round(quantity * rate, 2)}
+                 for product, quantity, rate in lines]
+        invoice = {'invoice_date': invoice_date, 'buyer_id': buyer_id, 'payment_mode': 'Cash', 'order_ref': '', 'dispatch_info': '', 'subtotal': 0.0, 'total_discount': 0.0,
+                   'total_cgst': 0.0, 'total_sgst': 0.0, 'total_igst': 0.0, 'freight': 0.0, 'round_off': 0.0, 'grand_total': 0.0}
+        return db.save_invoice(invoice, items, prefix='GX-')
+    sell(acme, '2025-05-02', [(bolt, 10, 8.0), (wire, 2, 410.0)])
+    sell(local, '2025-05-03', [(bolt, 5, 8.0), (bolt, 3, 8.35)])
+    sell(walk_in, '2025-05-31', [(wire, 1, 410.0)])
+    db.cancel_invoice(sell(local, '2025-05-04', [(wire, 7, 410.0)]))
+    sell(local, '2025-06-01', [(bolt, 1, 8.0)])
+
+def test_rate_summary(sales):
+    rows = list(gst_export.iter_summary('rates', '2025-05-01', '2025-05-31', SELLER['company_info']['gstin']))
+    assert rows == pytest.approx([
+        ('B2B', 'Inter-state', 12.0, 1, 820.0, 98.4, 0.0, 0.0, 918.4),
+        ('B2B', 'Inter-state', 18.0, 1, 80.0, 14.4, 0.0, 0.0, 94.4),
+        # 7.20 + 4.51 of GST on one invoice's 18% slab: CGST takes the odd paisa, as gst_engine splits it.
+        ('B2B', 'Intra-state', 18.0, 1, 65.05, 0.0, 5.86, 5.85, 76.76),
+        ('B2C', 'Intra-state', 12.0, 1, 410.0, 0.0, 24.6, 24.6, 459.2),
+    ])
+
+def test_hsn_summary(sales):
+    rows = list(gst_export.iter_summary('hsn', '2025-05-01', '2025-05-31', SELLER['company_info']['gstin']))
+    assert rows == pytest.approx([
+        ('B2B', '7318', 'Nos', 18.0, 3, 18.0, 145.05, 14.4, 5.86, 5.85, 171.16),
+        ('B2B', '7408', 'Kg', 12.0, 1, 2.0, 820.0, 98.4, 0.0, 0.0, 918.4),
+        ('B2C', '7408', 'Kg', 12.0, 1, 1.0, 410.0, 0.0, 24.6, 24.6, 459.2),
+    ])
+
+def test_export_files(sales, tmp_path):
+    workbook = gst_export.export_gstr1(date(2025, 5, 1), date(2025, 5, 31), SELLER, output_dir=str(tmp_path))
+    with zipfile.ZipFile(workbook) as zf:
+        sheets = [zf.read(f'xl/worksheets/sheet{n}.xml').decode('utf-8') for n in (1, 2)]
+    assert [sheet.count('<row>') for sheet in sheets] == [1 + 3, 1 + 4]
+    hsn_csv = gst_export.export_gstr1(date(2025, 5, 1), date(2025, 5, 31), SELLER, fmt='csv', output_dir=str(tmp_path))
+    with open(hsn_csv, encoding='utf-8-sig', newline='') as f: header, *rows = list(csv.reader(f))
+    assert header == gst_export.SUMMARIES['hsn'][1] and [row[:2] for row in rows] == [['B2B', '7318'], ['B2B', '7408'], ['B2C', '7408']]
@@ -0,0 +1,63 @@
+import io
+import json
+
+import database_manager as db
+import invoice_import
+
+_CSV_HEADER = "invoice_no,invoice_date,buyer_name,subtotal,total_cgst,total_sgst,total_igst,grand_total,item_product,item_quantity,item_rate\n"
+
+def _csv_row(invoice_no, catalog, quantity="1"):
+    return f"{invoice_no},2025-05-01,{catalog['buyer']},8,0.72,0.72,0,9,{catalog['product']},{quantity},8\n"
+
+def _record(invoice_no, catalog):
+    return {'invoice_no': invoice_no, 'invoice_date': '2025-05-01', 'buyer_name': catalog['buyer'], 'subtotal': 8, 'total_cgst': 0.72, 'total_sgst': 0.72,
+            'total_igst': 0, 'grand_total': 9, 'items': [{'product': catalog['product'], 'quantity': 1, 'rate': 8}]}
+
+def test_bad_csv_value_fails_only_its_invoice(tmp_path, catalog):
+    path = tmp_path / 'orders.csv'
+    path.write_text(_CSV_HEADER + _csv_row('T-1', catalog) + _csv_row('T-2', catalog, quantity="abc") + _csv_row('T-2', catalog) + _csv_row('T-3', catalog))
+    result = invoice_import.import_file(str(path), 'IMP-')
+    assert [invoice_no for _, _, invoice_no in result['saved']] == ['T-1', 'T-3']
+    [(index, invoice_no, message)] = result['errors']
+    assert (index, invoice_no) == (1, 'T-2') and 'quantity' in message
+
+def test_json_array_reports_non_objects(tmp_path, catalog):
+    path = tmp_path / 'orders.json'
+    path.write_text(json.dumps([_record('J-1', catalog), 5, dict(_record('J-2', catalog), items=[3]), _record('J-3', catalog)]))
+    result = invoice_import.import_file(str(path), 'IMP-')
+    assert [invoice_no for _, _, invoice_no in result['saved']] == ['J-1', 'J-3']
+    assert [index for index, _, _ in result['errors']] == [1, 2]
+
+def test_json_lines_reports_unparseable_lines(tmp_path, catalog):
+    path = tmp_path / 'orders.jsonl'
+    path.write_text(json.dumps(_record('J-1', catalog)) + "\n{bad\n" + json.dumps(_record('J-2', catalog)) + "\n")
+    result = invoice_import.import_file(str(path), 'IMP-')
+    assert [invoice_no for _, _, invoice_no in result['saved']] == ['J-1', 'J-2']
+    assert [index for index, _, _ in result['errors']] == [1]
+
+def test_json_array_is_read_in_chunks(monkeypatch):
+    records = [{'invoice_no': f'J-{n}', 'grand_total': 10 ** n, 'items': [{'description': 'a, b] "c"'}]} for n in range(20)] + [12345, None, []]
+    text = "  \n" + json.dumps(records, indent=1)
+    for chunk_size in (1, 2, 7, 64):
+        monkeypatch.setattr(invoice_import, 'JSON_CHUNK_SIZE', chunk_size)
+        assert list(invoice_import._iter_json_array(io.StringIO(text))) == records
+
+def _numbered(record):
+    return dict(record, invoice_no=None)
+
+def test_unconvertible_values_fail_only_their_record(tmp_path, catalog):
+    path = tmp_path / 'orders.json'
+    records = [_numbered(_record('', catalog)), dict(_numbered(_record('', catalog)), subtotal='abc'), dict(_numbered(_record('', catalog)), invoice_date='bad'), _numbered(_record('', catalog))]
+    path.write_text(json.dumps(records))
+    result = invoice_import.import_file(str(path), 'IMP-', number_reset='fiscal_year')
+    assert [(index, invoice_no) for index, _, invoice_no in result['saved']] == [(0, 'IMP-2025-26/0001'), (3, 'IMP-2025-26/0002')]
+    assert [index for index, _, _ in result['errors']] == [1, 2] and all("Invalid record" in message for _, _, message in result['errors'])
+
+def test_record_the_database_rejects_is_skipped_alone(catalog):
+    records = [_numbered(_record('', catalog)), dict(_numbered(_record('', catalog)), grand_total=[1]), _numbered(_record('', catalog)), dict(_record('B-1', catalog), items=[{'product': catalog['product'], 'quantity': 1, 'rate': 8, 'hsn': [7318]}])]
+    result = db.save_invoices_bulk(records, prefix='BLK-')
+    assert [(index, invoice_no) for index, _, invoice_no in result['saved']] == [(0, 'BLK-0001'), (2, 'BLK-0002')]
+    assert [index for index, _, _ in result['errors']] == [1, 3]
+    assert db.get_next_invoice_number('BLK-') == 'BLK-0003'
+    assert [row[0] for row in db.get_db_connection().execute("SELECT invoice_no FROM invoices ORDER BY id")] == ['BLK-0001', 'BLK-0002']
+    assert db.check_rollups() == []
@@ -0,0 +1,23 @@
+import multiprocessing
+
+import database_manager as db
+
+WRITERS = 4
+INVOICES_PER_WRITER = 25
+
+def _write_invoices(db_file, buyer_id, product_id, count):
+    db.DB_FILE = db_file
+    invoice_data = {'invoice_date': '2025-05-01', 'buyer_id': buyer_id, 'payment_mode': 'Cash', 'order_ref': '', 'dispatch_info': '', 'subtotal': 8.0, 'total_discount': 0.0,
+                    'total_cgst': 0.72, 'total_sgst': 0.72, 'total_igst': 0.0, 'freight': 0.0, 'round_off': 0.56, 'grand_total': 9.0}
+    items_data = [{'product_id': product_id, 'description': 'Steel Bolt M8', 'hsn': '7318', 'gst_rate': 18.0, 'quantity': 1.0, 'rate': 8.0, 'discount_percent': 0.0, 'amount': 8.0}]
+    invoice_ids = [db.save_invoice(invoice_data, items_data, prefix='PAR-') for _ in range(count)]
+    db.close_db_connection()
+    return invoice_ids
+
+def test_parallel_writers_get_unique_contiguous_numbers(temp_db, catalog):
+    buyer_id = temp_db.execute("SELECT id FROM buyers").fetchone()[0]; product_id = temp_db.execute("SELECT id FROM products").fetchone()[0]
+    with multiprocessing.get_context('spawn').Pool(WRITERS) as pool:
+        results = pool.starmap(_write_invoices, [(db.DB_FILE, buyer_id, product_id, INVOICES_PER_WRITER)] * WRITERS)
+    assert all(invoice_id for invoice_ids in results for invoice_id in invoice_ids)
+    numbers = [row[0] for row in temp_db.execute("SELECT invoice_no FROM invoices WHERE invoice_no LIKE 'PAR-%'")]
+    assert sorted(numbers) == [f"PAR-{n:04d}" for n in range(1, WRITERS * INVOICES_PER_WRITER + 1)]
@@ -0,0 +1,22 @@
+import database_manager as db
+
+def _key(row):
+    return (row['purchase_date'] or '', row['id'])
+
+def test_purchase_pages_include_undated_purchases(temp_db):
+    vendor_id = db.add_record('vendors', {'name': 'Kiran Steels', 'gstin': '', 'address': 'Pune', 'phone': '', 'email': ''})
+    dates = ['2025-04-01', None, '2025-04-03', '2025-04-01', None, '2025-04-02', None, '2025-04-03', '2025-04-02', None, '2025-04-01']
+    for n, purchase_date in enumerate(dates):
+        db.add_record('purchases', {'vendor_id': vendor_id, 'bill_no': f"KS-{n}", 'purchase_date': purchase_date, 'total_amount': 100.0, 'amount_paid': 0.0, 'payment_status': 'Unpaid', 'notes': ''})
+    expected = sorted(db.get_db_connection().execute("SELECT id, purchase_date FROM purchases"), key=_key, reverse=True)
+
+    forward = []; rows = db.get_purchases_page(limit=3)
+    while rows:
+        forward.extend(rows); rows = db.get_purchases_page(after_key=_key(rows[-1]), limit=3)
+    assert [row['id'] for row in forward] == [row['id'] for row in expected]
+    assert [row['purchase_date'] for row in forward[-4:]] == [None] * 4
+
+    backward = []; rows = db.get_purchases_page(before_key=_key(forward[-1]), limit=3)
+    while rows:
+        backward[:0] = rows; rows = db.get_purchases_page(before_key=_key(rows[0]), limit=3)
+    assert backward == forward[:-1]
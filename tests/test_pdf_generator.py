@@ -0,0 +1,71 @@
+import copy
+import json
+import os
+import threading
+
+import pytest
+
+import database_manager as db
+import pdf_generator
+
+RENDER_TIMEOUT = 60
+
+@pytest.fixture
+def settings(monkeypatch, tmp_path):
+    with open(os.path.join(os.path.dirname(pdf_generator.FONT_FILE), 'settings.json')) as f: settings = json.load(f)
+    settings['company_info']['logo_path'] = ''
+    monkeypatch.chdir(tmp_path)  # invoices/ is written to the working directory
+    return settings
+
+def _invoice(line_count):
+    items = [{'description': f"Steel Bolt M{n}", 'hsn': '7318', 'gst_rate': 18.0, 'quantity': 1.0, 'rate': 8.0, 'discount_percent': 0.0, 'amount': 8.0} for n in range(line_count)]
+    taxable = 8.0 * line_count
+    invoice = {'invoice_no': 'T-0001', 'invoice_date': '2025-05-01', 'buyer_name': 'Acme Traders', 'buyer_address': 'Pune', 'buyer_gstin': '27AAACA1234A1Z5', 'buyer_state': 'Maharashtra',
+               'order_ref': '', 'dispatch_info': '', 'payment_mode': 'Cash', 'subtotal': taxable, 'total_discount': 0.0, 'total_cgst': 0.0, 'total_sgst': 0.0,
+               'total_igst': round(taxable * 0.18, 2), 'freight': 0.0, 'round_off': 0.0, 'grand_total': round(taxable * 1.18)}
+    return invoice, items
+
+def _render(invoice, items, settings):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(path=pdf_generator.create_invoice_pdf(invoice, items, settings, use_cache=False)), daemon=True)
+    thread.start(); thread.join(RENDER_TIMEOUT)
+    assert not thread.is_alive(), "create_invoice_pdf did not finish"
+    return result['path']
+
+@pytest.mark.parametrize('line_count', [1, 30, 120])
+def test_long_terms_do_not_stall_pagination(settings, line_count):
+    settings = copy.deepcopy(settings)
+    settings['invoice_settings']['terms_and_conditions'] = '\n'.join(f"{n}. A long condition of sale." for n in range(1, 41))
+    path = _render(*_invoice(line_count), settings)
+    assert os.path.getsize(path) > 0
+
+def test_pages_cover_every_row_once():
+    header, single, _ = pdf_generator._measure_item_rows()
+    for tail_height in (0, 100 * pdf_generator.mm, 400 * pdf_generator.mm):
+        for row_count in (0, 1, 40, 200):
+            pages = pdf_generator._paginate_items([single] * row_count, 200 * pdf_generator.mm, tail_height, 25 * pdf_generator.mm)
+            assert pages[0][0] == 0 and pages[-1][1] == row_count
+            assert all(end == next_start for (_, end), (next_start, _) in zip(pages, pages[1:]))
+
+def _page_texts(path):
+    from pypdf import PdfReader
+    return [page.extract_text() for page in PdfReader(path).pages]
+
+def test_parallel_detailed_report_matches_serial(settings, catalog, monkeypatch):
+    pytest.importorskip('pypdf')
+    buyer_id = db.get_db_connection().execute("SELECT id FROM buyers").fetchone()[0]; product_id = db.get_db_connection().execute("SELECT id FROM products").fetchone()[0]
+    invoice_ids = []
+    for n in range(1, 8):
+        invoice, items = _invoice(n * 3)
+        invoice.update(buyer_id=buyer_id, invoice_date=f"2025-05-{n:02d}"); del invoice['invoice_no']
+        invoice_ids.append(db.save_invoice(invoice, [dict(item, product_id=product_id) for item in items], prefix='R-'))
+    monkeypatch.setattr(pdf_generator, 'MIN_PARALLEL_INVOICES', 2); monkeypatch.setattr(pdf_generator, 'MAX_CHUNK_SIZE', 2)
+    serial = pdf_generator.create_detailed_invoice_report(invoice_ids, settings, workers=1)
+    os.replace(serial, serial := os.path.join(os.path.dirname(serial), 'serial.pdf'))  # both reports are named after the same second
+    render_parallel = pdf_generator._render_detailed_parallel; parallel_runs = []
+    monkeypatch.setattr(pdf_generator, '_render_detailed_parallel', lambda *args, **kwargs: parallel_runs.append(render_parallel(*args, **kwargs)))
+    parallel = pdf_generator.create_detailed_invoice_report(invoice_ids, settings, workers=3)
+    assert parallel_runs
+    serial_pages, parallel_pages = _page_texts(serial), _page_texts(parallel)
+    assert len(serial_pages) == len(parallel_pages) >= len(invoice_ids)
+    assert serial_pages == parallel_pages
@@ -0,0 +1,42 @@
+import pytest
+
+import database_manager as db
+import gst_engine
+
+@pytest.fixture
+def sellers(catalog):
+    db.add_record('buyers', {'name': 'Bharat Stores', 'gstin': '29AAACB1234B1Z5', 'address': 'Bengaluru', 'phone': '', 'email': '', 'state': 'Karnataka'})
+    db.add_record('products', {'name': 'Copper Wire', 'hsn': '7408', 'gst_rate': 12.0, 'rate': 300.0, 'stock_qty': 1000.0, 'unit': 'Kg', 'selling_price': 410.0})
+    conn = db.get_db_connection()
+    return [row[0] for row in conn.execute("SELECT id FROM buyers ORDER BY id")], [dict(row) for row in conn.execute("SELECT * FROM products ORDER BY id")]
+
+def _save(buyer_id, invoice_date, lines):
+    items = [{'product_id': product['id'], 'description': product['name'], 'hsn': product['hsn'], 'gst_rate': product['gst_rate'], 'quantity': quantity, 'rate': product['selling_price'], 'discount_percent': discount}
+             for product, quantity, discount in lines]
+    totals = gst_engine.compute_invoice(items, inter_state=buyer_id % 2 == 0)
+    invoice = dict(gst_engine.as_floats(totals), invoice_date=invoice_date, buyer_id=buyer_id, payment_mode='Cash', order_ref='', dispatch_info='')
+    for item in items: item['amount'] = float(gst_engine.line_totals(item['quantity'], item['rate'], item['discount_percent'])['taxable_value'])
+    return db.save_invoice(invoice, items, prefix='RU-')
+
+def _assert_consistent(start='2025-04-01', end='2025-06-30'):
+    assert db.check_rollups() == []
+    expected = db.get_db_connection().execute("SELECT COUNT(*), COALESCE(SUM(grand_total), 0) FROM invoices WHERE invoice_date BETWEEN ? AND ? AND invoice_no NOT LIKE ?",
+                                               (start, end, db.CANCELLED_PREFIX + '%')).fetchone()
+    totals = db.get_sales_totals(start, end)
+    assert (totals['invoice_count'], totals['grand_total']) == pytest.approx(tuple(expected))
+
+def test_rollups_follow_saves_cancels_and_reissues(sellers):
+    (acme, bharat), (bolt, wire) = sellers
+    first = _save(acme, '2025-05-01', [(bolt, 10, 0), (wire, 2.5, 5)])
+    _save(bharat, '2025-05-01', [(wire, 1, 0)])
+    third = _save(acme, '2025-05-02', [(bolt, 3, 12.5), (bolt, 1, 0)])
+    _assert_consistent()
+    assert db.cancel_invoice(first)
+    _assert_consistent()
+    # Re-issue: the cancelled invoice is saved again, as the Billing tab does, on another date.
+    details, items = db.get_full_invoice_details(first)
+    reissued = _save(details['buyer_id'], '2025-05-03', [(bolt if item['product_id'] == bolt['id'] else wire, item['quantity'], item['discount_percent']) for item in items])
+    _assert_consistent()
+    assert db.cancel_invoice(third) and db.cancel_invoice(reissued)
+    _assert_consistent()
+    assert db.get_sales_totals('2025-05-01', '2025-05-03')['invoice_count'] == 1
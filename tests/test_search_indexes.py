@@ -0,0 +1,18 @@
+import database_manager as db
+
+def _fts_tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%\\_fts' ESCAPE '\\'")}
+
+def test_indexes_are_built_once_fts5_is_available(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, 'DB_FILE', str(tmp_path / 'billing_app.db'))
+    monkeypatch.setattr(db, 'fts5_available', lambda: False)
+    db.create_tables(); conn = db.get_db_connection()
+    db.add_record('products', {'name': 'Steel Bolt M8', 'hsn': '7318', 'gst_rate': 18.0, 'rate': 5.0, 'stock_qty': 10.0, 'unit': 'Nos', 'selling_price': 8.0})
+    assert db.get_schema_version() == db.MIGRATIONS[-1][0] and not _fts_tables(conn)
+    assert [row['name'] for row in db.search_records('products', 'bolt')] == ['Steel Bolt M8']  # LIKE fallback
+    monkeypatch.undo(); monkeypatch.setattr(db, 'DB_FILE', str(tmp_path / 'billing_app.db'))
+    db.create_tables()
+    assert _fts_tables(conn) == {f"{table_name}_fts" for table_name in db.FTS_COLUMNS}
+    assert [row['name'] for row in db.search_records('products', 'bolt')] == ['Steel Bolt M8']
+    assert db.ensure_search_indexes() == []
+    db.close_db_connection()
@@ -0,0 +1,41 @@
+import database_manager as db
+
+DATES = ('2025-03-09', '2025-03-10', '2025-03-20', '2025-03-25', '2025-03-31', '2025-04-01', '2025-04-20', '2025-04-30')
+
+def _replayed(as_of_date):
+    rows = db.get_db_connection().execute("SELECT product_id, SUM(quantity) FROM stock_movements WHERE movement_date <= ? GROUP BY product_id", (as_of_date,))
+    return {product_id: quantity for product_id, quantity in rows}
+
+def _assert_ledger_matches():
+    assert db.check_stock_ledger() == []
+    for as_of_date in DATES:
+        assert db.get_stock_as_of(as_of_date) == _replayed(as_of_date), as_of_date
+        for product_id, quantity in _replayed(as_of_date).items():
+            assert db.get_stock_as_of(as_of_date, product_id) == {product_id: quantity}
+
+def _sell(buyer_id, product_id, invoice_date, quantity):
+    invoice = {'invoice_date': invoice_date, 'buyer_id': buyer_id, 'payment_mode': 'Cash', 'order_ref': '', 'dispatch_info': '', 'subtotal': 8.0 * quantity, 'total_discount': 0.0,
+               'total_cgst': 0.0, 'total_sgst': 0.0, 'total_igst': 0.0, 'freight': 0.0, 'round_off': 0.0, 'grand_total': 8.0 * quantity}
+    item = {'product_id': product_id, 'description': 'Steel Bolt M10', 'hsn': '7318', 'gst_rate': 0.0, 'quantity': quantity, 'rate': 8.0, 'discount_percent': 0.0, 'amount': 8.0 * quantity}
+    return db.save_invoice(invoice, [item], prefix='SL-')
+
+def test_stock_as_of_across_a_snapshot(temp_db):
+    buyer_id = db.add_record('buyers', {'name': 'Acme Traders', 'gstin': '', 'address': 'Pune', 'phone': '', 'email': '', 'state': 'Maharashtra'})
+    bolt = db.add_product({'name': 'Steel Bolt M10', 'hsn': '7318', 'gst_rate': 0.0, 'unit': 'Nos', 'selling_price': 8.0}, 100, 5.0, movement_date='2025-03-10')
+    nut = db.add_product({'name': 'Steel Nut M10', 'hsn': '7318', 'gst_rate': 0.0, 'unit': 'Nos', 'selling_price': 2.0}, 40, 1.0, movement_date='2025-03-10')
+    assert db.receive_stock(bolt, 50, 6.0, movement_date='2025-03-15')
+    _sell(buyer_id, bolt, '2025-03-20', 30)
+    assert db.adjust_stock(nut, -5, movement_date='2025-03-20')
+    _assert_ledger_matches()
+
+    assert db.ensure_stock_snapshots(today='2025-04-15') == ['2025-03-31']
+    assert db.ensure_stock_snapshots(today='2025-04-15') == []
+    _assert_ledger_matches()
+
+    # After the snapshot: a sale in April, a back-dated correction into March and a cancellation dated today.
+    april_sale = _sell(buyer_id, bolt, '2025-04-20', 12)
+    assert db.adjust_stock(bolt, -3, movement_date='2025-03-25')
+    assert db.cancel_invoice(april_sale)
+    _assert_ledger_matches()
+    assert db.get_stock_as_of('2025-03-31') == {bolt: 117, nut: 35}
+    assert db.get_stock_as_of('2025-04-30') == {bolt: 105, nut: 35}
@@ -0,0 +1,264 @@
+"""Reusable Tk helpers for the BillingApp tabs."""
+import bisect
+import tkinter as tk
+from tkinter import ttk
+
+class PagedTreeview:
+    """Virtual-scrolling adapter that keeps at most max_rows rows in a ttk.Treeview.
+
+    fetch_page(after_key=None, before_key=None, limit=n) must return rows in
+    display order; row_key(row) gives the keyset key of a row. Pages are loaded
+    as the user nears either end of the loaded window, and rows scrolled far
+    out of view are dropped, so memory and redraw cost stay flat however large
+    the table is. Item iids are str(row['id']). With executor (a
+    db_executor.DbExecutor) the pages loaded while scrolling are read on its
+    reader threads; without it they are read inline.
+    """
+    def __init__(self, tree, scrollbar, fetch_page, row_values, row_key, row_tags=None, page_size=200, max_rows=600, executor=None):
+        self.tree, self.scrollbar, self.executor = tree, scrollbar, executor
+        self.fetch_page, self.row_values, self.row_key = fetch_page, row_values, row_key
+        self.row_tags = row_tags or (lambda row: ())
+        self.page_size, self.max_rows = page_size, max_rows
+        self._keys = []; self._more_before = self._more_after = False; self._pending = None
+        tree.configure(yscrollcommand=self._on_scroll)
+
+    def reload(self, fetch_page=None, rows=None):
+        """Clears the tree and shows the first page (optionally from a new source).
+
+        rows, if given, is that first page, already fetched (e.g. off the Tk
+        thread) with fetch_page(limit=page_size).
+        """
+        if fetch_page is not None: self.fetch_page = fetch_page
+        # _pending is an after_idle id until a load starts, then that load's token; a load reloaded over is dropped.
+        if isinstance(self._pending, str): self.tree.after_cancel(self._pending)
+        self._pending = None
+        children = self.tree.get_children()
+        if children: self.tree.delete(*children)
+        self._keys = []; self._more_before = False
+        if rows is None: rows = self.fetch_page(limit=self.page_size)
+        self._append(rows); self._more_after = len(rows) == self.page_size
+        self.tree.yview_moveto(0)
+
+    def apply_changes(self, changes, keyed=True):
+        """Updates the loaded rows in place from [(old_row, new_row)] pairs (see database_manager.CatalogCache).
+
+        Deleted rows are removed and changed ones redrawn, moving if their key
+        changed. New rows are inserted where their key falls inside the loaded
+        window (rows outside it appear when it is scrolled to). keyed=False,
+        for results not in key order such as ranked searches, only updates and
+        removes rows already shown.
+        """
+        for old, new in changes:
+            iid = str((new or old)['id'])
+            if self.tree.exists(iid):
+                index = self.tree.index(iid)
+                if new is not None and self.row_key(new) == self._keys[index]:
+                    self.tree.item(iid, values=self.row_values(new), tags=self.row_tags(new)); continue
+                self.tree.delete(iid); del self._keys[index]
+                if not keyed and new is not None: self._keys.insert(index, self.row_key(new)); self._insert(new, index); continue
+            if new is None or not keyed: continue
+            key = self.row_key(new); index = bisect.bisect_left(self._keys, key)
+            if (index == 0 and self._more_before) or (index == len(self._keys) and self._more_after): continue
+            self._keys.insert(index, key); self._insert(new, index)
+
+    def _insert(self, row, index):
+        iid = str(row['id'])
+        if self.tree.exists(iid): self.tree.delete(iid)
+        self.tree.insert('', index, iid=iid, values=self.row_values(row), tags=self.row_tags(row))
+
+    def _append(self, rows):
+        for row in rows: self._insert(row, 'end')
+        self._keys.extend(self.row_key(row) for row in rows)
+
+    def _prepend(self, rows):
+        for row in reversed(rows): self._insert(row, 0)
+        self._keys[:0] = [self.row_key(row) for row in rows]
+
+    def _trim(self, from_top):
+        excess = len(self._keys) - self.max_rows
+        if excess <= 0: return 0
+        children = self.tree.get_children()
+        if from_top:
+            self.tree.delete(*children[:excess]); del self._keys[:excess]; self._more_before = True
+        else:
+            self.tree.delete(*children[-excess:]); del self._keys[-excess:]; self._more_after = True
+        return excess
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._pending or not self._keys: return
+        if float(last) >= 0.9 and self._more_after: self._pending = self.tree.after_idle(self._load_after)
+        elif float(first) <= 0.1 and self._more_before: self._pending = self.tree.after_idle(self._load_before)
+
+    def _fetch(self, show, **page):
+        """Passes fetch_page(**page) to show; no other load starts until it has run."""
+        if self.executor is None: self._pending = None; show(self.fetch_page(**page)); return
+        load = self._pending = object(); fetch_page = self.fetch_page
+        def loaded(rows):
+            if self._pending is load: self._pending = None; show(rows)
+        def failed(error):
+            if self._pending is load: self._pending = None
+            if self.executor.on_error: self.executor.on_error(error)
+        self.executor.read(lambda: fetch_page(**page), callback=loaded, on_error=failed)
+
+    def _load_after(self):
+        self._fetch(self._show_after, after_key=self._keys[-1], limit=self.page_size)
+
+    def _show_after(self, rows):
+        self._more_after = len(rows) == self.page_size
+        self._append(rows)
+        # Dropping rows above the view shifts it; scroll back by the same number of rows.
+        removed = self._trim(from_top=True)
+        if removed: self.tree.yview_scroll(-removed, 'units')
+
+    def _load_before(self):
+        self._fetch(self._show_before, before_key=self._keys[0], limit=self.page_size)
+
+    def _show_before(self, rows):
+        self._more_before = len(rows) == self.page_size
+        self._prepend(rows)
+        if rows: self.tree.yview_scroll(len(rows), 'units')
+        self._trim(from_top=False)
+
+# Keys that move around or pick from a type-ahead list rather than change its text.
+TYPE_AHEAD_IGNORED_KEYS = frozenset(('Up', 'Down', 'Left', 'Right', 'Home', 'End', 'Prior', 'Next', 'Return', 'KP_Enter', 'Escape', 'Tab', 'ISO_Left_Tab',
+                                     'Shift_L', 'Shift_R', 'Control_L', 'Control_R', 'Alt_L', 'Alt_R', 'Caps_Lock'))
+
+def bind_type_ahead(combo, index, extra=(), limit=None):
+    """Fills a ttk.Combobox's list from index (a prefix_index.PrefixIndex) as the user types and each time it drops down.
+
+    The list holds extra (e.g. an "All" choice) and then the best matches for
+    the text typed so far, not the whole catalog, so refreshing it costs the
+    same with a hundred records or a hundred thousand. It drops down by itself
+    once there is text to match. An open list has the keyboard focus, so the
+    characters and BackSpace typed there are passed on to the entry; arrows,
+    Return and Escape still pick from the list.
+    """
+    def refresh(): combo.configure(values=list(extra) + index.search(combo.get(), limit))
+    def changed():
+        # Post runs postcommand, and also resizes a list that is already open.
+        if combo.get() or combo.tk.getboolean(combo.tk.call('winfo', 'ismapped', popdown)): combo.tk.call('ttk::combobox::Post', combo)
+        else: refresh()
+    def typed(event):
+        if event.keysym not in TYPE_AHEAD_IGNORED_KEYS: changed()
+    def typed_in_list(keysym, char):
+        if keysym == 'BackSpace':
+            cursor = combo.index('insert')
+            if cursor: combo.delete(cursor - 1)
+        elif len(char) == 1 and char.isprintable(): combo.insert('insert', char)
+        else: return
+        changed()
+    popdown = combo.tk.eval(f'ttk::combobox::PopdownWindow {combo}')
+    combo.tk.call('bind', f'{popdown}.f.l', '<KeyPress>', f'{combo.register(typed_in_list)} %K %A')
+    combo.configure(postcommand=refresh)
+    combo.bind('<KeyRelease>', typed, add='+')
+
+class ItemGrid:
+    """Editable grid over a plain list of row dicts that keeps widgets only for the rows in view.
+
+    rows is the model, one dict per line keyed by column. Widgets come in
+    slots of one row each, laid out in parent from grid row first_row; there
+    are never more than visible_rows slots, scrolling re-binds them to other
+    rows, and slots a shorter list does not need are hidden and kept for
+    reuse. columns are (key, width, kind) with kind 'combo', 'entry' or
+    'readonly', placed after a line-number label. What the user types is
+    written to the row and reported as on_edit(index, key); values set
+    through update() or set_rows() are not reported. setup_combo(combo) is
+    called for each combobox made, on_select(index) when a value is picked
+    from one.
+    """
+    def __init__(self, parent, columns, defaults, on_edit, on_select=None, setup_combo=None, yscrollcommand=None, first_row=0, visible_rows=15):
+        self.parent, self.columns, self.defaults = parent, columns, defaults
+        self.on_edit, self.on_select, self.setup_combo, self.yscrollcommand = on_edit, on_select, setup_combo, yscrollcommand
+        self.first_row, self.visible_rows = first_row, visible_rows
+        self.rows = []; self.top = 0
+        self._slots = []; self._shown = 0; self._binding = False
+        self._bind_wheel(parent)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def append(self, row=None):
+        """Adds a row (missing keys take the defaults) at the end and scrolls it into view. Returns its index."""
+        self.rows.append({**self.defaults, **(row or {})})
+        self.see(len(self.rows) - 1)
+        return len(self.rows) - 1
+
+    def pop(self):
+        row = self.rows.pop(); self._scroll_to(self.top, force=True)
+        return row
+
+    def set_rows(self, rows):
+        """Replaces every row at once, e.g. to load or clear an invoice, and scrolls to the top."""
+        self.rows = [{**self.defaults, **row} for row in rows]; self.top = 0
+        self._refresh()
+
+    def update(self, index, **values):
+        self.rows[index].update(values)
+        if 0 <= index - self.top < self._shown: self._set_vars(self._slots[index - self.top], values)
+
+    def see(self, index):
+        if index < self.top: self._scroll_to(index, force=True)
+        else: self._scroll_to(max(self.top, index - self.visible_rows + 1), force=True)
+
+    def focus(self, index, key):
+        self.see(index); self._slots[index - self.top]['widgets'][key].focus()
+
+    def yview(self, *args):
+        """Scrollbar command."""
+        if args[0] == 'moveto': self._scroll_to(round(float(args[1]) * len(self.rows)))
+        elif args[0] == 'scroll': self._scroll_to(self.top + int(args[1]) * (self.visible_rows if args[2] == 'pages' else 1))
+
+    def _scroll_to(self, top, force=False):
+        top = max(0, min(top, len(self.rows) - self.visible_rows))
+        if top != self.top or force: self.top = top; self._refresh()
+
+    def _refresh(self):
+        shown = min(len(self.rows) - self.top, self.visible_rows)
+        while len(self._slots) < shown: self._slots.append(self._make_slot(len(self._slots)))
+        for slot in self._slots[shown:self._shown]:
+            for widget in slot['widgets'].values(): widget.grid_remove()
+        for n, slot in enumerate(self._slots[:shown]):
+            if n >= self._shown:
+                for widget in slot['widgets'].values(): widget.grid()
+            slot['widgets']['s_no'].configure(text=f"{self.top + n + 1}.")
+            self._set_vars(slot, self.rows[self.top + n])
+        self._shown = shown
+        if self.yscrollcommand:
+            total = len(self.rows) or 1; self.yscrollcommand(self.top / total, (self.top + shown) / total)
+
+    def _make_slot(self, n):
+        row = self.first_row + n; slot = {'vars': {}, 'widgets': {}}
+        label = ttk.Label(self.parent); label.grid(row=row, column=0, padx=5, pady=2); slot['widgets']['s_no'] = label
+        for column, (key, width, kind) in enumerate(self.columns, 1):
+            var = tk.StringVar()
+            if kind == 'combo':
+                widget = ttk.Combobox(self.parent, textvariable=var, width=width)
+                if self.setup_combo: self.setup_combo(widget)
+                widget.bind("<<ComboboxSelected>>", lambda e, n=n: self.on_select and self.on_select(self.top + n))
+            else:
+                widget = ttk.Entry(self.parent, textvariable=var, width=width, justify='right')
+                if kind == 'readonly': widget.config(state='readonly')
+            var.trace_add('write', lambda *args, n=n, key=key: self._on_write(n, key))
+            widget.grid(row=row, column=column, padx=5, pady=2); self._bind_wheel(widget)
+            slot['vars'][key] = var; slot['widgets'][key] = widget
+        return slot
+
+    def _set_vars(self, slot, values):
+        self._binding = True
+        try:
+            for key, value in values.items(): slot['vars'][key].set('' if value is None else value)
+        finally:
+            self._binding = False
+
+    def _on_write(self, n, key):
+        index = self.top + n
+        if self._binding or n >= self._shown: return
+        value = self._slots[n]['vars'][key].get()
+        if self.rows[index][key] != value: self.rows[index][key] = value; self.on_edit(index, key)
+
+    def _bind_wheel(self, widget):
+        # 'break' also keeps the wheel from stepping through a combobox's values.
+        widget.bind("<MouseWheel>", lambda e: self._scroll_to(self.top + (-1 if e.delta > 0 else 1)) or 'break')
+        widget.bind("<Button-4>", lambda e: self._scroll_to(self.top - 1) or 'break')
+        widget.bind("<Button-5>", lambda e: self._scroll_to(self.top + 1) or 'break')